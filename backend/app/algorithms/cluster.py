@@ -0,0 +1,608 @@
+import math
+import os
+import random
+import re
+import time
+import zlib
+from array import array
+from collections import Counter
+from datetime import datetime
+from heapq import nlargest
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.algorithms.fields import DATE_FIELDS
+from app.algorithms.placement import base_dir_for, place_file
+from app.config import (
+    CLUSTER_BATCH_SIZE,
+    CLUSTER_CENTROID_TERMS,
+    CLUSTER_DENSITY_MICRO,
+    CLUSTER_HASH_FEATURES,
+    CLUSTER_INIT_SAMPLE,
+    CLUSTER_MAX_BATCHES,
+    CLUSTER_PATIENCE,
+)
+from app.core.base import StructAlgorithm
+
+# Поля опису, що не є ознаками (ідентифікатори та службові значення)
+SKIP_FIELDS = {"original_path", "file_hash", "hash_tier", "digests", "buffers", "filename"}
+# Довші рядкові значення (хеші, тексти) не стають ознаками
+MAX_VALUE_LENGTH = 64
+# Скільки останніх компонентів шляху до файлу стають ознаками
+PATH_DIR_DEPTH = 3
+# Мінімальна відстань (для λ = 1 / відстань у щільнісному режимі)
+MIN_DISTANCE = 1e-3
+DEFAULT_MIN_CLUSTER = 5
+NOISE_LABEL = "unclustered"
+
+# Слова з літер (від двох) і чотиризначні числа (роки)
+_WORD = re.compile(r"[^\W\d_]{2,}|\d{4}")
+_CAMEL = re.compile(r"(?<=[a-zа-яіїєґ])(?=[A-ZА-ЯІЇЄҐ])")
+
+# Рядок розрідженої матриці: (індекси ознак, ваги)
+SparseRow = Tuple[Sequence[int], Sequence[float]]
+
+
+def _words(text: str) -> List[str]:
+    return [w.lower() for w in _WORD.findall(_CAMEL.sub(" ", text))]
+
+
+def tokenize(desc: Dict) -> List[str]:
+    """
+    Токени опису файлу: "поле=значення" для коротких рядків, лог-бакет для
+    чисел, рік-місяць для дат, слова з останніх директорій та імені файлу
+    і розширення.
+    """
+    tokens: List[str] = []
+    for key, value in desc.items():
+        if key in SKIP_FIELDS or value is None:
+            continue
+        if isinstance(value, bool):
+            tokens.append(f"{key}={value}")
+        elif isinstance(value, (int, float)):
+            if key in DATE_FIELDS:
+                # Поля-дати: ознака — рік і місяць
+                try:
+                    tokens.append(f"{key}={datetime.fromtimestamp(value):%Y-%m}")
+                except (OverflowError, OSError, ValueError):
+                    continue
+            else:
+                tokens.append(f"{key}~{int(math.log2(abs(value) + 1))}")
+        elif isinstance(value, str) and len(value) <= MAX_VALUE_LENGTH:
+            tokens.append(f"{key}={value.lower()}")
+
+    path = desc.get("original_path")
+    if path:
+        directory, filename = os.path.split(path)
+        stem, ext = os.path.splitext(filename)
+        for part in directory.split(os.sep)[-PATH_DIR_DEPTH:]:
+            tokens.extend("dir:" + w for w in _words(part))
+        tokens.extend("name:" + w for w in _words(stem))
+        if ext:
+            tokens.append("ext=" + ext[1:].lower())
+    return tokens
+
+
+class HashedTfIdf:
+    """
+    Розріджена TF-IDF матриця з хешуванням ознак.
+
+    Токен відображається в індекс crc32(token) mod n_features, тож словник
+    не зберігається. Рядки накопичуються у форматі CSR у масивах array
+    (indptr, indices, data), частоти документів — у масиві довжини
+    n_features; finalize() переводить частоти у нормовані TF-IDF ваги.
+    """
+
+    def __init__(self, n_features: int = CLUSTER_HASH_FEATURES):
+        self.n_features = n_features
+        self.indptr = array("Q", [0])
+        self.indices = array("I")
+        self.data = array("f")
+        self.df = array("I", bytes(4 * n_features))
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.indptr) - 1
+
+    def add(self, tokens: Iterable[str]) -> None:
+        n_features = self.n_features
+        counts = Counter(zlib.crc32(token.encode()) % n_features for token in tokens)
+        features = sorted(counts)
+        self.indices.extend(features)
+        self.data.extend(counts[j] for j in features)
+        self.indptr.append(len(self.indices))
+        df = self.df
+        for j in features:
+            df[j] += 1
+
+    def finalize(self) -> None:
+        """Ваги (1 + log tf) * idf, кожен рядок нормується до одиничної довжини."""
+        n = self.n_rows
+        idf = {}
+        indices, data, indptr = self.indices, self.data, self.indptr
+        for row in range(n):
+            start, end = indptr[row], indptr[row + 1]
+            weights = []
+            for t in range(start, end):
+                j = indices[t]
+                w = idf.get(j)
+                if w is None:
+                    w = idf[j] = math.log((1 + n) / (1 + self.df[j])) + 1.0
+                weights.append((1.0 + math.log(data[t])) * w)
+            norm = math.sqrt(sum(w * w for w in weights)) or 1.0
+            for t, w in zip(range(start, end), weights):
+                data[t] = w / norm
+        self.df = array("I")  # частоти більше не потрібні
+
+    def row(self, i: int) -> SparseRow:
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+
+class CentroidIndex:
+    """
+    Центроїди k-means в інвертованому індексі: ознака → {центроїд: вага}.
+
+    Скалярні добутки рядка з усіма центроїдами рахуються за один прохід по
+    ознаках рядка, тож рядок торкається лише центроїдів зі спільними
+    ознаками. Кожен центроїд має відкладений множник: c = scale * w, і крок
+    c ← (1 - η)c + ηx змінює лише scale та ваги ознак x — оновлення коштує
+    O(ненульових ознак x), а не O(n_features).
+    """
+
+    def __init__(self):
+        self.postings: Dict[int, Dict[int, float]] = {}
+        self.scale: List[float] = []
+        self.sqnorm: List[float] = []
+        self.count: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.scale)
+
+    def add(self, row: SparseRow) -> None:
+        c = len(self.scale)
+        indices, values = row
+        for j, v in zip(indices, values):
+            self.postings.setdefault(j, {})[c] = v
+        self.scale.append(1.0)
+        self.sqnorm.append(sum(v * v for v in values))
+        # початкова точка рахується як одне спостереження
+        self.count.append(1)
+
+    def distances(self, row: SparseRow, sqnorm: float) -> List[float]:
+        """Квадрати відстаней рядка до всіх центроїдів."""
+        acc = [0.0] * len(self.scale)
+        postings = self.postings
+        for j, v in zip(*row):
+            weights = postings.get(j)
+            if weights:
+                for c, w in weights.items():
+                    acc[c] += v * w
+        return [sqnorm + sq - 2.0 * a * s for a, s, sq in zip(acc, self.scale, self.sqnorm)]
+
+    def nearest(self, row: SparseRow, sqnorm: float) -> Tuple[int, float]:
+        """Найближчий центроїд і квадрат відстані до нього."""
+        d2 = self.distances(row, sqnorm)
+        best = min(d2)
+        return d2.index(best), max(0.0, best)
+
+    def update(self, c: int, row: SparseRow, sqnorm: float) -> None:
+        postings = self.postings
+        indices, values = row
+        dot = self.scale[c] * sum(v * postings[j].get(c, 0.0) for j, v in zip(indices, values) if j in postings)
+        self.count[c] += 1
+        eta = 1.0 / self.count[c]
+        self.sqnorm[c] = (1 - eta) ** 2 * self.sqnorm[c] + 2 * eta * (1 - eta) * dot + eta * eta * sqnorm
+        self.scale[c] *= 1 - eta
+        if self.scale[c] < 1e-9:
+            # переносимо множник у ваги, щоб не втратити точність (рідко: після ~10⁹ кроків)
+            scale = self.scale[c]
+            for weights in postings.values():
+                if c in weights:
+                    weights[c] *= scale
+            self.scale[c] = 1.0
+        step = eta / self.scale[c]
+        for j, v in zip(indices, values):
+            weights = postings.get(j)
+            if weights is None:
+                weights = postings[j] = {}
+            weights[c] = weights.get(c, 0.0) + step * v
+
+    def top_terms(self, limit: int) -> List[Dict[int, float]]:
+        """Найбільші ваги кожного центроїда, нормовані до одиничної довжини."""
+        per_centroid: List[List[Tuple[float, int]]] = [[] for _ in self.scale]
+        for j, weights in self.postings.items():
+            for c, w in weights.items():
+                per_centroid[c].append((w, j))
+        result = []
+        for terms in per_centroid:
+            top = nlargest(limit, terms)
+            norm = math.sqrt(sum(w * w for w, _ in top)) or 1.0
+            result.append({j: w / norm for w, j in top})
+        return result
+
+
+def _sqnorm(row: SparseRow) -> float:
+    # рядки HashedTfIdf нормовані; порожній рядок — нульовий вектор
+    return 1.0 if len(row[0]) else 0.0
+
+
+def _sparse_d2(a: SparseRow, b: Dict[int, float]) -> float:
+    dot = sum(v * b.get(j, 0.0) for j, v in zip(*a))
+    return max(0.0, _sqnorm(a) + sum(v * v for v in b.values()) - 2.0 * dot)
+
+
+class MiniBatchKMeans:
+    """
+    Міні-батч k-means (Sculley, 2010) на розріджених рядках HashedTfIdf.
+
+    Ініціалізація — k-means++ на випадковій вибірці рядків; далі кожен крок
+    бере випадковий батч, призначає рядки найближчим центроїдам і зсуває
+    центроїди з кроком 1/кількість. Пам'ять — лише центроїди; зупинка за
+    max_batches або коли згладжена інерція не покращується patience кроків.
+    """
+
+    def __init__(self, k: int, rng: random.Random, batch_size: int = CLUSTER_BATCH_SIZE,
+                 max_batches: int = CLUSTER_MAX_BATCHES, patience: int = CLUSTER_PATIENCE):
+        self.k = k
+        self.rng = rng
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.patience = patience
+        self.centroids = CentroidIndex()
+        self.batches = 0
+        self.inertia = 0.0
+
+    def init(self, matrix: HashedTfIdf) -> None:
+        """k-means++ на вибірці до CLUSTER_INIT_SAMPLE рядків."""
+        n = matrix.n_rows
+        sample = [matrix.row(i) for i in self.rng.sample(range(n), min(n, CLUSTER_INIT_SAMPLE))]
+        first = sample[self.rng.randrange(len(sample))]
+        self.centroids.add(first)
+        first_dict = dict(zip(*first))
+        d2 = [_sparse_d2(row, first_dict) for row in sample]
+        while len(self.centroids) < self.k:
+            total = sum(d2)
+            if total <= 0:
+                break  # різних точок менше, ніж k
+            threshold = self.rng.random() * total
+            acc, pick = 0.0, None
+            for i, value in enumerate(d2):
+                if value > 0:
+                    acc += value
+                    pick = i
+                    if acc >= threshold:
+                        break
+            chosen = sample[pick]
+            self.centroids.add(chosen)
+            chosen_dict = dict(zip(*chosen))
+            for i, row in enumerate(sample):
+                if d2[i] > 0:
+                    d2[i] = min(d2[i], _sparse_d2(row, chosen_dict))
+
+    def fit(self, matrix: HashedTfIdf) -> None:
+        n = matrix.n_rows
+        centroids = self.centroids
+        batch_size = min(self.batch_size, n)
+        alpha = min(1.0, 2.0 * batch_size / (n + 1))
+        best, smoothed, stale = math.inf, None, 0
+        for step in range(self.max_batches):
+            batch = self.rng.sample(range(n), batch_size) if batch_size < n else range(n)
+            assigned, inertia = [], 0.0
+            for i in batch:
+                row = matrix.row(i)
+                sqnorm = _sqnorm(row)
+                c, d2 = centroids.nearest(row, sqnorm)
+                assigned.append((c, row, sqnorm))
+                inertia += d2
+            for c, row, sqnorm in assigned:
+                centroids.update(c, row, sqnorm)
+            self.batches = step + 1
+
+            # зупинка, коли згладжена інерція батчів перестала зменшуватись
+            inertia /= batch_size
+            smoothed = inertia if smoothed is None else smoothed * (1 - alpha) + inertia * alpha
+            if smoothed < best * (1 - 1e-4):
+                best, stale = smoothed, 0
+            else:
+                stale += 1
+                if stale >= self.patience:
+                    break
+
+    def assign(self, matrix: HashedTfIdf) -> Tuple[array, array]:
+        """Кластер і відстань до центроїда для кожного рядка."""
+        labels, distances = array("i"), array("f")
+        nearest = self.centroids.nearest
+        inertia = 0.0
+        for i in range(matrix.n_rows):
+            row = matrix.row(i)
+            c, d2 = nearest(row, _sqnorm(row))
+            labels.append(c)
+            distances.append(math.sqrt(d2))
+            inertia += d2
+        self.inertia = inertia
+        return labels, distances
+
+
+def density_labels(sizes: Sequence[int], radius: Sequence[float],
+                   centroids: Sequence[Dict[int, float]], min_cluster: int) -> List[int]:
+    """
+    Щільнісна кластеризація мікрокластерів у дусі HDBSCAN.
+
+    Мікрокластери (зважені розміром) з'єднуються мінімальним остовним деревом
+    за відстанню взаємної досяжності max(core(a), core(b), d(a, b)), де core —
+    відстань, на якій навколо мікрокластера набирається min_cluster файлів.
+    Ієрархія одиночного зв'язку конденсується: гілки з меншою за min_cluster
+    кількістю файлів "випадають" із кластера, а з дерева вибираються кластери
+    з найбільшою стабільністю. Файли мікрокластерів, що випали до вибраного
+    кластера, — шум (-1).
+
+    Returns:
+        List[int]: Мітка для кожного мікрокластера (-1 — шум)
+    """
+    m = len(sizes)
+    if m == 0:
+        return []
+
+    # ---------- відстані та core-відстані ----------
+    dist = [[0.0] * m for _ in range(m)]
+    for a in range(m):
+        ca = centroids[a]
+        for b in range(a + 1, m):
+            dot = sum(v * centroids[b].get(j, 0.0) for j, v in ca.items())
+            dist[a][b] = dist[b][a] = math.sqrt(max(0.0, 2.0 - 2.0 * dot))
+    core = []
+    for a in range(m):
+        weight, value = sizes[a], radius[a]
+        for b in sorted((b for b in range(m) if b != a), key=dist[a].__getitem__):
+            if weight >= min_cluster:
+                break
+            weight += sizes[b]
+            value = max(value, dist[a][b])
+        core.append(max(value, MIN_DISTANCE))
+
+    # ---------- мінімальне остовне дерево (Прим) за взаємною досяжністю ----------
+    in_tree = [False] * m
+    best = [math.inf] * m
+    link = [-1] * m
+    best[0] = 0.0
+    edges = []
+    for _ in range(m):
+        a = min((i for i in range(m) if not in_tree[i]), key=best.__getitem__)
+        in_tree[a] = True
+        if link[a] >= 0:
+            edges.append((best[a], link[a], a))
+        for b in range(m):
+            if not in_tree[b]:
+                reach = max(core[a], core[b], dist[a][b])
+                if reach < best[b]:
+                    best[b], link[b] = reach, a
+    edges.sort()
+
+    # ---------- ієрархія одиночного зв'язку ----------
+    parent = list(range(m))
+    top = list(range(m))            # вузол ієрархії для кореня множини
+    size = list(sizes)
+    children: Dict[int, Tuple[int, int]] = {}
+    height: Dict[int, float] = {}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for weight, a, b in edges:
+        ra, rb = find(a), find(b)
+        node = len(size)
+        children[node] = (top[ra], top[rb])
+        height[node] = weight
+        size.append(size[top[ra]] + size[top[rb]])
+        parent[rb] = ra
+        top[ra] = node
+    root = top[find(0)]
+
+    def leaves(node):
+        stack, found = [node], []
+        while stack:
+            node = stack.pop()
+            if node < m:
+                found.append(node)
+            else:
+                stack.extend(children[node])
+        return found
+
+    # ---------- конденсоване дерево та стабільність ----------
+    birth, cluster_parent, stability, kids = [0.0], [-1], [0.0], [[]]
+    last_cluster = [0] * m
+    stack = [(root, 0)]
+    while stack:
+        node, cluster = stack.pop()
+        if node < m:
+            lam = max(1.0 / core[node], birth[cluster])
+            stability[cluster] += (lam - birth[cluster]) * sizes[node]
+            last_cluster[node] = cluster
+            continue
+        lam = 1.0 / max(height[node], MIN_DISTANCE)
+        left, right = children[node]
+        if size[left] >= min_cluster and size[right] >= min_cluster:
+            stability[cluster] += (lam - birth[cluster]) * size[node]
+            for child in (left, right):
+                birth.append(lam)
+                cluster_parent.append(cluster)
+                stability.append(0.0)
+                kids.append([])
+                kids[cluster].append(len(birth) - 1)
+                stack.append((child, len(birth) - 1))
+            continue
+        for child in (left, right):
+            if size[child] >= min_cluster:
+                stack.append((child, cluster))
+            else:
+                stability[cluster] += (lam - birth[cluster]) * size[child]
+                for leaf in leaves(child):
+                    last_cluster[leaf] = cluster
+
+    # ---------- вибір кластерів за стабільністю (знизу вгору) ----------
+    count = len(birth)
+    selected = [False] * count
+    subtree = list(stability)
+    for cluster in reversed(range(count)):
+        if not kids[cluster]:
+            selected[cluster] = True
+            continue
+        child_sum = sum(subtree[k] for k in kids[cluster])
+        if cluster != 0 and stability[cluster] >= child_sum:
+            selected[cluster] = True
+        else:
+            subtree[cluster] = child_sum
+
+    # вибраний кластер поглинає всіх нащадків (батьки мають менші номери)
+    owner: List[Optional[int]] = [None] * count
+    for cluster in range(count):
+        p = cluster_parent[cluster]
+        inherited = owner[p] if p >= 0 else None
+        owner[cluster] = inherited if inherited is not None else (cluster if selected[cluster] else None)
+
+    labels, numbering = [], {}
+    for micro in range(m):
+        cluster = owner[last_cluster[micro]]
+        if cluster is None:
+            labels.append(-1)
+        else:
+            labels.append(numbering.setdefault(cluster, len(numbering)))
+    return labels
+
+
+class ClusterAlgorithm(StructAlgorithm):
+    """
+    Автоматичне групування схожих файлів у кластери.
+
+    Описи перетворюються на хешовані TF-IDF вектори (поля опису + слова
+    шляху) і групуються міні-батч k-means (algo="kmeans") або щільнісно
+    (algo="hdbscan"): k-means на CLUSTER_DENSITY_MICRO мікрокластерів,
+    які об'єднуються за щільністю з урахуванням min_cluster; файли поза
+    щільними кластерами потрапляють у "unclustered". Папки — cluster_01,
+    cluster_02, ... у порядку спадання розміру кластера.
+    """
+
+    def __init__(self, vectorizer: str = "meta_tf_idf", algo: str = "kmeans", k: int = 8,
+                 min_cluster: Optional[int] = None, seed: Optional[int] = 0):
+        """
+        Raises:
+            ValueError: Якщо векторизатор/алгоритм не підтримується або параметри некоректні
+        """
+        if vectorizer != "meta_tf_idf":
+            raise ValueError(f"Vectorizer '{vectorizer}' is not available (supported: meta_tf_idf)")
+        if algo not in ("kmeans", "hdbscan"):
+            raise ValueError(f"Unknown clustering algorithm '{algo}' (expected 'kmeans' or 'hdbscan')")
+        if k < 2:
+            raise ValueError("k must be at least 2")
+        if min_cluster is not None and min_cluster < 2:
+            raise ValueError("min_cluster must be at least 2")
+        self.vectorizer = vectorizer
+        self.algo = algo
+        self.k = k
+        self.min_cluster = min_cluster or DEFAULT_MIN_CLUSTER
+        self.seed = seed
+        self._summary: Optional[Dict[str, Any]] = None
+
+    def run(self, descriptions: List[Dict]) -> List[Dict]:
+        return list(self.run_stream(descriptions))
+
+    def run_stream(self, descriptions: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Кластери відомі лише після всієї вибірки: за один прохід описи
+        векторизуються в компактну CSR-матрицю (шляхи — окремим списком),
+        далі — навчання, призначення кластерів і інструкції CREATE_DIR/MOVE_FILE.
+        """
+        rng = random.Random(self.seed)
+        timings: Dict[str, float] = {}
+
+        # час векторизації не включає очікування описів від попередніх стадій конвеєра
+        vectorize = 0.0
+        matrix = HashedTfIdf()
+        paths: List[Optional[str]] = []
+        for desc in descriptions:
+            t0 = time.perf_counter()
+            paths.append(desc.get("original_path"))
+            matrix.add(tokenize(desc))
+            vectorize += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        matrix.finalize()
+        timings["vectorize"] = vectorize + time.perf_counter() - t0
+
+        n = matrix.n_rows
+        self._summary = {"algo": self.algo, "files": n, "features_nnz": matrix.nnz, "timings": timings}
+        if n == 0:
+            self._summary.update({"clusters": 0, "noise_files": 0, "batches": 0})
+            return
+
+        k = min(self.k if self.algo == "kmeans" else CLUSTER_DENSITY_MICRO, n)
+        kmeans = MiniBatchKMeans(k, rng)
+
+        t0 = time.perf_counter()
+        kmeans.init(matrix)
+        timings["init"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        kmeans.fit(matrix)
+        timings["fit"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        labels, distances = kmeans.assign(matrix)
+        timings["assign"] = time.perf_counter() - t0
+
+        if self.algo == "hdbscan":
+            t0 = time.perf_counter()
+            labels = self._density(kmeans, labels, distances)
+            timings["density"] = time.perf_counter() - t0
+
+        # нумерація папок за спаданням розміру кластера
+        sizes = Counter(label for label in labels if label >= 0)
+        names = {
+            label: f"cluster_{rank:02d}"
+            for rank, (label, _) in enumerate(sorted(sizes.items(), key=lambda item: (-item[1], item[0])), 1)
+        }
+        self._summary.update({
+            "clusters": len(sizes),
+            "noise_files": n - sum(sizes.values()),
+            "batches": kmeans.batches,
+            "inertia": kmeans.inertia,
+            "cluster_sizes": {names[label]: size for label, size in sizes.items()}
+        })
+
+        t0 = time.perf_counter()
+        created_dirs: Dict[str, str] = {}
+        base_dir = None
+        for original_path, label in zip(paths, labels):
+            if base_dir is None:
+                base_dir = base_dir_for(original_path, self.root)
+            yield from place_file(base_dir, names.get(label, NOISE_LABEL), original_path, created_dirs)
+        timings["plan"] = time.perf_counter() - t0
+
+    def _density(self, kmeans: MiniBatchKMeans, labels: array, distances: array) -> List[int]:
+        """Мітки файлів за щільнісним об'єднанням мікрокластерів k-means."""
+        count = len(kmeans.centroids)
+        sizes, spread = [0] * count, [0.0] * count
+        for label, distance in zip(labels, distances):
+            sizes[label] += 1
+            spread[label] += distance
+
+        # порожні мікрокластери не беруть участі
+        used = [c for c in range(count) if sizes[c]]
+        terms = kmeans.centroids.top_terms(CLUSTER_CENTROID_TERMS)
+        micro_labels = density_labels(
+            [sizes[c] for c in used],
+            [spread[c] / sizes[c] for c in used],
+            [terms[c] for c in used],
+            self.min_cluster
+        )
+        by_centroid = dict(zip(used, micro_labels))
+        return [by_centroid[label] for label in labels]
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        return self._summary
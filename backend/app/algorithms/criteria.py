@@ -1,15 +1,136 @@
 import os
-from typing import Dict, List
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
 from app.core.base import StructAlgorithm
-from app.models.file_instruction import ActionType
+from app.algorithms.fields import DATE_FIELDS, to_number
+from app.algorithms.placement import base_dir_for, place_file
+from app.algorithms.rename import NameIndex, RenameTemplate
+from app.algorithms.rules import get_rule_set
+from app.utils.quantile_sketch import QuantileSketch
+
+# Поля, що групуються правилами класифікації (категорія розширення за замовчуванням)
+EXTENSION_FIELDS = {"mime_type", "real_extension"}
+# Квантилі за замовчуванням для bucket.type = "quantile" (квартилі)
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75)
+
+
+def _format_number(value: float) -> str:
+    return f"{value:.1f}".rstrip("0").rstrip(".")
+
+
+def _format_bound(field: str, value: float) -> str:
+    if field in DATE_FIELDS:
+        return datetime.fromtimestamp(value).strftime("%Y-%m-%d")
+    if field == "size_bytes":
+        for unit in ("B", "KB", "MB", "GB"):
+            if abs(value) < 1024:
+                return f"{_format_number(value)}{unit}"
+            value /= 1024
+        return f"{_format_number(value)}TB"
+    return _format_number(value)
+
+
+def _range_labels(field: str, bounds: Sequence[float]) -> List[str]:
+    """Назви бакетів за межами: under_A, A-B, ..., Z_and_over."""
+    names = [_format_bound(field, b) for b in bounds]
+    return (
+        [f"under_{names[0]}"] +
+        [f"{lo}-{hi}" for lo, hi in zip(names, names[1:])] +
+        [f"{names[-1]}_and_over"]
+    )
+
+
+class Bucketing:
+    """
+    Розбиття числового поля або дати на бакети.
+
+    range — межі задані явно; quantile — межі є квантилями розподілу поля
+    (bounds — їхні ймовірності), що оцінюються потоковим скетчем P² за один
+    прохід. Бакет значення v — bisect_right(межі, v): бакет i містить
+    значення з [межа i-1, межа i).
+    """
+
+    def __init__(self, field: str, bucket: Dict[str, Any]):
+        """
+        Raises:
+            ValueError: Якщо тип, межі або назви бакетів некоректні
+        """
+        self.field = field
+        self.type = bucket.get("type", "range")
+        labels = list(bucket.get("labels") or [])
+        bounds = bucket.get("bounds") or []
+
+        if self.type == "range":
+            if not bounds:
+                raise ValueError("bucket.bounds is required for range bucketing")
+            converted = [to_number(b) for b in bounds]
+            if any(b is None for b in converted):
+                raise ValueError(f"bucket.bounds must be numbers or dates, got {bounds}")
+            self.bounds: List[float] = converted
+        elif self.type == "quantile":
+            if bounds:
+                self.quantiles = [float(q) for q in bounds]
+            elif labels:
+                # рівночастотні бакети за кількістю назв
+                self.quantiles = [i / len(labels) for i in range(1, len(labels))]
+            else:
+                self.quantiles = list(DEFAULT_QUANTILES)
+            if not self.quantiles or any(not 0.0 < q < 1.0 for q in self.quantiles):
+                raise ValueError("bucket.bounds for quantile bucketing must be probabilities in (0, 1)")
+            self.bounds = []
+        else:
+            raise ValueError(f"Unknown bucket type '{self.type}' (expected 'range' or 'quantile')")
+
+        expected = (len(self.bounds) if self.type == "range" else len(self.quantiles)) + 1
+        reference = self.bounds if self.type == "range" else self.quantiles
+        if any(a >= b for a, b in zip(reference, reference[1:])):
+            raise ValueError("bucket.bounds must be strictly increasing")
+        if labels and len(labels) != expected:
+            raise ValueError(f"bucket.labels must contain {expected} names (one per bucket), got {len(labels)}")
+        self.labels = labels
+
+    def fit(self, sketch: QuantileSketch) -> None:
+        """Межі квантильних бакетів з оцінок скетчу."""
+        self.bounds = sketch.values()
+
+    def names(self) -> List[str]:
+        if self.labels:
+            return self.labels
+        names = _range_labels(self.field, self.bounds)
+        if self.type == "quantile":
+            names = [f"q{i + 1}_{name}" for i, name in enumerate(names)]
+        return names
+
 
 class CriteriaAlgorithm(StructAlgorithm):
-    def __init__(self, field="mime_type"):
+    def __init__(self, field: str = "mime_type", bucket: Optional[Dict[str, Any]] = None,
+                 rename_pattern: Optional[str] = None):
+        """
+        Args:
+            field: Поле опису, за яким групуються файли
+            bucket: Розбиття числового поля/дати на бакети (див. params_schema)
+            rename_pattern: Шаблон нового імені файлу
+
+        Raises:
+            ValueError: Якщо bucket або rename_pattern некоректні
+        """
         self.field = field                # параметр може надходити із params_schema
+        self.bucketing = Bucketing(field, bucket) if bucket else None
+        self.rename_pattern = rename_pattern
+        # Шаблон компілюється один раз на сесію
+        self.template = RenameTemplate(rename_pattern) if rename_pattern else None
+        # Категорія файлу залежить лише від нього самого, крім квантильних
+        # бакетів (межі — з усієї вибірки) і номера {n} у шаблоні імені
+        self.shardable = (self.bucketing is None or self.bucketing.type == "range") and \
+            not (self.template is not None and self.template.uses_counter)
+        # Правила класифікації за розширенням/MIME/шляхом/розміром (з конфігурації)
+        self.rules = get_rule_set()
 
     def run(self, descriptions: List[Dict]) -> List[Dict]:
         """
-        Створює інструкції для групування файлів за реальним розширенням.
+        Створює інструкції для групування файлів за вибраним полем.
         
         Args:
             descriptions: Список описів файлів (з method_extractor.run)
@@ -17,181 +138,105 @@ class CriteriaAlgorithm(StructAlgorithm):
         Returns:
             List[Dict]: Список інструкцій для виконання
         """
-        # Результуючий список інструкцій
-        instructions = []
-        
-        # Мапа для групування файлів за розширеннями
-        file_extensions = {}
-        
-        # Множина директорій, які потрібно створити
-        dirs_to_create = set()
+        return list(self.run_stream(descriptions))
+
+    def run_stream(self, descriptions: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Потоково створює інструкції: CREATE_DIR для категорії віддається перед
+        першим переміщенням у неї, далі — MOVE_FILE для кожного файлу
+        (RENAME_FILE, якщо задано rename_pattern). Конфлікти імен у категорії
+        розв'язуються суфіксами _1, _2, ... за індексом запланованих імен —
+        так само, як ShardedPlanner розв'язує їх між частинами: MOVE_FILE
+        з конфліктом стає RENAME_FILE.
 
-        # Отримуємо базову директорію (припускаємо, що всі файли знаходяться в одній базовій директорії)
+        Категорія файлу:
+          - без bucket: категорія розширення (для mime_type / real_extension)
+            або значення поля;
+          - bucket.type = "range": бакет за заданими межами, визначається
+            бінарним пошуком одразу для кожного файлу;
+          - bucket.type = "quantile": межі відомі лише після всього потоку,
+            тому шляхи і значення поля накопичуються в компактних колонках
+            (список шляхів + array('d')), а квантилі оцінює скетч P² з
+            пам'яттю O(1); бакети призначаються після проходу.
+        """
+        bucketing = self.bucketing
+        if bucketing is not None and bucketing.type == "quantile":
+            yield from self._run_quantile(descriptions, bucketing)
+            return
+
+        names = bucketing.names() if bucketing is not None else None
+        bounds = bucketing.bounds if bucketing is not None else None
+
+        # Директорії, для яких вже створено інструкцію: категорія → dst
+        created_dirs: Dict[str, str] = {}
+
+        # Базова директорія визначається за першим описом із шляхом
         base_dir = None
-        for desc in descriptions:
-            if "original_path" in desc:
-                base_dir = os.path.dirname(os.path.dirname(desc["original_path"]))
-                break
-        
-        if not base_dir:
-            # Якщо не вдалося отримати базову директорію, використовуємо поточну
-            base_dir = os.getcwd()
-        
-        # Класифікуємо файли за їх розширеннями
-        for desc in descriptions:
+
+        template = self.template
+        name_index = NameIndex() if self.resolve_names else None
+
+        for index, desc in enumerate(descriptions, 1):
             # Оригінальний шлях до файлу 
             original_path = desc.get("original_path")
-            
-            # Отримуємо розширення файлу
-            extension = desc.get("real_extension", "").lower()
-            if not extension:
-                extension = "unknown"
-            
-            # Визначаємо категорію для файлу
-            category = self._get_category_for_extension(extension)
-            
-            # Додаємо файл до відповідної категорії
-            if category not in file_extensions:
-                file_extensions[category] = []
-            
-            if original_path:
-                file_extensions[category].append({
-                    "path": original_path,
-                    "extension": extension
-                })
-            
-            # Додаємо директорію до множини директорій, які потрібно створити
-            dirs_to_create.add(category)
-        
-        # Створюємо інструкції для створення директорій
-        for dir_name in dirs_to_create:
-            # Створюємо повний шлях до нової директорії
-            full_dir_path = os.path.join(base_dir, dir_name)
-            
-            instructions.append({
-                "file_path": full_dir_path,  # Повний шлях до нової директорії
-                "action": ActionType.CREATE_DIR,
-                "params": {
-                    "path": dir_name
-                }
-            })
-        
-        # Створюємо інструкції для переміщення файлів
-        for category, files in file_extensions.items():
-            for file_info in files:
-                if not file_info["path"]:
-                    continue  # Пропускаємо файли без шляху
-                    
-                instructions.append({
-                    "file_path": file_info["path"],  # Повний шлях до файлу
-                    "action": ActionType.MOVE_FILE,
-                    "params": {
-                        "dst": os.path.join(category, "")  # Цільова директорія
-                    }
-                })
-        
-        return instructions
-    
-    def _get_category_for_extension(self, extension: str) -> str:
-        """
-        Визначає категорію директорії для заданого розширення файлу.
-        
-        Args:
-            extension: Розширення файлу (без крапки)
-            
-        Returns:
-            str: Назва категорії (шлях до директорії)
-        """
-        # Словник категорій за розширеннями
-        extension_categories = {
-            # Зображення
-            "jpg": "Images",
-            "jpeg": "Images",
-            "png": "Images",
-            "gif": "Images",
-            "bmp": "Images",
-            "tiff": "Images",
-            "svg": "Images",
-            "webp": "Images",
-            "ico": "Images",
-            
-            # Документи
-            "doc": "Documents/Word",
-            "docx": "Documents/Word",
-            "pdf": "Documents/PDF",
-            "txt": "Documents/Text",
-            "rtf": "Documents/Text",
-            "odt": "Documents/Word",
-            
-            # Таблиці
-            "xls": "Documents/Excel",
-            "xlsx": "Documents/Excel",
-            "csv": "Documents/Excel",
-            "ods": "Documents/Excel",
-            
-            # Презентації
-            "ppt": "Documents/PowerPoint",
-            "pptx": "Documents/PowerPoint",
-            "odp": "Documents/PowerPoint",
-            
-            # Код
-            "py": "Code/Python",
-            "js": "Code/JavaScript",
-            "html": "Code/Web",
-            "css": "Code/Web",
-            "java": "Code/Java",
-            "c": "Code/C",
-            "cpp": "Code/C++",
-            "h": "Code/Headers",
-            "json": "Code/Data",
-            "xml": "Code/Data",
-            
-            # Архіви
-            "zip": "Archives",
-            "rar": "Archives",
-            "tar": "Archives",
-            "gz": "Archives",
-            "7z": "Archives",
-            
-            # Виконувані файли
-            "exe": "Executables/Windows",
-            "dll": "Executables/Windows",
-            "bat": "Executables/Windows",
-            "sh": "Executables/Unix",
-            "app": "Executables/Mac",
-            
-            # Аудіо
-            "mp3": "Audio",
-            "wav": "Audio",
-            "ogg": "Audio",
-            "flac": "Audio",
-            "aac": "Audio",
-            
-            # Відео
-            "mp4": "Video",
-            "avi": "Video",
-            "mkv": "Video",
-            "mov": "Video",
-            "wmv": "Video",
-            
-            # Конфігурації
-            "ini": "Config",
-            "yaml": "Config",
-            "yml": "Config",
-            "toml": "Config",
-            "conf": "Config",
-            
-            # Бази даних
-            "db": "Databases",
-            "sqlite": "Databases",
-            "sql": "Databases",
-            
-            # Шрифти
-            "ttf": "Fonts",
-            "otf": "Fonts",
-            "woff": "Fonts",
-            "woff2": "Fonts",
-        }
-        
-        # Повертаємо категорію за розширенням або 'Other' якщо розширення невідоме
-        return extension_categories.get(extension, "Other")
+
+            if base_dir is None:
+                base_dir = base_dir_for(original_path, self.root)
+
+            if names is None:
+                category = self._category(desc)
+            else:
+                value = to_number(desc.get(self.field))
+                category = "unknown" if value is None else names[bisect_right(bounds, value)]
+
+            new_name = template.render(desc, index) if template is not None and original_path else None
+            yield from place_file(base_dir, category, original_path, created_dirs, new_name, name_index)
+
+    def _run_quantile(self, descriptions: Iterable[Dict], bucketing: Bucketing) -> Iterator[Dict]:
+        sketch = QuantileSketch(bucketing.quantiles)
+        paths: List[Optional[str]] = []
+        values = array("d")
+        nan = float("nan")
+        # Нові імена рендеряться під час проходу (опис далі не зберігається),
+        # конфлікти розв'язуються після призначення бакетів
+        template = self.template
+        rendered: List[Optional[str]] = []
+
+        for index, desc in enumerate(descriptions, 1):
+            paths.append(desc.get("original_path"))
+            if template is not None:
+                rendered.append(template.render(desc, index))
+            value = to_number(desc.get(self.field))
+            if value is None:
+                values.append(nan)
+            else:
+                values.append(value)
+                sketch.add(value)
+
+        if sketch.count:
+            bucketing.fit(sketch)
+            names = bucketing.names()
+            bounds = bucketing.bounds
+            # NaN (поле відсутнє) не порівнюється з межами — такі файли йдуть в "unknown"
+            indices = [bisect_right(bounds, v) if v == v else -1 for v in values]
+        else:
+            names, indices = [], [-1] * len(values)
+
+        created_dirs: Dict[str, str] = {}
+        base_dir = None
+        name_index = NameIndex() if self.resolve_names else None
+        for position, (original_path, index) in enumerate(zip(paths, indices)):
+            if base_dir is None:
+                base_dir = base_dir_for(original_path, self.root)
+            category = "unknown" if index < 0 else names[index]
+            new_name = rendered[position] if template is not None and original_path else None
+            yield from place_file(base_dir, category, original_path, created_dirs, new_name, name_index)
+
+    def _category(self, desc: Dict) -> str:
+        """Категорія файлу без бакетів."""
+        if self.field in EXTENSION_FIELDS:
+            return self.rules.classify(desc)
+        value = desc.get(self.field)
+        if value is None or value == "":
+            return "unknown"
+        return str(value).replace(os.sep, "_")
@@ -0,0 +1,247 @@
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from app.algorithms.placement import base_dir_for, place_file
+from app.config import DEDUP_MIN_SIZE, HASH_SAMPLE_SIZE, SCAN_QUEUE_DEPTH, SCAN_WORKERS
+from app.core.base import StructAlgorithm
+from app.models.file_instruction import ActionType
+from app.utils.external_sort import ExternalSorter
+from app.utils.file_analyzer import HashTier, get_file_fingerprint, get_sample_hash
+
+# Порядок рівнів хешу в межах групи розміру: файли без повного хешу йдуть
+# першими, тож до появи файлу з повним хешем уже відомо, чи потрібна група вибірок
+_TIER_RANK = {HashTier.SIZE.value: 0, HashTier.SAMPLE.value: 1, HashTier.FULL.value: 2}
+
+# Ключ вибірки для малих файлів: вибірка покрила б увесь файл, тож вони
+# одразу йдуть на повний хеш
+_WHOLE_FILE = ""
+
+ACTIONS = ("move", "hardlink", "quarantine")
+DEFAULT_TARGET_DIRS = {"move": "Duplicates", "quarantine": ".quarantine"}
+KEEP_RULES = ("oldest", "newest", "shortest_path", "first")
+
+
+def _repeated(records: Iterable[tuple], width: int) -> Iterator[tuple]:
+    """
+    Записи відсортованого потоку, чий ключ (перші width полів) зустрічається
+    щонайменше двічі. Пам'ять O(1): тримається лише попередній запис.
+    """
+    previous, emitted = None, False
+    for record in records:
+        if previous is not None and record[:width] == previous[:width]:
+            if not emitted:
+                yield previous
+                emitted = True
+            yield record
+        else:
+            emitted = False
+        previous = record
+
+
+def _parallel(records: Iterable[tuple], func: Callable[[tuple], Optional[tuple]]) -> Iterator[tuple]:
+    """
+    Застосувати func (читання файлу) до записів у пулі потоків з обмеженою
+    кількістю завдань у польоті; результати — у порядку завершення, None пропускаються.
+    """
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+        pending = set()
+        for record in records:
+            pending.add(pool.submit(func, record))
+            if len(pending) >= SCAN_QUEUE_DEPTH:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from (f.result() for f in done if f.result() is not None)
+        for future in pending:
+            result = future.result()
+            if result is not None:
+                yield result
+
+
+class DedupAlgorithm(StructAlgorithm):
+    """
+    Консолідація дублікатів за вмістом.
+
+    Кандидати звужуються каскадом, кожен крок — зовнішнє сортування
+    (ExternalSorter) і злиття сусідніх записів з однаковим ключем:
+      1. розмір — файли з унікальним розміром не читаються зовсім;
+      2. sample-хеш (початок/середина/кінець) — лише для груп однакового розміру;
+      3. повний SHA-256 — лише для груп зі збігом вибірки.
+    Хеші, вже обчислені сканером (file_hash і hash_tier опису), не
+    перераховуються; якщо вся група розміру має повні хеші, вибірка пропускається.
+    У пам'яті — лише буфер сортування і по блоку з кожної серії, тож
+    алгоритм масштабується на десятки мільйонів файлів.
+
+    У кожній групі однакового вмісту лишається одна канонічна копія (правило
+    keep), решта переміщується в target_dir зі збереженням відносного шляху
+    (move, quarantine) або замінюється жорстким посиланням (hardlink).
+    """
+
+    def __init__(self, action: str = "move", keep: str = "oldest", target_dir: Optional[str] = None,
+                 min_size: int = DEDUP_MIN_SIZE):
+        """
+        Raises:
+            ValueError: Якщо дія або правило вибору канонічної копії невідомі
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown dedup action '{action}' (expected one of {', '.join(ACTIONS)})")
+        if keep not in KEEP_RULES:
+            raise ValueError(f"Unknown keep rule '{keep}' (expected one of {', '.join(KEEP_RULES)})")
+        self.action = action
+        self.keep = keep
+        self.target_dir = (target_dir or DEFAULT_TARGET_DIRS.get(action, "")).strip("/\\")
+        self.min_size = max(0, min_size)
+        self._summary: Optional[Dict[str, Any]] = None
+        self._stats: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    # Однакові файли мають однаковий розмір, тож розбиття за розміром
+    # лишає кожну групу дублікатів в одній частині
+    shardable = True
+
+    def run(self, descriptions: List[Dict]) -> List[Dict]:
+        return list(self.run_stream(descriptions))
+
+    def shard_key(self, desc: Dict):
+        return desc.get("size_bytes")
+
+    def _rank(self, path: str, mtime: float):
+        """Ключ вибору канонічної копії: менший — кращий."""
+        if self.keep == "oldest":
+            return mtime
+        if self.keep == "newest":
+            return -mtime
+        if self.keep == "shortest_path":
+            return len(path)
+        return 0  # "first" — за шляхом
+
+    def _count(self, key: str, value: int = 1) -> None:
+        # Лічильники оновлюються і з потоків читання файлів
+        with self._lock:
+            self._stats[key] += value
+
+    def run_stream(self, descriptions: Iterable[Dict]) -> Iterator[Dict]:
+        timings: Dict[str, float] = {}
+        stats = self._stats = {"files": 0, "size_candidates": 0, "sample_hashed": 0, "full_hashed": 0,
+                               "read_errors": 0, "groups": 0, "duplicates": 0, "reclaimable_bytes": 0}
+        self._summary = {"action": self.action, "keep": self.keep, **stats, "spilled_runs": 0, "timings": timings}
+
+        with ExternalSorter() as by_size, ExternalSorter() as by_sample, ExternalSorter() as by_content:
+            # ---------- 1. розмір ----------
+            t0 = time.perf_counter()
+            common_dir, last_dir, first_path = None, None, None
+            for desc in descriptions:
+                path, size = desc.get("original_path"), desc.get("size_bytes")
+                if not path or size is None:
+                    continue
+                stats["files"] += 1
+                if size < self.min_size:
+                    continue
+                tier = desc.get("hash_tier") or (HashTier.FULL.value if desc.get("file_hash") else HashTier.SIZE.value)
+                by_size.add((size, _TIER_RANK.get(tier, 0), path, desc.get("file_hash"), desc.get("mtime") or 0.0))
+                directory = os.path.dirname(path)
+                if directory != last_dir:
+                    last_dir = directory
+                    common_dir = directory if common_dir is None else os.path.commonpath((common_dir, directory))
+                first_path = first_path or path
+            timings["collect"] = time.perf_counter() - t0
+
+            # ---------- 2. вибірка для груп однакового розміру ----------
+            t0 = time.perf_counter()
+            by_sample.extend(self._size_groups(by_size.sorted(), by_content))
+            timings["size_and_sample"] = time.perf_counter() - t0
+
+            # ---------- 3. повний хеш для груп зі збігом вибірки ----------
+            t0 = time.perf_counter()
+            by_content.extend(_parallel(_repeated(by_sample.sorted(), 2), self._full))
+            timings["full_hash"] = time.perf_counter() - t0
+
+            # ---------- 4. групи однакового вмісту → інструкції ----------
+            t0 = time.perf_counter()
+            base_dir = base_dir_for(first_path, self.root)
+            # Відносні шляхи в target_dir — від кореня сесії, якщо він відомий
+            common_dir = self.root or common_dir
+            created_dirs: Dict[str, str] = {}
+            canonical = None
+            for size, digest, _, path in _repeated(by_content.sorted(), 2):
+                if canonical is None or canonical[:2] != (size, digest):
+                    canonical = (size, digest, path)
+                    stats["groups"] += 1
+                    continue
+                stats["duplicates"] += 1
+                stats["reclaimable_bytes"] += size
+                yield from self._instructions(path, canonical[2], base_dir, common_dir, created_dirs)
+            timings["plan"] = time.perf_counter() - t0
+
+            self._summary.update(stats)
+            self._summary["unique_size"] = by_size.count - stats["size_candidates"]
+            self._summary["spilled_runs"] = by_size.spilled_runs + by_sample.spilled_runs + by_content.spilled_runs
+
+    def _size_groups(self, records: Iterable[tuple], by_content: ExternalSorter) -> Iterator[tuple]:
+        """
+        Записи груп однакового розміру з ключем вибірки (size, sample, path, hash, mtime).
+
+        Сортування ставить файли без повного хешу першими в групі: якщо їх
+        немає, файли з повним хешем ідуть одразу в by_content без читання.
+        """
+        def with_sample(record):
+            size, rank, path, file_hash, mtime = record
+            if size <= 3 * HASH_SAMPLE_SIZE:
+                return size, _WHOLE_FILE, path, file_hash if rank == 2 else None, mtime
+            if rank == 1:
+                return size, file_hash, path, None, mtime
+            try:
+                sample = get_sample_hash(path, size)
+            except OSError as e:
+                print(f"Помилка читання файлу {path}: {e}")
+                self._count("read_errors")
+                return None
+            self._count("sample_hashed")
+            return size, sample, path, file_hash if rank == 2 else None, mtime
+
+        def need_sample():
+            current, needs = None, False
+            for record in _repeated(records, 1):
+                size, rank, path, file_hash, mtime = record
+                self._stats["size_candidates"] += 1
+                if size != current:
+                    current, needs = size, False
+                if rank < 2:
+                    needs = True
+                if needs:
+                    yield record
+                else:
+                    by_content.add((size, file_hash, self._rank(path, mtime), path))
+
+        yield from _parallel(need_sample(), with_sample)
+
+    def _full(self, record: tuple) -> Optional[tuple]:
+        size, _, path, file_hash, mtime = record
+        if file_hash is None:
+            try:
+                file_hash = get_file_fingerprint(path, None, HashTier.FULL)["file_hash"]
+            except OSError as e:
+                print(f"Помилка читання файлу {path}: {e}")
+                self._count("read_errors")
+                return None
+            self._count("full_hashed")
+        return size, file_hash, self._rank(path, mtime), path
+
+    def _instructions(self, path: str, canonical: str, base_dir: str, common_dir: str,
+                      created_dirs: Dict[str, str]) -> Iterator[Dict]:
+        if self.action == "hardlink":
+            yield {
+                "file_path": path,
+                "action": ActionType.HARDLINK_FILE,
+                "params": {"target": canonical}
+            }
+            return
+        # Відносний шлях зберігається, щоб однойменні дублікати не конфліктували
+        rel_dir = os.path.relpath(os.path.dirname(path), common_dir)
+        category = self.target_dir if rel_dir == os.curdir else os.path.join(self.target_dir, rel_dir)
+        yield from place_file(base_dir, category.replace(os.sep, "/"), path, created_dirs,
+                              duplicate_of=canonical)
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        return self._summary
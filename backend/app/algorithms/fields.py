@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Any, Optional
+
+# Поля-дати: значення — timestamp або ISO-рядок, межі можна задавати так само
+DATE_FIELDS = {"mtime", "created_at"}
+
+
+def to_number(value: Any) -> Optional[float]:
+    """Числове значення поля (дата → timestamp); None, якщо значення немає або воно не числове."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return None
+    return None
@@ -0,0 +1,95 @@
+import os
+from typing import Dict, Iterator, Optional
+
+from app.algorithms.rename import NameIndex
+from app.models.file_instruction import ActionType
+
+
+def base_dir_for(original_path: Optional[str], root: Optional[str] = None) -> str:
+    """Базова директорія плану: корінь сесії, якщо відомий, інакше — за першим файлом."""
+    if root:
+        return root
+    # Припускаємо, що всі файли знаходяться в одній базовій директорії
+    return os.path.dirname(os.path.dirname(original_path)) if original_path else os.getcwd()
+
+
+def claim_destination(instr: Dict, name_index: NameIndex) -> Dict:
+    """
+    Зайняти цільове ім'я MOVE_FILE/RENAME_FILE в індексі запланованих імен.
+
+    Якщо ім'я вже зайняте, повертається RENAME_FILE з вільним ім'ям
+    (суфікси _1, _2, ...); інші інструкції повертаються без змін.
+    """
+    action = instr["action"]
+    params = instr.get("params") or {}
+    if action == ActionType.MOVE_FILE:
+        directory = params.get("dst", "").rstrip("\\").rstrip("/")
+        name = os.path.basename(instr.get("file_path") or "")
+    elif action == ActionType.RENAME_FILE:
+        directory, name = os.path.split(params.get("dst", ""))
+    else:
+        return instr
+
+    claimed = name_index.claim(directory, name)
+    if claimed == name:
+        return instr
+    return {
+        **instr,
+        "action": ActionType.RENAME_FILE,
+        "params": {**params, "dst": os.path.join(directory, claimed)}
+    }
+
+
+def place_file(base_dir: str, category: str, original_path: Optional[str],
+               created_dirs: Dict[str, str], new_name: Optional[str] = None,
+               name_index: Optional[NameIndex] = None, **extra_params) -> Iterator[Dict]:
+    """
+    CREATE_DIR для нової категорії (перед першим переміщенням у неї) і
+    MOVE_FILE файлу в неї (RENAME_FILE, якщо задано нове ім'я).
+
+    Args:
+        base_dir: Базова директорія плану
+        category: Відносний шлях цільової директорії
+        original_path: Шлях файлу (None — лише створити директорію)
+        created_dirs: Уже створені директорії: категорія → dst (оновлюється)
+        new_name: Нове ім'я файлу в категорії (None — ім'я не змінюється)
+        name_index: Індекс запланованих імен; якщо задано, конфлікти імен
+            розв'язуються суфіксами (claim_destination)
+        **extra_params: Додаткові параметри інструкції MOVE_FILE
+    """
+    # Створюємо інструкцію для нової директорії
+    dst = created_dirs.get(category)
+    if dst is None:
+        dst = created_dirs[category] = os.path.join(category, "")  # Цільова директорія
+        yield {
+            "file_path": os.path.join(base_dir, category),  # Повний шлях до нової директорії
+            "action": ActionType.CREATE_DIR,
+            "params": {
+                "path": category
+            }
+        }
+
+    if not original_path:
+        return  # Пропускаємо файли без шляху
+
+    if new_name is not None:
+        # Переміщення з перейменуванням: dst — відносний шлях разом з новим ім'ям
+        instr = {
+            "file_path": original_path,
+            "action": ActionType.RENAME_FILE,
+            "params": {
+                "dst": dst + new_name,
+                **extra_params
+            }
+        }
+    else:
+        # Створюємо інструкцію для переміщення файлу
+        instr = {
+            "file_path": original_path,  # Повний шлях до файлу
+            "action": ActionType.MOVE_FILE,
+            "params": {
+                "dst": dst,
+                **extra_params
+            }
+        }
+    yield claim_destination(instr, name_index) if name_index is not None else instr
@@ -0,0 +1,157 @@
+import os
+import re
+import time
+from string import Formatter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.algorithms.fields import DATE_FIELDS, to_number
+
+# Значення для поля, якого немає в описі файлу
+MISSING_VALUE = "unknown"
+
+# Символи, недопустимі в імені файлу (розділювачі шляху і зарезервовані у Windows)
+_UNSAFE_CHARS = re.compile(r'[/\\:*?"<>|\x00]')
+
+
+# Спеціальні поля: обчислюються раз на файл (ім'я розбирається один раз)
+_SPECIAL_FIELDS = ("original", "ext", "name", "n")
+
+
+def _value_formatter(field: str, spec: str, conversion: Optional[str]) -> Callable[[Any], str]:
+    """Функція, що форматує значення одного поля шаблону."""
+    if field in DATE_FIELDS:
+        date_format = spec or "%Y-%m-%d"
+
+        def render(value):
+            timestamp = to_number(value)
+            if timestamp is None:
+                return MISSING_VALUE
+            return time.strftime(date_format, time.localtime(timestamp))
+        return render
+
+    convert = {None: None, "s": str, "r": repr, "a": ascii}[conversion]
+
+    def render(value):
+        if value is None or value == "":
+            return MISSING_VALUE
+        if convert is not None:
+            value = convert(value)
+        return format(value, spec) if spec else str(value)
+    return render
+
+
+class RenameTemplate:
+    """
+    Шаблон нового імені файлу, скомпільований один раз.
+
+    Синтаксис — як у str.format: {поле[:формат]}. Поля — будь-які поля опису
+    файлу і спеціальні:
+      {original} — ім'я без розширення, {ext} — розширення без крапки,
+      {name} — повне ім'я, {n} — порядковий номер файлу (напр. {n:05d}).
+    Для полів-дат (mtime, created_at) формат — strftime ({created_at:%Y-%m-%d}).
+
+    Шаблон розбирається на літерали і функції полів під час компіляції, тож
+    на файл припадає один розбір імені, виклики функцій полів і одне
+    з'єднання рядків.
+    """
+
+    def __init__(self, pattern: str):
+        """
+        Raises:
+            ValueError: Якщо шаблон некоректний
+        """
+        if not pattern or not isinstance(pattern, str):
+            raise ValueError("rename_pattern must be a non-empty string")
+        self.pattern = pattern
+        parts: List[Any] = []
+        try:
+            parsed = list(Formatter().parse(pattern))
+        except ValueError as e:
+            raise ValueError(f"Invalid rename_pattern '{pattern}': {e}") from None
+        for literal, field, spec, conversion in parsed:
+            if literal:
+                parts.append(literal)
+            if field is None:
+                continue
+            if not field or not field.replace("_", "").isalnum():
+                raise ValueError(f"Invalid field '{{{field}}}' in rename_pattern (expected a plain field name)")
+            if conversion not in (None, "s", "r", "a"):
+                raise ValueError(f"Invalid conversion '!{conversion}' in rename_pattern")
+            if spec and "{" in spec:
+                raise ValueError("Nested fields are not supported in rename_pattern")
+            # Джерело значення: індекс спеціального поля або ім'я поля опису
+            source = _SPECIAL_FIELDS.index(field) if field in _SPECIAL_FIELDS else field
+            if source.__class__ is int and field != "n" and not spec and not conversion:
+                parts.append(source)  # частина імені без форматування
+            else:
+                parts.append((source, _value_formatter(field, spec, conversion)))
+        self._parts = tuple(parts)
+        self._static = all(isinstance(p, str) for p in parts)
+        # {n} залежить від порядку всього потоку файлів
+        self.uses_counter = any(field == "n" for _, field, _, _ in parsed)
+
+    def render(self, desc: Dict, index: int = 0) -> str:
+        """
+        Нове ім'я файлу (без директорії). Небезпечні для імені символи
+        замінюються на "_"; порожній результат — початкове ім'я.
+        """
+        path = desc.get("original_path") or ""
+        name = path[path.rfind(os.sep) + 1:]
+        if self._static:
+            result = "".join(self._parts)
+        else:
+            stem, dot, ext = name.rpartition(".")
+            if not stem:
+                # без розширення або прихований файл (".bashrc")
+                stem, ext = name, desc.get("real_extension") or ""
+            special = (stem, ext, name, index)
+            pieces = []
+            for part in self._parts:
+                kind = part.__class__
+                if kind is str:
+                    pieces.append(part)
+                elif kind is int:
+                    pieces.append(special[part])
+                else:
+                    source, formatter = part
+                    pieces.append(formatter(special[source] if source.__class__ is int else desc.get(source)))
+            result = "".join(pieces)
+        result = _UNSAFE_CHARS.sub("_", result).strip().rstrip(".")
+        if not result or result in (".", ".."):
+            return name or MISSING_VALUE
+        return result
+
+
+class NameIndex:
+    """
+    Хеш-індекс запланованих шляхів для розв'язання конфліктів імен.
+
+    claim(dir, name) повертає вільне ім'я в директорії: саме name або
+    name_1, name_2, ... (суфікс перед розширенням). Для кожного імені
+    запам'ятовується наступний суфікс, тож серія однакових імен
+    розв'язується за O(1) на файл, а файлова система не опитується.
+    """
+
+    def __init__(self):
+        self._taken = set()
+        self._next_suffix: Dict[Tuple[str, str], int] = {}
+        # Регістронезалежні файлові системи Windows
+        self._fold = os.name == "nt"
+
+    def claim(self, directory: str, name: str) -> str:
+        key = (directory, name.lower() if self._fold else name)
+        if key not in self._taken:
+            self._taken.add(key)
+            return name
+
+        stem, ext = os.path.splitext(name)
+        suffix = self._next_suffix.get(key, 1)
+        while True:
+            candidate = f"{stem}_{suffix}{ext}"
+            candidate_key = (directory, candidate.lower() if self._fold else candidate)
+            suffix += 1
+            if candidate_key not in self._taken:
+                break
+        self._next_suffix[key] = suffix
+        self._taken.add(candidate_key)
+        return candidate
@@ -0,0 +1,246 @@
+import json
+import os
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from app.config import STRUCTURE_CONFIG_PATH
+from app.utils.scan_filter import compile_globs
+
+# Категорії за розширенням (без крапки, в нижньому регістрі); конфігурація
+# може доповнити або перевизначити їх ключем "extensions"
+DEFAULT_EXTENSION_CATEGORIES: Mapping[str, str] = MappingProxyType({
+    # Зображення
+    "jpg": "Images", "jpeg": "Images", "png": "Images", "gif": "Images", "bmp": "Images",
+    "tiff": "Images", "svg": "Images", "webp": "Images", "ico": "Images",
+
+    # Документи
+    "doc": "Documents/Word", "docx": "Documents/Word", "odt": "Documents/Word",
+    "pdf": "Documents/PDF",
+    "txt": "Documents/Text", "rtf": "Documents/Text",
+
+    # Таблиці
+    "xls": "Documents/Excel", "xlsx": "Documents/Excel", "csv": "Documents/Excel", "ods": "Documents/Excel",
+
+    # Презентації
+    "ppt": "Documents/PowerPoint", "pptx": "Documents/PowerPoint", "odp": "Documents/PowerPoint",
+
+    # Код
+    "py": "Code/Python", "js": "Code/JavaScript", "html": "Code/Web", "css": "Code/Web",
+    "java": "Code/Java", "c": "Code/C", "cpp": "Code/C++", "h": "Code/Headers",
+    "json": "Code/Data", "xml": "Code/Data",
+
+    # Архіви
+    "zip": "Archives", "rar": "Archives", "tar": "Archives", "gz": "Archives", "7z": "Archives",
+
+    # Виконувані файли
+    "exe": "Executables/Windows", "dll": "Executables/Windows", "bat": "Executables/Windows",
+    "sh": "Executables/Unix", "app": "Executables/Mac",
+
+    # Аудіо
+    "mp3": "Audio", "wav": "Audio", "ogg": "Audio", "flac": "Audio", "aac": "Audio",
+
+    # Відео
+    "mp4": "Video", "avi": "Video", "mkv": "Video", "mov": "Video", "wmv": "Video",
+
+    # Конфігурації
+    "ini": "Config", "yaml": "Config", "yml": "Config", "toml": "Config", "conf": "Config",
+
+    # Бази даних
+    "db": "Databases", "sqlite": "Databases", "sql": "Databases",
+
+    # Шрифти
+    "ttf": "Fonts", "otf": "Fonts", "woff": "Fonts", "woff2": "Fonts",
+})
+
+DEFAULT_CATEGORY = "Other"
+
+_RULE_KEYS = {"category", "extensions", "mime", "glob", "min_size", "max_size"}
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    return [value] if isinstance(value, (str, int, float)) else list(value)
+
+
+class Rule:
+    """
+    Скомпільоване правило класифікації. Предикати перевіряються від
+    дешевших до дорожчих: розмір, префікс MIME, glob шляху. Розширення
+    перевіряються не тут, а таблицею диспетчеризації RuleSet.
+    """
+    __slots__ = ("category", "extensions", "mime_prefixes", "min_size", "max_size",
+                 "_name_glob", "_path_glob")
+
+    def __init__(self, spec: Dict[str, Any]):
+        """
+        Raises:
+            ValueError: Якщо правило некоректне
+        """
+        if not isinstance(spec, dict):
+            raise ValueError(f"Rule must be an object, got {spec!r}")
+        unknown = set(spec) - _RULE_KEYS
+        if unknown:
+            raise ValueError(f"Unknown rule keys: {', '.join(sorted(unknown))}")
+        category = spec.get("category")
+        if not category or not isinstance(category, str):
+            raise ValueError(f"Rule has no category: {spec!r}")
+        self.category = category.strip("/\\")
+
+        self.extensions = frozenset(str(e).lower().lstrip(".") for e in _as_list(spec.get("extensions")))
+        self.mime_prefixes = tuple(str(m).lower() for m in _as_list(spec.get("mime")))
+        self.min_size = spec.get("min_size")
+        self.max_size = spec.get("max_size")
+        # Як у фільтрах сканування: шаблон без "/" — для імені, з "/" — для шляху
+        globs = [str(g) for g in _as_list(spec.get("glob"))]
+        self._name_glob = compile_globs([g for g in globs if "/" not in g])
+        self._path_glob = compile_globs([g for g in globs if "/" in g])
+
+    @property
+    def conditional(self) -> bool:
+        """Чи має правило предикати, крім розширення."""
+        return bool(self.mime_prefixes or self._name_glob or self._path_glob or
+                    self.min_size is not None or self.max_size is not None)
+
+    def matches(self, desc: Dict) -> bool:
+        if self.min_size is not None or self.max_size is not None:
+            size = desc.get("size_bytes")
+            if size is None:
+                return False
+            if self.min_size is not None and size < self.min_size:
+                return False
+            if self.max_size is not None and size > self.max_size:
+                return False
+        if self.mime_prefixes and not (desc.get("mime_type") or "").lower().startswith(self.mime_prefixes):
+            return False
+        if self._name_glob is not None or self._path_glob is not None:
+            path = (desc.get("original_path") or "").replace(os.sep, "/")
+            if self._name_glob is not None and not self._name_glob.match(path.rsplit("/", 1)[-1]):
+                return False
+            if self._path_glob is not None and not self._path_glob.match(path):
+                return False
+        return True
+
+
+# Запис таблиці: готова категорія або (умовні правила по порядку, категорія за замовчуванням)
+_Entry = Union[str, Tuple[Tuple[Rule, ...], str]]
+
+
+class RuleSet:
+    """
+    Незмінний скомпільований набір правил класифікації.
+
+    Правила перевіряються по порядку, перше, що спрацювало, визначає
+    категорію; далі — таблиця категорій за розширенням, далі — default.
+    Під час компіляції для кожного відомого розширення заздалегідь
+    обчислюється запис таблиці диспетчеризації: лише ті умовні правила,
+    що можуть спрацювати для цього розширення, і категорія, якою
+    завершується ланцюжок. Якщо умовних правил немає, запис — просто
+    рядок категорії, тож класифікація більшості файлів — один пошук у dict.
+    """
+
+    def __init__(self, rules: Sequence[Rule] = (), extensions: Optional[Mapping[str, str]] = None,
+                 default: str = DEFAULT_CATEGORY):
+        self.rules = tuple(rules)
+        self.default = default
+        categories = dict(DEFAULT_EXTENSION_CATEGORIES)
+        categories.update({str(k).lower().lstrip("."): v for k, v in (extensions or {}).items()})
+        self.extension_categories: Mapping[str, str] = MappingProxyType(categories)
+
+        known = set(categories)
+        for rule in self.rules:
+            known |= rule.extensions
+        # "unknown" — для файлів без розширення, як і раніше
+        self._dispatch: Mapping[str, _Entry] = MappingProxyType(
+            {ext: self._compile_entry(ext, categories.get(ext, default)) for ext in known | {"unknown"}}
+        )
+        self._fallback = self._compile_entry(None, default)
+
+    def _compile_entry(self, extension: Optional[str], fallback: str) -> _Entry:
+        candidates = []
+        for rule in self.rules:
+            if rule.extensions and extension not in rule.extensions:
+                continue
+            if not rule.conditional:
+                # Безумовне правило завершує ланцюжок
+                fallback = rule.category
+                break
+            candidates.append(rule)
+        return (tuple(candidates), fallback) if candidates else fallback
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "RuleSet":
+        """
+        Набір правил з конфігурації:
+            {"rules": [{"category": ..., "extensions": [...], "mime": [...],
+                        "glob": [...], "min_size": ..., "max_size": ...}, ...],
+             "extensions": {"heic": "Images", ...},
+             "default": "Other"}
+
+        Raises:
+            ValueError: Якщо конфігурація некоректна
+        """
+        if not isinstance(config, dict):
+            raise ValueError("Structure config must be a JSON object")
+        extensions = config.get("extensions") or {}
+        if not isinstance(extensions, dict):
+            raise ValueError("'extensions' must map extensions to categories")
+        return cls(
+            rules=[Rule(spec) for spec in config.get("rules") or []],
+            extensions=extensions,
+            default=config.get("default") or DEFAULT_CATEGORY
+        )
+
+    def classify(self, desc: Dict) -> str:
+        """Категорія (відносний шлях директорії) для опису файлу."""
+        extension = desc.get("real_extension") or "unknown"
+        entry = self._dispatch.get(extension)
+        if entry is None:
+            entry = self._dispatch.get(extension.lower(), self._fallback)
+        if entry.__class__ is str:
+            return entry
+        rules, fallback = entry
+        for rule in rules:
+            if rule.matches(desc):
+                return rule.category
+        return fallback
+
+
+_DEFAULT_RULE_SET = RuleSet()
+
+_lock = threading.Lock()
+_loaded: Dict[str, Any] = {"key": None, "rules": _DEFAULT_RULE_SET}
+
+
+def get_rule_set(path: Optional[str] = STRUCTURE_CONFIG_PATH) -> RuleSet:
+    """
+    Поточний набір правил з файлу конфігурації (STRUCTURE_CONFIG_PATH).
+
+    Файл компілюється один раз і перекомпільовується, коли змінюються його
+    mtime або розмір (перевіряється одним stat на виклик), тож правки
+    підхоплюються без перезапуску. Якщо файл некоректний, помилка
+    друкується і лишається попередній набір правил.
+    """
+    if not path:
+        return _DEFAULT_RULE_SET
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        print(f"Помилка читання конфігурації структурування {path}: {e}")
+        return _loaded["rules"]
+
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if _loaded["key"] != key:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    rules = RuleSet.from_config(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Помилка в конфігурації структурування {path}: {e}")
+            else:
+                _loaded["rules"] = rules
+                print(f"Завантажено правила структурування з {path}: {len(rules.rules)} правил")
+            # Некоректна версія файлу не перечитується, доки він не зміниться
+            _loaded["key"] = key
+        return _loaded["rules"]
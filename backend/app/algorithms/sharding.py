@@ -0,0 +1,163 @@
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.algorithms.placement import claim_destination
+from app.algorithms.rename import NameIndex
+from app.config import PLAN_WORKERS, SORT_TMP_DIR
+from app.core.base import StructAlgorithm
+from app.models.file_instruction import ActionType
+from app.utils.external_sort import BlockWriter, read_blocks
+
+
+def _remove(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _plan_shard(algorithm_cls: type, params: Dict[str, Any], root: Optional[str],
+                shard_path: str) -> Tuple[str, int, Optional[Dict[str, Any]], float]:
+    """
+    Спланувати одну частину у воркері.
+
+    Алгоритм створюється у воркері з тих самих параметрів (скомпільовані
+    правила й шаблони не серіалізуються), описи читаються з файлу частини,
+    інструкції пишуться в тимчасовий файл, щоб не передавати їх через pickle
+    одним великим списком.
+
+    Returns:
+        (файл інструкцій, кількість інструкцій, summary алгоритму, час, с)
+    """
+    started = time.perf_counter()
+    algorithm = algorithm_cls(**params)
+    algorithm.root = root
+    # Конфлікти імен розв'язуються один раз — при злитті частин
+    algorithm.resolve_names = False
+    writer = BlockWriter(SORT_TMP_DIR, prefix="plan-shard-")
+    try:
+        for instr in algorithm.run_stream(read_blocks(shard_path)):
+            writer.add(instr)
+    except BaseException:
+        _remove(writer.close())
+        raise
+    return writer.close(), writer.count, algorithm.summary(), time.perf_counter() - started
+
+
+class ShardedPlanner:
+    """
+    Паралельне планування шардованого алгоритму (shardable = True).
+
+    1. Описи розподіляються на shards частин за crc32(shard_key(опис)) —
+       за замовчуванням за директорією файлу, тобто за піддеревами; частини
+       пишуться у тимчасові файли, тож пам'ять не залежить від розміру вибірки.
+    2. Кожна частина планується окремим екземпляром алгоритму в пулі процесів.
+    3. Часткові плани зливаються в порядку частин, поки решта ще планується:
+       CREATE_DIR однієї директорії лишається один, а конфлікти цільових
+       імен розв'язуються суфіксами _1, _2 (claim_destination, як і
+       place_file без шардування) — MOVE_FILE з конфліктом стає RENAME_FILE
+       з новим ім'ям. Воркери конфлікти не розв'язують (resolve_names = False),
+       тож план збігається з нешардованим з точністю до порядку.
+
+    Інтерфейс як у StructAlgorithm: run_stream() і summary().
+    """
+
+    def __init__(self, algorithm: StructAlgorithm, params: Optional[Dict[str, Any]], shards: int,
+                 workers: Optional[int] = None):
+        """
+        Args:
+            algorithm: Екземпляр алгоритму (ключ розбиття, клас і корінь для воркерів)
+            params: Параметри, з якими алгоритм створюється у воркерах
+            shards: Кількість частин
+            workers: Кількість процесів (за замовчуванням PLAN_WORKERS)
+
+        Raises:
+            ValueError: Якщо алгоритм не підтримує шардування
+        """
+        if not algorithm.shardable:
+            raise ValueError(f"{algorithm.__class__.__name__} does not support sharded planning")
+        self.algorithm = algorithm
+        self.params = dict(params or {})
+        self.shards = max(1, shards)
+        self.workers = max(1, min(workers or PLAN_WORKERS, self.shards))
+        self._summary: Optional[Dict[str, Any]] = None
+
+    def run(self, descriptions: List[Dict]) -> List[Dict]:
+        return list(self.run_stream(descriptions))
+
+    def run_stream(self, descriptions: Iterable[Dict]) -> Iterator[Dict]:
+        timings: Dict[str, float] = {}
+        stats = {"instructions": 0, "create_dir_deduped": 0, "collisions_resolved": 0}
+        self._summary = {"shards": self.shards, "workers": self.workers, **stats,
+                         "shard_files": [], "shard_summaries": [], "timings": timings}
+
+        inputs = [BlockWriter(SORT_TMP_DIR, prefix="plan-input-") for _ in range(self.shards)]
+        outputs: List[str] = []
+        try:
+            # ---------- 1. розбиття ----------
+            t0 = time.perf_counter()
+            shard_key, shards = self.algorithm.shard_key, self.shards
+            for desc in descriptions:
+                inputs[zlib.crc32(str(shard_key(desc)).encode("utf-8", "surrogateescape")) % shards].add(desc)
+            for writer in inputs:
+                writer.close()
+            self._summary["shard_files"] = [writer.count for writer in inputs]
+            timings["partition"] = time.perf_counter() - t0
+
+            # ---------- 2-3. планування частин і злиття ----------
+            wait_time = merge_time = 0.0
+            created_dirs = set()
+            name_index = NameIndex()
+            algorithm_cls, root = type(self.algorithm), self.algorithm.root
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [
+                    pool.submit(_plan_shard, algorithm_cls, self.params, root, writer.path)
+                    for writer in inputs if writer.count
+                ]
+                for future in futures:
+                    t0 = time.perf_counter()
+                    path, count, summary, elapsed = future.result()
+                    wait_time += time.perf_counter() - t0
+                    outputs.append(path)
+                    self._summary["shard_summaries"].append({"instructions": count, "seconds": elapsed,
+                                                             "algorithm": summary})
+                    for instr in read_blocks(path):
+                        t0 = time.perf_counter()
+                        merged = self._merge(instr, created_dirs, name_index, stats)
+                        merge_time += time.perf_counter() - t0
+                        if merged is not None:
+                            stats["instructions"] += 1
+                            yield merged
+                    _remove(path)
+            # очікування частин, що ще плануються, після злиття попередніх
+            timings["plan_wait"] = wait_time
+            timings["merge"] = merge_time
+            self._summary.update(stats)
+        finally:
+            for writer in inputs:
+                _remove(writer.close())
+            for path in outputs:
+                _remove(path)
+
+    @staticmethod
+    def _merge(instr: Dict, created_dirs: set, name_index: NameIndex, stats: Dict) -> Optional[Dict]:
+        """Інструкція часткового плану у зведеному плані (None — дублікат)."""
+        if instr["action"] == ActionType.CREATE_DIR:
+            path = (instr.get("params") or {}).get("path", "")
+            if path in created_dirs:
+                stats["create_dir_deduped"] += 1
+                return None
+            created_dirs.add(path)
+            return instr
+
+        merged = claim_destination(instr, name_index)
+        if merged is not instr:
+            stats["collisions_resolved"] += 1
+        return merged
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        return self._summary
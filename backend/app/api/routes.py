@@ -1,18 +1,27 @@
 import json
 from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Path as FsPath
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional
 from uuid import UUID
 
 from app.models.algorithm_registry import AlgorithmRegistry
 from app.models.method_registry import MethodRegistry
 
-from ..database import get_db
+from ..config import DESCRIPTION_PAGE_SIZE, DESCRIPTION_PAGE_SIZE_MAX, FS_PAGE_SIZE, FS_PAGE_SIZE_MAX
+from ..database import get_db, get_read_db
 from ..services.session_service import SessionService
 from ..schemas import session_schemas as sch
 
 router = APIRouter(tags=["Structuring Sessions"])
 
+def _process_summary(summary: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Підсумок обробки або HTTP-помилка: сесію не знайдено чи обробка не вдалася."""
+    if summary is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Session not found")
+    if "error" in summary:
+        raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, summary["error"])
+    return summary
+
 # ---------- Довідники ----------
 @router.get(
     "/analysis-methods",
@@ -26,12 +35,44 @@ def get_struct_algorithms():
     return SessionService.get_struct_algorithms()
 
 @router.get("/fs/entries", response_model=Dict[str, Any])
-def get_fs_entries(dir: str = Query(..., description="Absolute directory path")):
+def get_fs_entries(
+    dir: str = Query(..., description="Absolute directory path"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(FS_PAGE_SIZE, ge=1, le=FS_PAGE_SIZE_MAX),
+    sort: Literal["name", "size", "modified", "type"] = Query("name"),
+    order: Literal["asc", "desc"] = Query("asc")
+):
     try:
-        return {"directory": dir, "entries": SessionService.get_fs_entries(dir)}
+        return {"directory": dir, "entries": SessionService.get_fs_entries(dir, cursor, limit, sort, order)}
+    except ValueError as exc:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, str(exc))
     except Exception as exc:
             raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(exc))
 
+@router.post("/fs/details", response_model=Dict[str, Dict[str, Any]])
+def get_fs_details(payload: sch.FsDetailsRequest):
+    try:
+        return SessionService.get_fs_details(payload.paths)
+    except ValueError as exc:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, str(exc))
+
+# ---------- Спостерігачі директорій ----------
+@router.post("/watchers", status_code=status.HTTP_201_CREATED, response_model=Dict[str, Any])
+def start_watcher(payload: sch.WatchRequest):
+    try:
+        return SessionService.start_watch(payload.directory, payload.recursive)
+    except (ValueError, RuntimeError, OSError) as exc:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, str(exc))
+
+@router.get("/watchers", response_model=List[Dict[str, Any]])
+def list_watchers():
+    return SessionService.list_watches()
+
+@router.delete("/watchers", status_code=status.HTTP_204_NO_CONTENT)
+def stop_watcher(directory: str = Query(..., description="Watched directory path")):
+    if not SessionService.stop_watch(directory):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Watcher not found")
+
 # ---------- 1. Сесії ----------
 @router.post("/sessions/", status_code=status.HTTP_201_CREATED,
              response_model=sch.SessionShort)
@@ -42,7 +83,7 @@ def create_session(
     return SessionService.create_session(db, payload)
 
 @router.get("/sessions/", response_model=List[sch.SessionShort])
-def list_sessions(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
+def list_sessions(skip: int = 0, limit: int = 50, db: Session = Depends(get_read_db)):
     return SessionService.list_sessions(db, skip, limit)
 
 @router.get(
@@ -50,7 +91,7 @@ def list_sessions(skip: int = 0, limit: int = 50, db: Session = Depends(get_db))
 )
 def get_session(
     session_id: UUID,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     print(f"SEISSION_ID: {session_id}")
     sess = SessionService.get_session(db, session_id)
@@ -66,17 +107,71 @@ def analyze_and_plan(
 ):
     try:
         summary = SessionService.analyze_and_plan(db, session_id,
-                                                payload.method,
-                                                payload.algorithm)
-        if summary is None:
-            raise HTTPException(status.HTTP_404_NOT_FOUND, "Session not found")
-        return summary
+                                                payload.method_ids,
+                                                payload.algorithm,
+                                                payload.incremental,
+                                                payload.params)
+    except ValueError as exc:
+        raise HTTPException(status.HTTP_409_CONFLICT, str(exc))
     except Exception as e:
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
+    return _process_summary(summary)
+
+@router.post("/sessions/{session_id}/replan", response_model=sch.ProcessSummary)
+def replan(
+    session_id: UUID,
+    payload: sch.ReplanRequest,
+    db: Session = Depends(get_db)
+):
+    try:
+        summary = SessionService.replan(db, session_id, payload.algorithm, payload.params)
+    except ValueError as exc:
+        raise HTTPException(status.HTTP_409_CONFLICT, str(exc))
+    return _process_summary(summary)
+
+# ---------- Описи файлів ----------
+@router.get("/sessions/{session_id}/descriptions", response_model=Dict[str, Any])
+def get_descriptions(
+    session_id: UUID,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DESCRIPTION_PAGE_SIZE, ge=1, le=DESCRIPTION_PAGE_SIZE_MAX),
+    sort: Literal["id", "path", "size", "mtime", "mime", "extension", "hash"] = Query("path"),
+    order: Literal["asc", "desc"] = Query("asc"),
+    mime: Optional[str] = Query(None, description="Exact MIME type"),
+    extension: Optional[str] = Query(None, description="File extension without the dot"),
+    hash: Optional[str] = Query(None, description="Exact content hash"),
+    min_size: Optional[int] = Query(None, ge=0),
+    max_size: Optional[int] = Query(None, ge=0),
+    db: Session = Depends(get_read_db)
+):
+    filters = {"mime": mime, "extension": extension, "hash": hash, "min_size": min_size, "max_size": max_size}
+    try:
+        page = SessionService.get_descriptions(db, session_id, cursor, limit, sort, order, filters)
+    except ValueError as exc:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, str(exc))
+    if page is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Session not found")
+    return page
+
+@router.post("/sessions/{session_id}/estimate", response_model=Dict[str, Any])
+def estimate(
+    session_id: UUID,
+    payload: sch.EstimateRequest,
+    db: Session = Depends(get_read_db)
+):
+    try:
+        result = SessionService.estimate(db, session_id, payload.method_ids, payload.algorithm,
+                                         payload.time_budget, payload.max_probes, payload.seed,
+                                         payload.params)
+    except ValueError as exc:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, str(exc))
+    if result is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Session not found")
+    return result
 
 # ---------- Прев’ю ----------
 @router.get("/sessions/{session_id}/preview", response_model=sch.PreviewTree)
-def preview(session_id: UUID, db: Session = Depends(get_db)):
+def preview(session_id: UUID, db: Session = Depends(get_read_db)):
     try:
         tree = SessionService.get_preview(db, session_id)
         if tree is None:
@@ -85,9 +180,45 @@ def preview(session_id: UUID, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
 
+# ---------- Перевірка плану ----------
+@router.get("/sessions/{session_id}/validation", response_model=Dict[str, Any])
+def get_validation(session_id: UUID, db: Session = Depends(get_read_db)):
+    sess = SessionService.get_session(db, session_id)
+    if not sess:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Session not found")
+    if sess.plan_findings is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Plan has not been validated")
+    return sess.plan_findings
+
+@router.post("/sessions/{session_id}/validate", response_model=Dict[str, Any])
+def validate_plan(session_id: UUID, db: Session = Depends(get_db)):
+    findings = SessionService.validate_plan(db, session_id)
+    if findings is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Session not found")
+    return findings
+
+# ---------- Відновлення плану ----------
+@router.post("/sessions/{session_id}/plan/resume", response_model=sch.ProcessSummary)
+def resume_plan(session_id: UUID, db: Session = Depends(get_db)):
+    try:
+        summary = SessionService.resume_plan(db, session_id)
+    except ValueError as exc:
+        raise HTTPException(status.HTTP_409_CONFLICT, str(exc))
+    return _process_summary(summary)
+
+@router.delete("/sessions/{session_id}/plan", response_model=Dict[str, Any])
+def discard_plan(session_id: UUID, db: Session = Depends(get_db)):
+    try:
+        result = SessionService.discard_plan(db, session_id)
+    except ValueError as exc:
+        raise HTTPException(status.HTTP_409_CONFLICT, str(exc))
+    if result is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Session not found")
+    return result
+
 # ---------- Застосування ----------
 @router.post("/sessions/{session_id}/apply", response_model=sch.ApplyResult)
-async def apply_plan(
+def apply_plan(
     session_id: UUID,
     payload: sch.ApplyRequest = Body(...),
     db: Session = Depends(get_db)
@@ -100,12 +231,16 @@ async def apply_plan(
 
 # ---------- 6. Прогрес ----------
 @router.get("/sessions/{session_id}/progress", response_model=sch.ProgressReport)
-async def get_progress(session_id: UUID, db: Session = Depends(get_db)):
+def get_progress(session_id: UUID, db: Session = Depends(get_read_db)):
     progress = SessionService.get_progress(db, session_id)
     if progress is None:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Session not found")
     return progress
 
+@router.get("/admin/result-cache", response_model=Dict[str, Any])
+def result_cache_stats():
+    return SessionService.get_result_cache_stats()
+
 @router.post("/admin/sync-methods")
 def sync_methods(db: Session = Depends(get_db)):
     methods_dict = SessionService.get_analysis_methods()
@@ -147,32 +282,34 @@ def sync_methods(db: Session = Depends(get_db)):
 def sync_algorithms(db: Session = Depends(get_db)):
     algorithms_list = SessionService.get_struct_algorithms()
 
-    added = []
+    # Upsert: нові алгоритми додаються, наявні отримують актуальні опис і params_schema
+    # (прапорець enabled, заданий адміністратором, не змінюється)
+    added, updated = [], []
     for algo in algorithms_list:
         algo_id = algo["id"]
+        fields = {
+            "description": algo.get("description", ""),
+            "params_schema": json.dumps(algo.get("params_schema", {})),
+            "scope": algo.get("scope", "*"),
+            "impl_class": algo.get("impl_class", "")
+        }
 
         exists = db.query(AlgorithmRegistry).filter_by(id=algo_id).first()
         if not exists:
-            new_algo = AlgorithmRegistry(
-                id=algo_id,
-                description=algo.get("description", ""),
-                params_schema=json.dumps(algo.get("params_schema", {})),
-                scope=algo.get("scope", "*"),
-                impl_class=algo.get("impl_class", ""),
-                enabled=algo.get("enabled", True)
-            )
-            db.add(new_algo)
+            db.add(AlgorithmRegistry(id=algo_id, enabled=algo.get("enabled", True), **fields))
             added.append(algo_id)
             print(f"Added new algorithm to DB: {algo_id}")
-        else:
-            return {
-                "status": "already_exists",
-                "algorithm_id": algo_id
-            }
+        elif any(getattr(exists, name) != value for name, value in fields.items()):
+            for name, value in fields.items():
+                setattr(exists, name, value)
+            updated.append(algo_id)
+            print(f"Updated algorithm in DB: {algo_id}")
 
     db.commit()
     return {
         "status": "ok",
         "added": added,
-        "total_added": len(added)
-    }
\ No newline at end of file
+        "updated": updated,
+        "total_added": len(added),
+        "total_updated": len(updated)
+    }
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Базова директорія додатку
@@ -6,8 +7,96 @@ BASE_DIR = Path(__file__).parent
 # Налаштування бази даних
 DATABASE_URL = f"sqlite:///{BASE_DIR}/file_structure.db"
 
+# SQLite: WAL, окремі рушії читання (пул) і запису (одне з'єднання на процес)
+SQLITE_BUSY_TIMEOUT_MS = 30_000                     # очікування блокування іншим процесом
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024                # байтів файлу БД, що читаються через mmap
+SQLITE_CACHE_SIZE_KB = 64 * 1024                    # кеш сторінок на з'єднання
+DB_READ_POOL_SIZE = 8                               # з'єднань читання на процес
+DB_WRITE_QUEUE_TIMEOUT = 600                        # с очікування в черзі запису
+
 DEBUG = True
 
+# Файл правил структурування (run.py --config); перечитується після змін
+STRUCTURE_CONFIG_PATH = os.environ.get("STRUCTURE_CONFIG_PATH")
+
+# Налаштування сканування
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) + 4)   # кількість воркерів пулу
+SCAN_QUEUE_DEPTH = SCAN_WORKERS * 4                 # макс. кількість файлів "у польоті"
+
+# Хешування: розмір блоку читання
+HASH_BUFFER_SIZE = 1024 * 1024
+
+# Розмір одного фрагмента для sample-хешу (початок/середина/кінець файлу)
+HASH_SAMPLE_SIZE = 64 * 1024
+
+# Скільки перших байтів файлу передається libmagic (from_buffer)
+MAGIC_HEADER_SIZE = 64 * 1024
+
+# Потоковий конвеєр scan → extract → plan → persist
+PIPELINE_MAX_IN_FLIGHT = 1024                       # розмір черги між стадіями
+PERSIST_CHUNK_SIZE = 5000                           # інструкцій в одному executemany
+PERSIST_COMMIT_SIZE = 5000                          # інструкцій на транзакцію (маркер відновлення)
+APPLY_PROGRESS_BATCH = 500                          # інструкцій apply між комітами статусів і лічильників
+PLAN_FINDINGS_LIMIT = 1000                          # скільки знахідок перевірки плану зберігати
+PLAN_SHARDS = 1                                     # частин паралельного планування (1 — без шардування)
+PLAN_WORKERS = os.cpu_count() or 1                  # процесів для планування частин
+
+# Пул процесів для CPU-важких методів аналізу (MethodExtractor.cpu_bound)
+EXTRACT_WORKERS = os.cpu_count() or 1
+EXTRACT_CHUNK_SIZE = 8                              # файлів в одній порції run_batch
+EXTRACT_ITEM_TIMEOUT = 60                           # ліміт часу на файл, с
+
+# Оцінка обсягу роботи (/sessions/{id}/estimate) випадковими пробами дерева
+ESTIMATE_TIME_BUDGET = 3.0                          # с на проби дерева
+ESTIMATE_MAX_PROBES = 5000
+ESTIMATE_SAMPLE_FILES = 200                         # макс. файлів, на яких запускаються метод і алгоритм
+ESTIMATE_FULL_HASH_LIMIT = 64 * 1024 * 1024         # більші файли вибірки не читаються повністю
+
+# Кеш відбитків файлів (хеші та тип за device/inode/size/mtime)
+FINGERPRINT_CACHE_ENABLED = True
+FINGERPRINT_DB_PATH = BASE_DIR / "fingerprints.db"
+FINGERPRINT_CACHE_MAX_ENTRIES = 5_000_000
+FINGERPRINT_CACHE_MAX_AGE_DAYS = 90
+
+# Кеш результатів методів аналізу між сесіями (за хешем вмісту)
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_DB_PATH = BASE_DIR / "results.db"
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Знімок директорій для інкрементального сканування
+SNAPSHOT_DB_PATH = BASE_DIR / "snapshots.db"
+DELTA_PATHS_LIMIT = 1000                            # скільки шляхів змін повертати у звіті
+
+# Спостереження за директоріями через inotify (живий каталог дескрипторів)
+WATCH_COALESCE_SECONDS = 0.5                        # пауза в подіях, після якої застосовується пакет
+WATCH_MAX_DELAY_SECONDS = 5.0                       # макс. затримка застосування при безперервних подіях
+
+# Кластеризація (алгоритм CLUSTER)
+CLUSTER_HASH_FEATURES = 2 ** 18                     # розмірність хешованого простору ознак
+CLUSTER_BATCH_SIZE = 1024                           # рядків у міні-батчі k-means
+CLUSTER_MAX_BATCHES = 300                           # макс. кроків міні-батч k-means
+CLUSTER_PATIENCE = 10                               # кроків без покращення інерції до зупинки
+CLUSTER_INIT_SAMPLE = 4096                          # вибірка для ініціалізації k-means++
+CLUSTER_DENSITY_MICRO = 64                          # мікрокластерів для щільнісного режиму
+CLUSTER_CENTROID_TERMS = 64                         # ознак центроїда для відстаней між мікрокластерами
+
+# Зовнішнє сортування (напр. пошук дублікатів на десятках мільйонів файлів)
+SORT_BUFFER_RECORDS = 200_000                       # записів у пам'яті до скидання серії на диск
+SORT_TMP_DIR = None                                 # директорія тимчасових серій (None — системна)
+
+# Пошук дублікатів (алгоритм DEDUP)
+DEDUP_MIN_SIZE = 1                                  # менші файли (порожні) не вважаються дублікатами
+
+# Перегляд файлової системи (/fs/entries, /fs/details)
+FS_PAGE_SIZE = 200                                  # рядків на сторінку за замовчуванням
+FS_PAGE_SIZE_MAX = 1000
+FS_DETAILS_BATCH_MAX = 500                          # макс. шляхів в одному запиті деталей
+
+# Перегляд збережених описів файлів сесії (keyset-пагінація)
+DESCRIPTION_PAGE_SIZE = 200
+DESCRIPTION_PAGE_SIZE_MAX = 1000
+FS_HASH_SIZE_LIMIT = 50 * 1024 * 1024               # хеш рахується лише для менших файлів
+
 # Налаштування API
 API_PREFIX = "/api"
 API_TITLE = "API структурування файлів"
@@ -1,17 +1,69 @@
+import os
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 
 class MethodExtractor(ABC):
+    # Дайджести (назви hashlib), які сканер має обчислити за той самий прохід читання
+    digests: Tuple[str, ...] = ()
+    # Версія результату: змінюється разом із форматом/логікою опису, щоб
+    # не брати з кешу результати попередньої версії
+    version: str = "1"
+    # Чи залежить опис лише від вмісту файлу (тоді його можна кешувати за хешем)
+    cacheable: bool = True
+    # id методів (MethodRegistry), чиї поля потрібні цьому методу; вони
+    # виконуються раніше, а їхні поля доступні в file_info
+    depends_on: Tuple[str, ...] = ()
+    # CPU-важкі методи (парсинг документів, аудіо) виконуються в пулі процесів
+    cpu_bound: bool = False
+
     @abstractmethod
     def run(self, file_info: Dict) -> Dict:
         """file_info = повертає dict-опис."""
 
+    def run_batch(self, batch: List[Dict]) -> List[Dict]:
+        """
+        Опис порції файлів; результати — у тому ж порядку, що й batch.
+        За замовчуванням викликає run для кожного файлу; методи, яким вигідна
+        пакетна обробка (спільна модель, один запуск парсера), перевизначають його.
+        """
+        return [self.run(file_info) for file_info in batch]
+
 
 class StructAlgorithm(ABC):
+    # Чи можна планувати частини вибірки незалежно (ShardedPlanner): результат
+    # не залежить від файлів інших частин, крім конфліктів імен, що
+    # розв'язуються злиттям
+    shardable: bool = False
+    # Коренева директорія сесії; задається сервісом перед запуском, щоб
+    # відносні шляхи плану не залежали від того, які файли потрапили в частину
+    root: Optional[str] = None
+    # Чи розв'язує алгоритм конфлікти цільових імен сам (place_file з NameIndex);
+    # у воркерах ShardedPlanner вимкнено — конфлікти розв'язуються при злитті
+    resolve_names: bool = True
+
     @abstractmethod
     def run(self, descriptions: List[Dict]) -> List[Dict]:
         """
         descriptions = список dict-описів, які потрібно обробити.
         return = cписок dict-інструкцій, які потрібно буде виконати.
         """
+
+    def run_stream(self, descriptions: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Потоковий варіант run: приймає ітератор описів і віддає інструкції по мірі готовності.
+        За замовчуванням збирає всі описи у список; алгоритми, яким не потрібна
+        вся вибірка одразу, перевизначають цей метод.
+        """
+        yield from self.run(list(descriptions))
+
+    def shard_key(self, desc: Dict) -> Any:
+        """
+        Ключ розбиття на частини: описи з однаковим ключем плануються разом.
+        За замовчуванням — директорія файлу (розбиття за піддеревами).
+        """
+        return os.path.dirname(desc.get("original_path") or "")
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        """Статистика останнього запуску (етапи, час) для підсумку обробки; None — немає."""
+        return None
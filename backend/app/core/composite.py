@@ -0,0 +1,93 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.utils.file_analyzer import SharedFileBuffers
+
+
+class CompositeExtractor:
+    """
+    Кілька методів аналізу як один прохід по файлах.
+
+    Методи виконуються в порядку залежностей (depends_on); кожен отримує
+    дескриптор файлу, поля вже виконаних методів і спільні буфери файлу
+    ("buffers"), тож файл відкривається один раз для всіх методів.
+    Результат — {id методу: опис}, щоб кеш результатів працював по кожному
+    методу окремо; merge() зводить його в один опис.
+    """
+
+    def __init__(self, members: Sequence[Tuple[str, type]]):
+        """
+        Args:
+            members: Пари (id методу, клас MethodExtractor), вже впорядковані функцією order
+        """
+        self.members = [(method_id, cls()) for method_id, cls in members]
+        self.digests = tuple(dict.fromkeys(d for _, cls in members for d in cls.digests))
+        self.cpu_bound = any(cls.cpu_bound for _, cls in members)
+
+        # Опис кешується, лише якщо і метод, і всі його залежності залежать тільки від вмісту
+        self.cacheable: Dict[str, bool] = {}
+        for method_id, cls in members:
+            self.cacheable[method_id] = cls.cacheable and all(
+                self.cacheable.get(dep, False) for dep in cls.depends_on
+            )
+
+    def run(self, file_info: Dict, cached: Optional[Dict[str, Dict]] = None) -> Dict[str, Dict]:
+        return self.run_batch([file_info], [cached or {}])[0]
+
+    def run_batch(self, batch: List[Dict], cached: Optional[List[Dict[str, Dict]]] = None) -> List[Dict[str, Dict]]:
+        """
+        Опис порції файлів усіма методами; кожен метод отримує всю порцію
+        через свій run_batch. Описи з cached не перераховуються.
+        """
+        cached = cached or [{} for _ in batch]
+        buffers = [
+            SharedFileBuffers(info["original_path"], self.digests, info.get("digests"))
+            for info in batch
+        ]
+        fields: List[Dict] = [{} for _ in batch]
+        results: List[Dict[str, Dict]] = [{} for _ in batch]
+
+        for method_id, extractor in self.members:
+            todo = [i for i in range(len(batch)) if method_id not in cached[i]]
+            if todo:
+                described = extractor.run_batch([
+                    {**batch[i], **fields[i], "buffers": buffers[i]} for i in todo
+                ])
+                for i, dsc in zip(todo, described):
+                    results[i][method_id] = dsc
+            for i in range(len(batch)):
+                if method_id in cached[i]:
+                    results[i][method_id] = cached[i][method_id]
+                fields[i].update(results[i][method_id])
+
+        return results
+
+    @staticmethod
+    def merge(results: Dict[str, Dict]) -> Dict:
+        merged: Dict = {}
+        for dsc in results.values():
+            merged.update(dsc)
+        return merged
+
+    @staticmethod
+    def order(classes: Dict[str, type]) -> List[Tuple[str, type]]:
+        """
+        Впорядкувати методи за залежностями (топологічне сортування).
+        Незалежні методи лишаються в порядку запиту.
+
+        Raises:
+            ValueError: Якщо залежності утворюють цикл
+        """
+        ordered: List[Tuple[str, type]] = []
+        done = set()
+        remaining = dict(classes)
+        while remaining:
+            ready = [
+                method_id for method_id, cls in remaining.items()
+                if all(dep in done for dep in cls.depends_on if dep in classes)
+            ]
+            if not ready:
+                raise ValueError(f"Circular method dependencies: {', '.join(remaining)}")
+            for method_id in ready:
+                ordered.append((method_id, remaining.pop(method_id)))
+                done.add(method_id)
+        return ordered
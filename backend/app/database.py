@@ -1,16 +1,111 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, literal
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-from .config import DATABASE_URL
+from .config import (
+    DATABASE_URL, DB_READ_POOL_SIZE, DB_WRITE_QUEUE_TIMEOUT,
+    SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE
+)
 
 Base = declarative_base()
 
+
+def _read_only_url(url: str) -> str:
+    """URL того самого файлу SQLite у режимі лише читання (інші БД — без змін)."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+        return url
+    return f"sqlite:///file:{parsed.database}?mode=ro&uri=true"
+
+
+# Перші слова інструкцій, що пишуть у БД (DML і DDL)
+_WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "ALTER", "DROP")
+
+
+def _configure_sqlite(engine, read_only: bool) -> None:
+    """
+    PRAGMA для кожного нового з'єднання SQLite:
+      journal_mode=WAL — читачі не блокуються записом і не блокують його;
+      synchronous=NORMAL — у WAL fsync лише на checkpoint, коміт дешевий;
+      busy_timeout — очікування блокування іншим процесом замість
+      "database is locked"; mmap_size, cache_size — читання без зайвих копій.
+
+    Транзакція запису починається (BEGIN IMMEDIATE) лише перед першою
+    інструкцією, що пише, як у модулі sqlite3 за замовчуванням: читання до
+    неї виконуються без відкритої транзакції, тож сесія, що лише читає,
+    не тримає блокувань і не заважає запису інших процесів. Блокування
+    запису береться одразу повністю — транзакція не падає при переході від
+    читання до запису ("database is locked" на застарілому знімку), поки
+    пише інший процес. Рушій читання починає звичайний BEGIN, щоб кілька
+    запитів бачили один знімок.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        # Транзакціями керує SQLAlchemy (події begin), а не модуль sqlite3
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        if not read_only:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size=-{int(SQLITE_CACHE_SIZE_KB)}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def on_begin(connection):
+        if read_only:
+            connection.exec_driver_sql("BEGIN")
+        else:
+            connection.info["sqlite_begin_pending"] = True
+
+    if read_only:
+        return
+
+    @event.listens_for(engine, "commit")
+    @event.listens_for(engine, "rollback")
+    def on_end(connection):
+        # Транзакція без жодного запису: BEGIN так і не виконувався
+        connection.info.pop("sqlite_begin_pending", None)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def on_execute(connection, cursor, statement, parameters, context, executemany):
+        if (connection.info.get("sqlite_begin_pending")
+                and statement.lstrip()[:7].upper().startswith(_WRITE_STATEMENTS)):
+            del connection.info["sqlite_begin_pending"]
+            cursor.execute("BEGIN IMMEDIATE")
+
+
+# Рушій запису: одне з'єднання на процес. Пул з одного з'єднання і є чергою
+# запису — сесії, що змінюють БД, чекають його по черзі (до
+# DB_WRITE_QUEUE_TIMEOUT с), а між процесами uvicorn запис серіалізує SQLite
+# (BEGIN IMMEDIATE + busy_timeout)
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False}
+    connect_args={"check_same_thread": False},
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=DB_WRITE_QUEUE_TIMEOUT
+)
+_configure_sqlite(engine, read_only=False)
+
+# Рушій читання: пул з'єднань лише для читання. У WAL читач бачить останній
+# закомічений стан і не чекає на запис, що триває (apply, планування)
+read_engine = create_engine(
+    _read_only_url(DATABASE_URL),
+    connect_args={"check_same_thread": False},
+    pool_size=DB_READ_POOL_SIZE,
+    max_overflow=DB_READ_POOL_SIZE
 )
+_configure_sqlite(read_engine, read_only=True)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 # 3. Залежність для FastAPI
 def get_db():
@@ -19,3 +114,76 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Залежність для маршрутів, що лише читають (прогрес, прев'ю, списки)
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Разове заповнення колонок, доданих до існуючої БД (таблиця, колонка) → SQL.
+# Лічильники apply для сесій, застосованих до їх появи, рахуються з інструкцій
+_BACKFILL = {
+    ("struct_sessions", "processed_total"):
+        "UPDATE struct_sessions SET processed_total = (SELECT COUNT(*) FROM file_instructions i "
+        "WHERE i.session_id = struct_sessions.id AND i.status != 'PENDING')",
+    ("struct_sessions", "applied_total"):
+        "UPDATE struct_sessions SET applied_total = (SELECT COUNT(*) FROM file_instructions i "
+        "WHERE i.session_id = struct_sessions.id AND i.status = 'APPLIED')",
+    ("struct_sessions", "failed_total"):
+        "UPDATE struct_sessions SET failed_total = (SELECT COUNT(*) FROM file_instructions i "
+        "WHERE i.session_id = struct_sessions.id AND i.status = 'FAILED')",
+}
+
+
+def _column_ddl(column, dialect) -> str:
+    """Опис колонки для ALTER TABLE ADD COLUMN (тип і скалярне значення за замовчуванням)."""
+    ddl = f"{column.name} {column.type.compile(dialect=dialect)}"
+    default = column.default
+    if default is not None and default.is_scalar and default.arg is not None:
+        value = getattr(default.arg, "value", default.arg)
+        ddl += " DEFAULT " + str(literal(value, type_=column.type).compile(
+            dialect=dialect, compile_kwargs={"literal_binds": True}))
+    return ddl
+
+
+def upgrade_schema(bind=engine) -> list:
+    """
+    Ідемпотентне оновлення схеми існуючої БД під поточні моделі.
+
+    create_all створює лише відсутні таблиці й не змінює наявних, тож
+    колонки, додані до моделей пізніше, додаються тут через
+    ALTER TABLE ADD COLUMN (з разовим заповненням із _BACKFILL), а нові
+    індекси — через CREATE INDEX IF NOT EXISTS. Повторний запуск нічого
+    не змінює.
+
+    Returns:
+        list: Додані колонки й індекси ("таблиця.колонка", "таблиця.індекс")
+    """
+    added = []
+    existing_tables = set(inspect(bind).get_table_names())
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {col["name"] for col in inspect(conn).get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {_column_ddl(column, bind.dialect)}")
+                backfill = _BACKFILL.get((table.name, column.name))
+                if backfill:
+                    conn.exec_driver_sql(backfill)
+                added.append(f"{table.name}.{column.name}")
+            indexes = {index["name"] for index in inspect(conn).get_indexes(table.name)}
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                if index.name not in indexes:
+                    index.create(conn, checkfirst=True)
+                    added.append(f"{table.name}.{index.name}")
+    if added:
+        print(f"Схему БД оновлено, додано: {', '.join(added)}")
+    return added
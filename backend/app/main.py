@@ -4,11 +4,12 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .config import API_TITLE, API_DESCRIPTION, API_VERSION, API_PREFIX
 from .api.routes import router as api_router
-from .database import Base, engine
+from .database import Base, engine, upgrade_schema
 
 
-# Створення таблиць бази даних
+# Створення таблиць бази даних і додавання нових колонок до існуючих
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
 # Створення додатку FastAPI
 app = FastAPI(
@@ -1,9 +1,45 @@
 from pathlib import Path
 from app.core.base import MethodExtractor
+from app.utils.file_analyzer import compute_digests
 
 class TypeExtractor(MethodExtractor):
+    # Розширення береться з імені файлу, тож копії з різними іменами мають різні описи
+    cacheable = False
+
     def run(self, file_info):
         return {
             "real_extension": Path(file_info["filename"]).suffix.lstrip("."),
             "mime_type": file_info["mime_type"]
-        }
\ No newline at end of file
+        }
+
+
+class DigestExtractor(MethodExtractor):
+    """Контрольна сума файлу: береться з дескриптора, обчисленого під час сканування."""
+    digests = ("sha256",)
+    # Дайджести вже кешуються сканером у кеші відбитків
+    cacheable = False
+
+    def run(self, file_info):
+        algorithm = self.digests[0]
+        digest = file_info.get("digests", {}).get(algorithm)
+        if digest is None:
+            # Файл не читався повністю під час сканування (напр. tiered-режим);
+            # спільні буфери рахують дайджести всіх вибраних методів за одне читання
+            buffers = file_info.get("buffers")
+            digest = (
+                buffers.digest(algorithm) if buffers is not None
+                else compute_digests(file_info["original_path"], (algorithm,))[algorithm]
+            )
+        return {algorithm: digest}
+
+
+class MD5Extractor(DigestExtractor):
+    digests = ("md5",)
+
+
+class SHA1Extractor(DigestExtractor):
+    digests = ("sha1",)
+
+
+class SHA256Extractor(DigestExtractor):
+    digests = ("sha256",)
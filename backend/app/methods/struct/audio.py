@@ -0,0 +1,25 @@
+import mutagen
+from app.core.base import MethodExtractor
+
+class AudioDurationExtractor(MethodExtractor):
+    """
+    Тривалість і середній бітрейт аудіо з заголовків файлу (mutagen).
+
+    Результат залежить лише від вмісту файлу, тож кешується між сесіями
+    за SHA-256 (кеш результатів).
+    """
+
+    def run(self, file_info):
+        try:
+            audio = mutagen.File(file_info["original_path"])
+        except mutagen.MutagenError:
+            audio = None
+        if audio is None or audio.info is None:
+            # Не аудіо або формат, який mutagen не розпізнає
+            return {"duration": None, "bitrate": None}
+
+        bitrate = getattr(audio.info, "bitrate", 0)
+        return {
+            "duration": round(audio.info.length, 3),
+            "bitrate": bitrate // 1000 if bitrate else None
+        }
@@ -0,0 +1,44 @@
+from sqlalchemy import BigInteger, Column, Integer, Float, String, ForeignKey, Index, JSON
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+
+from ..database import Base
+
+
+class FileDescription(Base):
+    """
+    Опис файлу, отриманий аналізом сесії. Часто вживані поля — окремі
+    типізовані колонки з індексами (сортування, фільтри, пагінація),
+    решта полів методів — у JSON-колонці extra.
+    """
+    __tablename__ = "file_descriptions"
+
+    # Цілочисельний ключ: порядок аналізу і однозначний ключ keyset-пагінації
+    id = Column(Integer, primary_key=True)
+    session_id = Column(UUID(as_uuid=True), ForeignKey("struct_sessions.id", ondelete="CASCADE"),
+                        nullable=False, index=True)
+
+    original_path = Column(String, nullable=False)
+    size_bytes = Column(BigInteger)
+    mime_type = Column(String)
+    extension = Column(String)
+    file_hash = Column(String)
+    hash_tier = Column(String)
+    mtime = Column(Float)
+    created_at = Column(Float)
+
+    # інші поля опису (результати методів аналізу)
+    extra = Column(JSON, default=dict)
+
+    # back‑ref
+    session = relationship("StructSession", back_populates="descriptions")
+
+    # Індекси під сортування і фільтри в межах сесії; id (rowid) — їхній неявний суфікс
+    __table_args__ = (
+        Index("ix_file_descriptions_session_path", "session_id", "original_path"),
+        Index("ix_file_descriptions_session_size", "session_id", "size_bytes"),
+        Index("ix_file_descriptions_session_mtime", "session_id", "mtime"),
+        Index("ix_file_descriptions_session_mime", "session_id", "mime_type"),
+        Index("ix_file_descriptions_session_extension", "session_id", "extension"),
+        Index("ix_file_descriptions_session_hash", "session_id", "file_hash"),
+    )
@@ -1,7 +1,7 @@
 from uuid import uuid4
 from enum import Enum
 
-from sqlalchemy import Column, String, ForeignKey, JSON
+from sqlalchemy import Column, String, ForeignKey, Index, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -13,6 +13,7 @@ class ActionType(str, Enum):
     DELETE_EMPTY_DIR = "DELETE_EMPTY_DIR"
     MOVE_FILE = "MOVE_FILE"
     RENAME_FILE = "RENAME_FILE"
+    HARDLINK_FILE = "HARDLINK_FILE"
 
 
 class InstructionStatus(str, Enum):
@@ -34,3 +35,8 @@ class FileInstruction(Base):
 
     # back‑ref
     session = relationship("StructSession", back_populates="instructions")
+
+    # Вибірки плану сесії за статусом (PENDING для apply і перевірки) без сканування таблиці
+    __table_args__ = (
+        Index("ix_file_instructions_session_status", "session_id", "status"),
+    )
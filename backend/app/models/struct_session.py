@@ -1,7 +1,7 @@
 from uuid import uuid4
 from enum import Enum
 
-from sqlalchemy import Column, ForeignKey, String, Boolean, Integer
+from sqlalchemy import Column, ForeignKey, String, Boolean, Integer, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -11,6 +11,7 @@ from ..database import Base
 class SessionStatus(str, Enum):
     NEW = "NEW"
     ANALYZED = "ANALYZED"
+    PLANNING = "PLANNING"
     PLANNED = "PLANNED"
     APPLYING = "APPLYING"
     DONE = "DONE"
@@ -24,22 +25,42 @@ class StructSession(Base):
     directory = Column(String, nullable=False)
     recursive = Column(Boolean, default=True)
 
+    # параметри сканування (workers, queue_depth, executor)
+    scan_options = Column(JSON, default=dict)
+
     analysis_method_id  = Column(
         String,
         ForeignKey("methods.id", ondelete="SET NULL"),
         nullable=True
     )
+    # усі методи композитного аналізу в порядку виконання (перший — analysis_method_id)
+    analysis_method_ids = Column(JSON, default=list)
 
     struct_algorithm_id = Column(
         String,
         ForeignKey("struct_algorithms.id", ondelete="SET NULL"),
         nullable=True
     )
+    # параметри алгоритму (за params_schema), з якими побудовано план
+    struct_algorithm_params = Column(JSON, default=dict)
     
     status = Column(String, default=SessionStatus.NEW)
 
     files_total = Column(Integer, default=0)
     actions_total = Column(Integer, default=0)
 
+    # лічильники застосування плану; оновлюються порціями циклом apply,
+    # тож прогрес читається одним рядком сесії без підрахунку інструкцій
+    processed_total = Column(Integer, default=0)
+    applied_total = Column(Integer, default=0)
+    failed_total = Column(Integer, default=0)
+
+    # знахідки перевірки плану (PlanValidator.finish): конфлікти, цикли, відсутні джерела
+    plan_findings = Column(JSON, nullable=True)
+    # маркер відновлення частково збереженого плану (InstructionWriter): параметри
+    # планування і кількість закомічених інструкцій; None — план збережено повністю
+    plan_checkpoint = Column(JSON, nullable=True)
+
     # relationships
     instructions = relationship("FileInstruction", back_populates="session", cascade="all, delete")
+    descriptions = relationship("FileDescription", back_populates="session", cascade="all, delete")
@@ -1,17 +1,62 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from uuid import UUID
+from datetime import datetime
 from typing import Any, List, Dict, Literal, Optional
 
 AnalysisMethod  = Literal["META", "STRUCT", "SEMANTIC"]
-StructAlgorithm = Literal["CLUSTER", "CRITERIA"]
+StructAlgorithm = Literal["CLUSTER", "CRITERIA", "DEDUP"]
 
 class SessionCreate(BaseModel):
     directory: str = Field(..., example="/abs/path")
     recursive: bool = Field(True, description="Scan sub‑directories too")
+    workers: Optional[int] = Field(None, ge=1, description="Scan worker count (default: by CPU count)")
+    queue_depth: Optional[int] = Field(None, ge=1, description="Max files queued in the scan pool")
+    executor: Literal["thread", "process"] = Field("thread", description="Scan pool type")
+    hash_mode: Literal["full", "tiered"] = Field("full", description="full: SHA-256 of every file; tiered: size → sample → full hash")
+    max_in_flight: Optional[int] = Field(None, ge=1, description="Max descriptors buffered between pipeline stages")
+    plan_shards: Optional[int] = Field(None, ge=1, description="Plan shardable algorithms in this many shards in a process pool (1 = single process)")
+    include: List[str] = Field(default_factory=list, description="Glob patterns of files to analyse (file name, or path relative to the directory if the pattern contains '/')")
+    exclude: List[str] = Field(default_factory=list, description="Glob patterns of files and directories to skip; matching directories are not descended into")
+    min_size: Optional[int] = Field(None, ge=0, description="Skip files smaller than this (bytes)")
+    max_size: Optional[int] = Field(None, ge=0, description="Skip files larger than this (bytes)")
+    max_depth: Optional[int] = Field(None, ge=0, description="Max sub‑directory depth (0 = only the directory itself)")
+    include_hidden: bool = Field(True, description="Include dot-files and dot-directories")
+    modified_after: Optional[datetime] = Field(None, description="Only files modified at or after this time")
+    modified_before: Optional[datetime] = Field(None, description="Only files modified at or before this time")
 
-class ProcessRequest(BaseModel):
-    method: str
+class MethodSelection(BaseModel):
+    method: Optional[str] = None
+    methods: Optional[List[str]] = Field(None, description="Several methods analysed in one pass over the files")
     algorithm: str
+    params: Dict[str, Any] = Field(default_factory=dict, description="Algorithm parameters (see params_schema of the algorithm)")
+
+    @model_validator(mode="after")
+    def check_methods(self):
+        if not self.method and not self.methods:
+            raise ValueError("Either 'method' or 'methods' is required")
+        return self
+
+    @property
+    def method_ids(self) -> List[str]:
+        ids = list(self.methods or [])
+        if self.method and self.method not in ids:
+            ids.insert(0, self.method)
+        return ids
+
+class ProcessRequest(MethodSelection):
+    incremental: bool = Field(False, description="Re-list only directories whose mtime changed since the last scan")
+
+class ReplanRequest(BaseModel):
+    algorithm: str
+    params: Dict[str, Any] = Field(default_factory=dict, description="Algorithm parameters (see params_schema of the algorithm)")
+
+class EstimateRequest(MethodSelection):
+    time_budget: Optional[float] = Field(None, gt=0, le=60, description="Seconds spent on random tree probes")
+    max_probes: Optional[int] = Field(None, ge=1, description="Max random root-to-leaf probes")
+    seed: Optional[int] = Field(None, description="Random seed for a reproducible estimate")
+
+class FsDetailsRequest(BaseModel):
+    paths: List[str] = Field(..., description="File paths currently shown in the UI")
 
 class ApplyRequest(BaseModel):
     dry_run: bool = Field(False, description="Preview only without real changes")
@@ -32,6 +77,19 @@ class ProcessSummary(BaseModel):
     files_analyzed: int
     actions_created: int
     breakdown: Dict[str, int]
+    delta: Optional[Dict[str, Any]] = None
+    source: Optional[Literal["scan", "live_index", "descriptions"]] = None
+    watcher: Optional[Dict[str, Any]] = None
+    extract_errors: Optional[Dict[str, Any]] = None
+    result_cache: Optional[Dict[str, int]] = None
+    filters: Optional[Dict[str, Any]] = None
+    algorithm: Optional[Dict[str, Any]] = None
+    validation: Optional[Dict[str, Any]] = None
+    persist: Optional[Dict[str, Any]] = None
+
+class WatchRequest(BaseModel):
+    directory: str = Field(..., description="Absolute directory path to watch")
+    recursive: bool = Field(True, description="Watch sub‑directories too")
 
 class PreviewTree(BaseModel):
     tree: Dict[str, Any]
@@ -44,6 +102,10 @@ class ApplyResult(BaseModel):
 class ProgressReport(BaseModel):
     percent: int = Field(0, ge=0, le=100)
     status: str
+    total: int = 0
+    processed: int = 0
+    applied: int = 0
+    failed: int = 0
 
 class MethodSchema(BaseModel):
     id: str
@@ -0,0 +1,196 @@
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, column, delete, insert, or_, select, table
+from sqlalchemy.orm import Session as DBSession
+
+from app.config import PERSIST_CHUNK_SIZE
+from app.models.file_description import FileDescription
+from app.models.struct_session import StructSession
+
+# Поле опису → колонка таблиці; решта полів опису пишеться в extra
+HOT_FIELDS = {
+    "original_path": "original_path",
+    "size_bytes": "size_bytes",
+    "mime_type": "mime_type",
+    "real_extension": "extension",
+    "file_hash": "file_hash",
+    "hash_tier": "hash_tier",
+    "mtime": "mtime",
+    "created_at": "created_at",
+}
+
+# Поля, які _combine додає до кожного опису (навіть зі значенням None)
+_ALWAYS_PRESENT = ("size_bytes", "mtime", "created_at", "file_hash", "hash_tier", "original_path")
+
+# Поле сортування для перегляду → колонка
+SORT_COLUMNS = {
+    "id": FileDescription.id,
+    "path": FileDescription.original_path,
+    "size": FileDescription.size_bytes,
+    "mtime": FileDescription.mtime,
+    "mime": FileDescription.mime_type,
+    "extension": FileDescription.extension,
+    "hash": FileDescription.file_hash,
+}
+
+_COLUMNS = ["session_id", "extra", *HOT_FIELDS.values()]
+
+# Вставка в обхід ORM, як і для інструкцій: extra — вже серіалізований JSON
+_INSERT = insert(table(FileDescription.__tablename__, *(column(name) for name in _COLUMNS)))
+
+_SELECT = select(FileDescription.id, FileDescription.extra,
+                 *(getattr(FileDescription, name) for name in HOT_FIELDS.values()))
+
+
+def description_from_row(row) -> Dict[str, Any]:
+    """Опис файлу з рядка таблиці (у тому вигляді, в якому його отримує алгоритм)."""
+    desc = {}
+    for field, name in HOT_FIELDS.items():
+        value = getattr(row, name)
+        if value is not None or field in _ALWAYS_PRESENT:
+            desc[field] = value
+    # Поля методів мають пріоритет, як у _combine, крім шляху і хешу
+    desc.update(row.extra or {})
+    desc["file_hash"] = row.file_hash
+    desc["hash_tier"] = row.hash_tier
+    desc["original_path"] = row.original_path
+    return desc
+
+
+class DescriptionWriter:
+    """
+    Масове збереження описів файлів сесії: порції по chunk_size вставляються
+    одним executemany і одразу комітяться (у WAL коміт дешевий, а
+    блокування запису не тримається, поки аналіз триває).
+    """
+
+    def __init__(self, db: DBSession, sess: StructSession, chunk_size: int = PERSIST_CHUNK_SIZE):
+        self.db = db
+        self.chunk_size = max(1, chunk_size)
+        uuid_to_db = FileDescription.__table__.c.session_id.type.bind_processor(db.get_bind().dialect)
+        self.session_id = uuid_to_db(sess.id) if uuid_to_db else sess.id
+        self.count = 0
+        self._rows: List[Dict[str, Any]] = []
+
+    def add(self, desc: Dict[str, Any]) -> None:
+        if desc.get("original_path") is None:
+            return
+        row = {name: desc.get(field) for field, name in HOT_FIELDS.items()}
+        extra = {k: v for k, v in desc.items() if k not in HOT_FIELDS}
+        extension = row["extension"]
+        if isinstance(extension, str) and extension != extension.lower():
+            # Колонка — у нижньому регістрі для фільтра й сортування; оригінал
+            # лишається в extra і повертається алгоритмам (description_from_row)
+            row["extension"] = extension.lower()
+            extra["real_extension"] = extension
+        row["session_id"] = self.session_id
+        row["extra"] = json.dumps(extra, default=str)
+        self._rows.append(row)
+        if len(self._rows) >= self.chunk_size:
+            self.flush()
+            self.db.commit()
+
+    def flush(self) -> None:
+        """Вставити накопичену порцію (без коміту)."""
+        if self._rows:
+            self.db.execute(_INSERT, self._rows)
+            self.count += len(self._rows)
+            self._rows = []
+
+
+def clear_descriptions(db: DBSession, session_id) -> int:
+    """Видалити описи сесії (в межах поточної транзакції)."""
+    return db.execute(delete(FileDescription).where(FileDescription.session_id == session_id)).rowcount
+
+
+def iter_descriptions(db: DBSession, session_id, batch_size: int = PERSIST_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Потік описів сесії в порядку аналізу. Кожна порція — окремий запит
+    з умовою id > останній (keyset), тож відкритий курсор не тримається
+    між комітами, які робить споживач.
+    """
+    last_id = 0
+    while True:
+        rows = db.execute(
+            _SELECT.where(FileDescription.session_id == session_id, FileDescription.id > last_id)
+            .order_by(FileDescription.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        for row in rows:
+            yield description_from_row(row)
+        last_id = rows[-1].id
+
+
+def page_descriptions(db: DBSession, session_id, after: Optional[Tuple[Any, int]], limit: int,
+                      sort: str = "path", order: str = "asc",
+                      filters: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[Tuple[Any, int]]]:
+    """
+    Сторінка описів сесії з keyset-пагінацією за (колонка сортування, id).
+
+    Рядки з NULL у колонці сортування йдуть першими за зростанням і
+    останніми за спаданням; умова продовження враховує це явно, тож
+    запит завжди йде індексом (session_id, колонка) без OFFSET.
+
+    Args:
+        after: Ключ останнього рядка попередньої сторінки (значення, id) або None
+        limit: Розмір сторінки
+        sort: Поле сортування (SORT_COLUMNS)
+        order: asc або desc
+        filters: mime, extension, hash (точний збіг), min_size, max_size
+
+    Returns:
+        (описи з полем id, ключ наступної сторінки або None)
+
+    Raises:
+        ValueError: Якщо поле сортування невідоме
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Unknown sort field: {sort}")
+    col = SORT_COLUMNS[sort]
+    key_col = FileDescription.id
+    descending = order == "desc"
+
+    conditions = [FileDescription.session_id == session_id]
+    filters = filters or {}
+    if filters.get("mime") is not None:
+        conditions.append(FileDescription.mime_type == filters["mime"])
+    if filters.get("extension") is not None:
+        conditions.append(FileDescription.extension == str(filters["extension"]).lower().lstrip("."))
+    if filters.get("hash") is not None:
+        conditions.append(FileDescription.file_hash == filters["hash"])
+    if filters.get("min_size") is not None:
+        conditions.append(FileDescription.size_bytes >= filters["min_size"])
+    if filters.get("max_size") is not None:
+        conditions.append(FileDescription.size_bytes <= filters["max_size"])
+
+    if after is not None:
+        value, last_id = after
+        if col is key_col:
+            conditions.append(key_col < last_id if descending else key_col > last_id)
+        elif value is None:
+            # Курсор усередині групи NULL
+            if descending:
+                conditions.append(and_(col.is_(None), key_col < last_id))
+            else:
+                conditions.append(or_(col.is_not(None), and_(col.is_(None), key_col > last_id)))
+        elif descending:
+            conditions.append(or_(col < value, and_(col == value, key_col < last_id), col.is_(None)))
+        else:
+            conditions.append(or_(col > value, and_(col == value, key_col > last_id)))
+
+    if col is key_col:
+        ordering = [key_col.desc() if descending else key_col.asc()]
+    elif descending:
+        ordering = [col.desc().nulls_last(), key_col.desc()]
+    else:
+        ordering = [col.asc().nulls_first(), key_col.asc()]
+
+    rows = db.execute(_SELECT.where(*conditions).order_by(*ordering).limit(limit + 1)).all()
+    next_key = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_key = (getattr(last, col.key), last.id)
+    return [{"id": row.id, **description_from_row(row)} for row in rows], next_key
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import column, delete, insert, table
+from sqlalchemy.orm import Session as DBSession
+
+from app.config import PERSIST_CHUNK_SIZE, PERSIST_COMMIT_SIZE
+from app.models.file_instruction import ActionType, FileInstruction, InstructionStatus
+from app.models.struct_session import SessionStatus, StructSession
+
+_COLUMNS = FileInstruction.__table__.c
+
+# Вставка в обхід ORM і обробників типів: UUID перетворюються у формат
+# діалекту один раз (_uuid_processor), params — вже серіалізований JSON
+_INSERT = insert(table(
+    FileInstruction.__tablename__,
+    column("id"),
+    column("session_id"),
+    column("file_path"),
+    column("action"),
+    column("status"),
+    column("params"),
+))
+
+_RAND_BITS = 74                      # rand_a (12) + rand_b (62) у UUIDv7
+_RAND_B_MASK = (1 << 62) - 1
+
+
+class _UuidSequence:
+    """
+    Ідентифікатори, впорядковані за часом (формат UUIDv7: 48 біт мілісекунд,
+    далі лічильник з випадковим початком у межах мілісекунди).
+
+    Нові ключі потрапляють у кінець індексу первинного ключа, а не у
+    випадкові сторінки, як uuid4, тож вставка не розкидає запис по всьому
+    B-дереву. Випадкові байти беруться один раз на мілісекунду.
+    """
+
+    def __init__(self):
+        self._ms = -1
+        self._counter = 0
+
+    def take(self, n: int) -> List[UUID]:
+        ms = time.time_ns() // 1_000_000
+        if ms > self._ms:
+            self._ms = ms
+            # старший біт лічильника нульовий — запас на 2^73 приростів
+            self._counter = int.from_bytes(os.urandom(10), "big") >> (80 - _RAND_BITS + 1)
+        high = (self._ms << 80) | (0x7 << 76) | (0b10 << 62)
+        start = self._counter
+        self._counter += n
+        return [
+            UUID(int=high | ((c >> 62) << 64) | (c & _RAND_B_MASK))
+            for c in range(start, start + n)
+        ]
+
+
+def _instruction_key(file_path: str, action: str, params: Optional[Dict[str, Any]]) -> bytes:
+    """Ключ інструкції для відновлення: дія і шлях файлу (для CREATE_DIR — створювана директорія)."""
+    subject = (params or {}).get("path", "") if action == ActionType.CREATE_DIR else file_path
+    # ActionType з алгоритму і рядок з БД дають той самий ключ
+    action = getattr(action, "value", action)
+    return hashlib.blake2b(f"{action}\0{subject}".encode("utf-8", "surrogateescape"), digest_size=8).digest()
+
+
+class InstructionWriter:
+    """
+    Масове збереження інструкцій плану.
+
+    Інструкції накопичуються порціями по chunk_size і вставляються одним
+    executemany через Core (без unit of work ORM): id генеруються на клієнті,
+    params серіалізуються в JSON одразу при додаванні. Кожні commit_size
+    інструкцій транзакція комітиться разом з маркером відновлення в сесії
+    (plan_checkpoint, статус PLANNING), тож блокування запису SQLite
+    тримається недовго, а перерваний план можна продовжити (resume —
+    уже збережені інструкції пропускаються) або відкинути (discard_plan).
+    Останню порцію finish() лише вставляє: комітить її викликач разом
+    з підсумками сесії.
+    """
+
+    def __init__(self, db: DBSession, sess: StructSession, chunk_size: int = PERSIST_CHUNK_SIZE,
+                 commit_size: Optional[int] = PERSIST_COMMIT_SIZE):
+        """
+        Args:
+            db: Сесія бази даних
+            sess: Сесія структуризації, якій належать інструкції
+            chunk_size: Інструкцій в одному executemany
+            commit_size: Інструкцій на транзакцію; None — не комітити
+                (транзакцією керує викликач, маркер не ставиться)
+        """
+        self.db = db
+        self.sess = sess
+        # Формат UUID у БД (напр. 32 hex-символи в SQLite) — як у колонки моделі
+        self._uuid = _COLUMNS.id.type.bind_processor(db.get_bind().dialect) or (lambda value: value)
+        self.session_id = self._uuid(sess.id)
+        self.chunk_size = max(1, chunk_size)
+        self.commit_size = commit_size
+        self.written = 0          # вставлено цим записувачем
+        self.persisted = 0        # закомічено, разом з попередніми спробами
+        self.skipped = 0          # пропущено як уже збережені
+        self._uncommitted = 0
+        self._rows: List[Dict[str, Any]] = []
+        self._ids = _UuidSequence()
+        self._done: Optional[Set[bytes]] = None
+        self._marker: Dict[str, Any] = {}
+        self.timings = {"insert": 0.0, "commit": 0.0}
+
+    def resume(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Продовження перерваного плану: читає вже збережені інструкції сесії,
+        запам'ятовує їхні ключі (8 байт на інструкцію) і віддає їх викликачу
+        (наприклад, для перевірки плану). Далі add() пропускає інструкції
+        з тими самими ключами.
+        """
+        self._done = set()
+        rows = self.db.query(FileInstruction.file_path, FileInstruction.action, FileInstruction.params).filter(
+            FileInstruction.session_id == self.sess.id
+        ).yield_per(self.chunk_size)
+        for file_path, action, params in rows:
+            self._done.add(_instruction_key(file_path, action, params))
+            self.persisted += 1
+            yield file_path, action, params
+
+    def begin(self, **marker: Any) -> None:
+        """Поставити маркер відновлення (статус PLANNING) і закомітити його."""
+        if self.commit_size is None:
+            return
+        now = datetime.now().isoformat()
+        previous = self.sess.plan_checkpoint or {}
+        self._marker = {**marker, "started_at": previous.get("started_at", now), "resumed_at": None}
+        if self._done is not None:
+            self._marker["resumed_at"] = now
+        self._save_marker()
+        self.sess.status = SessionStatus.PLANNING
+        self.db.commit()
+
+    def add(self, file_path: str, action: str, params: Optional[Dict[str, Any]]) -> bool:
+        """
+        Додати інструкцію. Returns: False, якщо вона вже збережена
+        попередньою спробою (лише після resume()).
+        """
+        if self._done is not None and _instruction_key(file_path, action, params) in self._done:
+            self.skipped += 1
+            return False
+        self._rows.append({
+            "session_id": self.session_id,
+            "file_path": file_path,
+            "action": action,
+            "status": InstructionStatus.PENDING,
+            "params": json.dumps(params if params is not None else {})
+        })
+        if len(self._rows) >= self.chunk_size:
+            self._insert()
+            if self.commit_size is not None and self._uncommitted >= self.commit_size:
+                self._checkpoint()
+        return True
+
+    def finish(self) -> None:
+        """Вставити останню порцію (без коміту)."""
+        self._insert()
+
+    def _insert(self) -> None:
+        rows = self._rows
+        if not rows:
+            return
+        started = time.perf_counter()
+        to_db = self._uuid
+        for row, instruction_id in zip(rows, self._ids.take(len(rows))):
+            row["id"] = to_db(instruction_id)
+        self.db.execute(_INSERT, rows)
+        self.timings["insert"] += time.perf_counter() - started
+        self.written += len(rows)
+        self._uncommitted += len(rows)
+        self._rows = []
+
+    def _checkpoint(self) -> None:
+        started = time.perf_counter()
+        self.persisted += self._uncommitted
+        self._uncommitted = 0
+        self._save_marker()
+        self.db.commit()
+        self.timings["commit"] += time.perf_counter() - started
+
+    def _save_marker(self) -> None:
+        # Новий словник — щоб ORM помітив зміну JSON-колонки
+        self.sess.plan_checkpoint = {**self._marker, "persisted": self.persisted,
+                                     "updated_at": datetime.now().isoformat()}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "written": self.written,
+            "skipped": self.skipped,
+            "resumed": self._done is not None,
+            "timings": self.timings
+        }
+
+
+def discard_plan(db: DBSession, sess: StructSession) -> int:
+    """
+    Видалити всі інструкції сесії одним DELETE, зняти маркер відновлення
+    і повернути сесію в стан NEW.
+
+    Returns:
+        int: Кількість видалених інструкцій
+    """
+    deleted = db.execute(delete(FileInstruction).where(FileInstruction.session_id == sess.id)).rowcount
+    sess.plan_checkpoint = None
+    sess.plan_findings = None
+    sess.actions_total = 0
+    sess.processed_total = sess.applied_total = sess.failed_total = 0
+    sess.status = SessionStatus.NEW
+    db.commit()
+    return deleted
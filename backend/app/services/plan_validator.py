@@ -0,0 +1,184 @@
+import os
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.config import PLAN_FINDINGS_LIMIT
+from app.models.file_instruction import ActionType
+
+# Рівні знахідок: error — застосування призведе до втрати даних або
+# гарантовано не вдасться; warning — результат залежить від порядку дій
+ERROR = "error"
+WARNING = "warning"
+
+# Вид знахідки → рівень
+FINDING_KINDS = {
+    "duplicate_destination": ERROR,     # кілька файлів у той самий шлях
+    "destination_exists": ERROR,        # перезапис файлу, що вже існує і не переміщується
+    "destination_is_directory": ERROR,  # файл на місце директорії, що створюється планом
+    "duplicate_source": ERROR,          # той самий файл переміщується кількома інструкціями
+    "missing_source": ERROR,            # вихідного файлу немає
+    "cycle": ERROR,                     # A → B, B → A: жодну дію не виконати першою
+    "move_into_itself": ERROR,          # директорія переміщується у власне піддерево
+    "missing_link_target": ERROR,       # ціль жорсткого посилання відсутня або переміщується
+    "order_dependent": WARNING,         # ціль звільняється лише пізнішою інструкцією
+}
+
+
+def _norm(path: str) -> str:
+    return os.path.normcase(os.path.normpath(path))
+
+
+class PlanValidator:
+    """
+    Перевірка плану перед застосуванням за лінійний час.
+
+    Інструкції подаються по одній (add) у порядку плану; для кожної
+    обчислюються абсолютні джерело і ціль, що потрапляють у хеш-індекси
+    sources (джерело → номер інструкції) і targets (ціль → номер). finish()
+    проходить індекси один раз: конфлікти цілей, перезапис наявних файлів,
+    відсутні джерела, цикли переміщень (кожне джерело має не більше одного
+    ребра, тож цикли знаходяться одним проходом з позначками) і переміщення
+    директорії у власне піддерево.
+
+    Наявність файлів перевіряється не stat на кожен шлях, а одним
+    переліком (os.scandir) кожної задіяної директорії, тож кількість
+    системних викликів пропорційна кількості директорій, а не файлів.
+    """
+
+    def __init__(self, base_directory: str, limit: int = PLAN_FINDINGS_LIMIT):
+        self.base_directory = base_directory
+        self.limit = limit
+        self.instructions = 0
+        # (джерело, ціль, нормалізоване джерело, нормалізована ціль) переміщень
+        self._moves: List[Tuple[str, str, str, str]] = []
+        self._sources: Dict[str, int] = {}
+        self._targets: Dict[str, int] = {}
+        self._created_dirs: Set[str] = set()
+        self._links: List[Tuple[str, str]] = []      # (файл, ціль посилання)
+        self._listings: Dict[str, Optional[Dict[str, bool]]] = {}
+        self._counts: Counter = Counter()
+        self._items: List[Dict[str, Any]] = []
+
+    def add(self, file_path: str, action: str, params: Optional[Dict[str, Any]]) -> None:
+        params = params or {}
+        self.instructions += 1
+        if action == ActionType.CREATE_DIR:
+            self._created_dirs.add(_norm(os.path.join(self.base_directory, params.get("path", ""))))
+            return
+        if action == ActionType.HARDLINK_FILE:
+            self._links.append((file_path, params.get("target", "")))
+            return
+        if action == ActionType.MOVE_FILE:
+            dst_dir = os.path.join(self.base_directory, params.get("dst", "").rstrip("\\").rstrip("/"))
+            dst = os.path.join(dst_dir, os.path.basename(file_path))
+        elif action == ActionType.RENAME_FILE:
+            dst = os.path.join(self.base_directory, params.get("dst", ""))
+        else:
+            return
+
+        index = len(self._moves)
+        src = os.path.abspath(file_path)
+        dst = os.path.abspath(dst)
+        src_key, dst_key = _norm(src), _norm(dst)
+        self._moves.append((src, dst, src_key, dst_key))
+        if src_key == dst_key:
+            return  # файл лишається на місці
+        if src_key in self._sources:
+            self._report("duplicate_source", src, other=self._moves[self._sources[src_key]][1])
+        else:
+            self._sources[src_key] = index
+        if dst_key in self._targets:
+            self._report("duplicate_destination", src, dst, other=self._moves[self._targets[dst_key]][0])
+        else:
+            self._targets[dst_key] = index
+
+    def _report(self, kind: str, path: str, dst: Optional[str] = None, other: Optional[str] = None) -> None:
+        self._counts[kind] += 1
+        if len(self._items) < self.limit:
+            item = {"kind": kind, "severity": FINDING_KINDS[kind], "path": path}
+            if dst is not None:
+                item["dst"] = dst
+            if other is not None:
+                item["other"] = other
+            self._items.append(item)
+
+    def _entry(self, path: str) -> Optional[bool]:
+        """None — шляху немає, інакше чи є він директорією (з кешу переліків)."""
+        directory, name = os.path.split(path)
+        listing = self._listings.get(directory, False)
+        if listing is False:
+            try:
+                with os.scandir(directory) as it:
+                    listing = {_norm(entry.name): entry.is_dir() for entry in it}
+            except OSError:
+                listing = None
+            self._listings[directory] = listing
+        if listing is None:
+            return None
+        return listing.get(_norm(name))
+
+    def finish(self) -> Dict[str, Any]:
+        """Знахідки перевірки: лічильники за видами і перші limit записів."""
+        moves, sources, targets = self._moves, self._sources, self._targets
+
+        # 1. цикли: ребро джерело → ціль, якщо ціль є джерелом іншої дії;
+        #    у кожної дії не більше одного ребра, тож кожну відвідуємо раз
+        state = [0] * len(moves)  # 0 — не відвідано, 1 — у поточному ланцюжку, 2 — готово
+        in_cycle = set()
+        for start in range(len(moves)):
+            chain = []
+            index = start
+            while index is not None and state[index] == 0:
+                state[index] = 1
+                chain.append(index)
+                _, _, src_key, dst_key = moves[index]
+                index = sources.get(dst_key) if dst_key != src_key else None
+            if index is not None and state[index] == 1:
+                cycle = chain[chain.index(index):]
+                in_cycle.update(cycle)
+                self._report("cycle", moves[index][0], moves[index][1], other=f"{len(cycle)} moves")
+            for visited in chain:
+                state[visited] = 2
+
+        # 2. джерела і цілі проти файлової системи та одна проти одної
+        for index, (src, dst, src_key, dst_key) in enumerate(moves):
+            if src_key == dst_key:
+                continue
+            is_dir = self._entry(src)
+            if is_dir is None:
+                self._report("missing_source", src, dst)
+            elif is_dir and dst_key.startswith(src_key + os.sep):
+                self._report("move_into_itself", src, dst)
+
+            if targets.get(dst_key) != index:
+                continue  # дублікат цілі вже повідомлено
+            if dst_key in self._created_dirs:
+                self._report("destination_is_directory", src, dst)
+                continue
+            occupant = sources.get(dst_key)
+            if occupant is None:
+                if self._entry(dst) is not None:
+                    self._report("destination_exists", src, dst)
+            elif occupant > index and index not in in_cycle:
+                # Поточний власник шляху переміщується пізніше — у порядку
+                # плану ця дія не вдасться, у зворотному виконається
+                self._report("order_dependent", src, dst, other=moves[occupant][1])
+
+        # 3. жорсткі посилання: ціль має існувати і лишатися на місці
+        for path, target in self._links:
+            target_key = _norm(os.path.abspath(target)) if target else ""
+            if not target or target_key in sources or self._entry(os.path.abspath(target)) is None:
+                self._report("missing_link_target", path, target or None)
+            if self._entry(os.path.abspath(path)) is None:
+                self._report("missing_source", path)
+
+        errors = sum(n for kind, n in self._counts.items() if FINDING_KINDS[kind] == ERROR)
+        return {
+            "ok": errors == 0,
+            "instructions": self.instructions,
+            "errors": errors,
+            "warnings": sum(self._counts.values()) - errors,
+            "counts": dict(self._counts),
+            "items": self._items,
+            "truncated": sum(self._counts.values()) > len(self._items)
+        }
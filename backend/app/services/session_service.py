@@ -1,21 +1,49 @@
 # app/services/session_service.py
+import base64
+import bisect
+import json
 import shutil
-from typing import List, Dict, Any, Optional
+import time
+from collections import defaultdict
+from datetime import datetime
+from uuid import uuid4
+from typing import List, Dict, Any, Optional, Tuple
 import os
 
+from sqlalchemy import delete, update
 from sqlalchemy.orm import Session as DBSession
 
+from app.algorithms.sharding import ShardedPlanner
 from app.core.base import MethodExtractor, StructAlgorithm
+from app.core.composite import CompositeExtractor
 from app.core.utils import load_class
 from app.models.algorithm_registry import AlgorithmRegistry
 from app.models.method_registry import MethodRegistry
 from app.schemas.session_schemas import SessionCreate
-from app.utils.file_analyzer import get_file_hash, get_file_size, get_file_type, get_mime_type
+from app.services.description_store import DescriptionWriter, clear_descriptions, iter_descriptions, page_descriptions
+from app.services.instruction_writer import InstructionWriter, discard_plan
+from app.services.plan_validator import PlanValidator
+from app.utils.file_analyzer import HashTier, create_file_descriptor, get_file_fingerprint, get_mime_type
+from app.utils.fingerprint_cache import get_fingerprint_cache
+from app.utils.result_cache import MethodResultStore, get_result_cache
 
+from ..database import SessionLocal
 from ..models.struct_session import StructSession, SessionStatus
 from ..models.file_instruction import FileInstruction, ActionType, InstructionStatus
 
-from ..utils.directory_scanner import scan_dir
+from ..config import (
+    DESCRIPTION_PAGE_SIZE, DESCRIPTION_PAGE_SIZE_MAX, DELTA_PATHS_LIMIT, ESTIMATE_FULL_HASH_LIMIT, ESTIMATE_MAX_PROBES, ESTIMATE_SAMPLE_FILES,
+    ESTIMATE_TIME_BUDGET, EXTRACT_WORKERS, FS_DETAILS_BATCH_MAX, FS_HASH_SIZE_LIMIT, FS_PAGE_SIZE,
+    FS_PAGE_SIZE_MAX, PERSIST_CHUNK_SIZE, PIPELINE_MAX_IN_FLIGHT, PLAN_SHARDS, SCAN_WORKERS,
+    APPLY_PROGRESS_BATCH
+)
+from ..utils.batch_executor import BatchExecutor
+from ..utils.directory_scanner import ScanDelta, scan_dir
+from ..utils.inotify_watcher import get_active_watcher, list_watchers, start_watcher, stop_watcher
+from ..utils.pipeline import bounded_map
+from ..utils.scan_filter import ScanFilter
+from ..utils.snapshot_store import get_snapshot_store
+from ..utils.tree_estimator import TreeEstimator, mean_interval, ratio_interval
 
 
 class SessionService:
@@ -180,7 +208,7 @@ class SessionService:
                         "field": {
                             "type": "string",
                             "description": "Назва поля у FileDescription "
-                                        "(napр. size_bytes, mime_type, created_at)"
+                                        "(napр. size_bytes, mime_type, mtime, created_at)"
                         },
                         "bucket": {
                             "type": "object",
@@ -188,15 +216,22 @@ class SessionService:
                             "properties": {
                                 "type":   {"enum": ["range", "quantile"]},
                                 "bounds": {"type": "array",
-                                        "items": {"type": "number"}},
+                                        "items": {"type": "number"},
+                                        "description": "range — зростаючі межі бакетів "
+                                                    "(для дат — timestamp); quantile — "
+                                                    "ймовірності квантилів у (0, 1)"},
                                 "labels": {"type": "array",
-                                        "items": {"type": "string"}}
+                                        "items": {"type": "string"},
+                                        "description": "Назви папок, по одній на бакет "
+                                                    "(len(bounds) + 1)"}
                             }
                         },
                         "rename_pattern": {
                             "type": "string",
                             "description": "Шаблон нового імені "
-                                        "(наприклад {created_at:%Y-%m-%d}_{original}.{ext})"
+                                        "(наприклад {created_at:%Y-%m-%d}_{original}.{ext}); "
+                                        "поля опису файлу, {original}, {ext}, {name}, "
+                                        "{n} — номер файлу. Однакові імена отримують суфікси _1, _2"
                         }
                     },
                     "required": ["field"],
@@ -233,6 +268,11 @@ class SessionService:
                             "type": "integer",
                             "minimum": 2,
                             "description": "Мінімальний розмір кластера (для HDBSCAN)"
+                        },
+                        "seed": {
+                            "type": "integer",
+                            "default": 0,
+                            "description": "Seed випадкових вибірок (відтворюваний результат)"
                         }
                     },
                     "additionalProperties": False
@@ -240,12 +280,86 @@ class SessionService:
                 "scope": "*",  # працює з усією вибіркою
                 "impl_class": "algorithms.cluster.ClusterAlgorithm",
                 "enabled": True
+            },
+            {
+                "id": "DEDUP",
+                "description": "Пошук однакових файлів за вмістом (розмір → вибірка → SHA-256). "
+                            "Лишається одна копія, решта переміщується, "
+                            "замінюється жорстким посиланням або йде в карантин.",
+                "params_schema": {
+                    "type": "object",
+                    "properties": {
+                        "action": {
+                            "enum": ["move", "hardlink", "quarantine"],
+                            "default": "move",
+                            "description": "Що робити з дублікатами"
+                        },
+                        "keep": {
+                            "enum": ["oldest", "newest", "shortest_path", "first"],
+                            "default": "oldest",
+                            "description": "Яку копію лишити канонічною"
+                        },
+                        "target_dir": {
+                            "type": "string",
+                            "description": "Папка для дублікатів (move — Duplicates, "
+                                        "quarantine — .quarantine)"
+                        },
+                        "min_size": {
+                            "type": "integer",
+                            "minimum": 0,
+                            "default": 1,
+                            "description": "Мінімальний розмір файлу в байтах"
+                        }
+                    },
+                    "additionalProperties": False
+                },
+                "scope": "*",  # порівнює файли всієї вибірки
+                "impl_class": "algorithms.dedup.DedupAlgorithm",
+                "enabled": True
             }
         ]
 
+    # Ключі сортування списку /fs/entries: значення + ім'я (для стабільного курсора)
+    _FS_SORT_KEYS = {
+        "name": lambda e: (e["name"].lower(), e["name"]),
+        "size": lambda e: (e["size"] if e["size"] is not None else -1, e["name"]),
+        "modified": lambda e: (e["modified_ts"], e["name"]),
+        "type": lambda e: (e["type"] != "directory", e["extension"] or "", e["name"]),
+    }
+
     @staticmethod
-    def get_fs_entries(dir_path: str) -> Dict[str, Any]:
-            
+    def _encode_cursor(key: tuple) -> str:
+        return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple:
+        try:
+            return tuple(json.loads(base64.urlsafe_b64decode(cursor.encode())))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Некоректний курсор: {cursor}") from e
+
+    @staticmethod
+    def get_fs_entries(
+        dir_path: str,
+        cursor: Optional[str] = None,
+        limit: int = FS_PAGE_SIZE,
+        sort: str = "name",
+        order: str = "asc"
+    ) -> Dict[str, Any]:
+        """
+        Повертає сторінку вмісту директорії: лише імена та дані stat.
+
+        Хеш і тип файлів тут не обчислюються — їх повертає get_fs_details для
+        рядків, які реально показуються. Пагінація курсорна: курсор кодує ключ
+        сортування останнього рядка попередньої сторінки.
+
+        Args:
+            dir_path: Шлях до директорії
+            cursor: Курсор наступної сторінки (з next_cursor попередньої відповіді)
+            limit: Розмір сторінки (не більше FS_PAGE_SIZE_MAX)
+            sort: Поле сортування — name, size, modified або type
+            order: asc або desc
+        """
         dir_path = os.path.normpath(dir_path)
 
         if dir_path in {".", ".."}:
@@ -261,101 +375,169 @@ class SessionService:
                 "has_access": False,
                 "entries": []
             }
+
+        if sort not in SessionService._FS_SORT_KEYS:
+            raise ValueError(f"Невідоме поле сортування: {sort}")
+        sort_key = SessionService._FS_SORT_KEYS[sort]
+        limit = max(1, min(limit, FS_PAGE_SIZE_MAX))
         
         parent_dir = os.path.dirname(dir_path)
-        print(dir_path, parent_dir)
-        
         if os.path.abspath(dir_path) == os.path.abspath(os.path.join(dir_path, os.pardir)):
             parent_dir = None
         
-        print(dir_path, parent_dir)
-        
         result = {
             "directory": dir_path,
             "parent_directory": parent_dir if dir_path != parent_dir else None,
-            "entries": []
+            "entries": [],
+            "next_cursor": None
         }
         
-        print(result)
-        
         try:
             entries = []
-            for name in os.listdir(dir_path):
-                full_path = os.path.join(dir_path, name)
-                
-                try:
-                    if os.path.isdir(full_path):
-                        # Для директорій
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    try:
+                        # Тип береться з DirEntry — без окремого isdir для кожного запису
+                        is_dir = entry.is_dir()
+                        stat_result = entry.stat()
+                        _, extension = os.path.splitext(entry.name)
                         entries.append({
-                            "name": name,
-                            "path": full_path,
-                            "type": "directory",
+                            "name": entry.name,
+                            "path": entry.path,
+                            "type": "directory" if is_dir else "file",
+                            "size": None if is_dir else stat_result.st_size,
+                            "extension": None if is_dir else extension.lstrip('.').lower(),
+                            "mime_type": None if is_dir else get_mime_type(entry.name),
+                            "modified_ts": stat_result.st_mtime,
+                        })
+                    except OSError as e:
+                        # Якщо виникла помилка при обробці запису, додаємо базову інформацію
+                        entries.append({
+                            "name": entry.name,
+                            "path": entry.path,
+                            "type": "unknown",
                             "size": None,
-                            "extension": None
+                            "extension": None,
+                            "modified_ts": 0,
+                            "error": str(e)
                         })
-                    else:
-                        # Для файлів
-                        file_size = get_file_size(full_path)
-                        
-                        # Отримуємо розширення (без крапки)
-                        _, extension = os.path.splitext(name)
-                        extension = extension.lstrip('.').lower() if extension else ""
-                        
-                        # Базова інформація про файл
-                        file_info = {
-                            "name": name,
-                            "path": full_path,
-                            "type": "file",
-                            "size": file_size,
-                            "extension": extension,  # Додаємо розширення без крапки,
-                            "mime_type": get_mime_type(full_path)
-                        }
-                        
-                        # Додаємо детальну інформацію для невеликих файлів
-                        if file_size < 50 * 1024 * 1024:  # 50 MB ліміт
-                            try:
-                                file_info["hash"] = get_file_hash(full_path)
-                                file_info["file_type"] = get_file_type(full_path)
-                            except Exception as e:
-                                # print(f"Файл більше 50МБ, хеш не генерується {full_path}: {e}")
-                                file_info["file_type"] = get_file_type(full_path)
-                        else:
-                            # Для великих файлів просто додаємо тип
-                            file_info["file_type"] = get_file_type(full_path)
-                        entries.append(file_info)
-                except Exception as e:
-                    # Якщо виникла помилка при обробці файлу, додаємо базову інформацію
-                    print(f"Помилка при обробці {full_path}: {e}")
-                    entries.append({
-                        "name": name,
-                        "path": full_path,
-                        "type": "unknown",
-                        "extension": None,
-                        "error": str(e)
-                    })
-            
-            result["entries"] = entries
+
+            reverse = order == "desc"
+            entries.sort(key=sort_key, reverse=reverse)
+
+            start = 0
+            if cursor:
+                after = SessionService._decode_cursor(cursor)
+                keys = [tuple(sort_key(e)) for e in entries]
+                if reverse:
+                    # Для спадного порядку шукаємо перший ключ, менший за курсор
+                    start = next((i for i, k in enumerate(keys) if k < after), len(keys))
+                else:
+                    start = bisect.bisect_right(keys, after)
+
+            page = entries[start:start + limit]
+            if start + limit < len(entries):
+                result["next_cursor"] = SessionService._encode_cursor(sort_key(page[-1]))
+
+            for entry in page:
+                entry["modified"] = datetime.fromtimestamp(entry.pop("modified_ts")).isoformat()
+
+            result["entries"] = page
+            result["total"] = len(entries)
             result["has_access"] = True
             
         except PermissionError as e:
-            print(f"Доступ заборонено до {dir_path}: {e}")
             result["entries"] = []
             result["has_access"] = False
             result["error"] = f"Доступ заборонено до {dir_path}: {e}"
-        except Exception as e:
+        except OSError as e:
             # Інші помилки також обробляємо м'яко
-            print(f"Помилка при отриманні списку файлів з {dir_path}: {e}")
             result["entries"] = []
             result["has_access"] = False
             result["error"] = f"Помилка: {e}"
         
         return result
 
+    @staticmethod
+    def get_fs_details(paths: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Обчислює хеш і тип для переданих файлів (рядків, видимих у UI).
+
+        Значення беруться з кешу відбитків, якщо файл не змінювався; хеш
+        рахується лише для файлів, менших за FS_HASH_SIZE_LIMIT.
+
+        Returns:
+            Dict: {шлях: {"hash": ..., "file_type": ...} або {"error": ...}}
+        """
+        if len(paths) > FS_DETAILS_BATCH_MAX:
+            raise ValueError(f"Забагато шляхів у запиті: {len(paths)} > {FS_DETAILS_BATCH_MAX}")
+
+        details = {}
+        for path in paths:
+            try:
+                stat_result = os.stat(path)
+                hash_mode = HashTier.FULL if stat_result.st_size < FS_HASH_SIZE_LIMIT else HashTier.SIZE
+                fingerprint = get_file_fingerprint(path, stat_result, hash_mode)
+                details[path] = {
+                    "hash": fingerprint["file_hash"],
+                    "file_type": fingerprint["file_type"]
+                }
+            except OSError as e:
+                details[path] = {"error": str(e)}
+
+        cache = get_fingerprint_cache()
+        if cache:
+            cache.flush()
+
+        return details
+
+    # ---------- Спостерігачі (живий каталог) ----------
+    @staticmethod
+    def start_watch(directory: str, recursive: bool = True) -> Dict[str, Any]:
+        """
+        Запустити inotify-спостерігач для директорії.
+
+        Спостерігачі живуть у поточному процесі API; при кількох воркерах
+        uvicorn кожен процес має власний реєстр.
+        """
+        return start_watcher(directory, recursive).status()
+
+    @staticmethod
+    def stop_watch(directory: str) -> bool:
+        return stop_watcher(directory)
+
+    @staticmethod
+    def list_watches() -> List[Dict[str, Any]]:
+        return list_watchers()
+
+    @staticmethod
+    def get_result_cache_stats() -> Dict[str, Any]:
+        cache = get_result_cache()
+        return cache.stats() if cache is not None else {"enabled": False}
+
     @staticmethod
     def create_session(db: DBSession, payload: SessionCreate) -> Dict[str, Any]:
         sess = StructSession(
             directory = payload.directory,
             recursive = payload.recursive,
+            scan_options = {
+                "workers": payload.workers,
+                "queue_depth": payload.queue_depth,
+                "executor": payload.executor,
+                "hash_mode": payload.hash_mode,
+                "max_in_flight": payload.max_in_flight,
+                "plan_shards": payload.plan_shards,
+                "filters": {
+                    "include": payload.include,
+                    "exclude": payload.exclude,
+                    "min_size": payload.min_size,
+                    "max_size": payload.max_size,
+                    "max_depth": payload.max_depth,
+                    "include_hidden": payload.include_hidden,
+                    "modified_after": payload.modified_after.isoformat() if payload.modified_after else None,
+                    "modified_before": payload.modified_before.isoformat() if payload.modified_before else None
+                }
+            },
             status    = SessionStatus.NEW
         )
         if os.path.exists(sess.directory) and os.path.isdir(sess.directory):
@@ -381,85 +563,141 @@ class SessionService:
         return db.query(StructSession).filter(StructSession.id == sid).first()
 
     @staticmethod
-    def analyze_and_plan(db: DBSession, sid, method_id, algorithm_id):
+    def analyze_and_plan(db: DBSession, sid, method_ids, algorithm_id, incremental: bool = False,
+                         algorithm_params: Optional[Dict[str, Any]] = None, resume: bool = False):
+        """
+        Сканує директорію сесії, описує файли методами і будує план.
+
+        Returns:
+            Optional[Dict]: Підсумок обробки ({"error": ...}, якщо обробка не вдалася)
+                або None, якщо сесія не знайдена
+
+        Raises:
+            ValueError: Якщо сесія вже спланована або має частково збережений план
+        """
         sess = db.query(StructSession).filter_by(id=sid).first()
         if not sess:
             return None
 
         if sess.status == SessionStatus.PLANNED:
-            # Повертаємо інформацію про те, що сесія вже запланована
-            return {
-                "already_planned": True,
-                "message": f"Session {sid} is already planned. No new analysis performed."
-            }
+            raise ValueError(f"Session {sid} is already planned. No new analysis performed.")
+
+        # Перерваний план: інструкції частково збережені, їх треба продовжити або відкинути
+        resume = resume and sess.status == SessionStatus.PLANNING
+        if sess.status == SessionStatus.PLANNING and not resume:
+            persisted = (sess.plan_checkpoint or {}).get("persisted", 0)
+            raise ValueError(f"Session {sid} has a partially persisted plan ({persisted} instructions); "
+                             f"resume or discard it first")
 
         try:
             # ---------- LOOKUP METHOD & ALGORITHM (заздалегідь) ----------
-            m_rec = db.query(MethodRegistry).filter_by(id=method_id, enabled=True).first()
-            if not m_rec:
-                raise ValueError(f"Method '{method_id}' not found or disabled")
-            MethodCls: type[MethodExtractor] = load_class(m_rec.impl_class)
-            
-            method_extractor = MethodCls()
+            # Кілька методів виконуються одним проходом у порядку залежностей
+            if isinstance(method_ids, str):
+                method_ids = [method_ids]
+            members = SessionService._load_methods(db, method_ids)
+            composite = CompositeExtractor(members)
 
-            a_rec = db.query(AlgorithmRegistry).filter_by(id=algorithm_id, enabled=True).first()
-            if not a_rec:
-                raise ValueError(f"Algorithm '{algorithm_id}' not found or disabled")
-            AlgoCls: type[StructAlgorithm] = load_class(a_rec.impl_class)
-            struct_algo = AlgoCls()
+            struct_algo = SessionService._load_algorithm(db, algorithm_id, algorithm_params)
 
-            print(f"ANALYZE: {method_extractor.__class__.__name__}")
+            print(f"ANALYZE: {', '.join(cls.__name__ for _, cls in members)}")
             print(f"PLAN: {struct_algo.__class__.__name__}")
             print(sess.directory, sess.recursive)
             
-            # ---------- SCAN + ANALYZE (один прохід) ----------
-            descriptions = []
-            for meta in scan_dir(sess.directory, sess.recursive):
-                print(f"ANALYZE: {meta['filename']}")
-                
-                # 2. обчислюємо опис методом
-                dsc = method_extractor.run(meta)
-                print(f"ANALYZE: {dsc}")
-
-                # 3. накопичуємо зведений опис для планувальника
-                # Додаємо повну інформацію про файл включно з шляхом
-                combined_desc = {
-                    **dsc,
-                    "file_hash": meta.get("file_hash"),
-                    "original_path": meta.get("original_path")
-                }
-                descriptions.append(combined_desc)
-                print(combined_desc)    
+            # ---------- SCAN → ANALYZE → PLAN → PERSIST (потоковий конвеєр) ----------
+            scan_options = dict(sess.scan_options or {})
+            max_in_flight = scan_options.pop("max_in_flight", None) or PIPELINE_MAX_IN_FLIGHT
+            plan_shards = scan_options.pop("plan_shards", None) or PLAN_SHARDS
+            # Фільтри компілюються один раз і перевіряються сканером до stat і хешування
+            scan_filter = ScanFilter.from_options(scan_options.pop("filters", None))
 
-            sess.files_total = len(descriptions)
-            sess.analysis_method_id = method_id
-            sess.status = SessionStatus.ANALYZED
+            # Дайджести, потрібні методу, рахуються сканером за те саме читання файлу
+            scan_options["digests"] = tuple(dict.fromkeys(("sha256", *composite.digests)))
 
-            # ---------- PLAN ----------
-            instr_raw = struct_algo.run(descriptions)     # MOVE/CREATE/…
-            
-            # Додаємо інструкції до БД
-            for instr in instr_raw:
-                # Використовуємо file_path замість file_hash
-                file_path = instr.get("file_path", "")
-                
-                db.add(FileInstruction(
-                    session_id=sid,
-                    file_path=file_path,  # Зберігаємо повний шлях замість хешу
-                    action=instr["action"],
-                    status=InstructionStatus.PENDING,
-                    params=instr["params"]
-                ))
+            # 1. сканування віддає дескриптори по мірі готовності; знімок директорій
+            #    зберігається завжди, а в інкрементальному режимі читаються лише змінені
+            #    Якщо директорію вже відстежує inotify-спостерігач, дескриптори
+            #    беруться з його живого каталогу без сканування
+            delta = ScanDelta()
+            watcher = get_active_watcher(sess.directory, sess.recursive)
+            if watcher is not None:
+                metas = SessionService._live_descriptors(watcher, sess.directory, sess.recursive, scan_filter)
+            else:
+                metas = scan_dir(
+                    sess.directory, sess.recursive, stream=True,
+                    snapshot=get_snapshot_store(), incremental=incremental, delta=delta,
+                    scan_filter=scan_filter, **scan_options
+                )
+
+            # 2. опис методом виконується окремою стадією з обмеженою чергою;
+            #    CPU-важкі методи — порціями в пулі процесів з ізоляцією помилок
+            #    Результати методу кешуються між сесіями за хешем вмісту файлу
+            extract_errors = {"count": 0, "items": []}
+            stores = {
+                method_id: MethodResultStore(method_id, cls.version, composite.cacheable[method_id])
+                for method_id, cls in members
+            }
+            if composite.cpu_bound:
+                described = SessionService._describe_in_pool(members, composite, metas, stores, extract_errors)
+            else:
+                described = bounded_map(
+                    lambda meta: SessionService._describe(composite, meta, stores),
+                    metas,
+                    max_in_flight
+                )
+
+            # Описи зберігаються в file_descriptions по мірі аналізу (для перегляду
+            # і повторного планування без сканування); описи попереднього запуску
+            # відкидаються в транзакції, яку комітить маркер відновлення плану
+            clear_descriptions(db, sess.id)
+            description_writer = DescriptionWriter(db, sess)
+            files_total = 0
+            def analyzed():
+                nonlocal files_total
+                for combined_desc in described:
+                    files_total += 1
+                    description_writer.add(combined_desc)
+                    yield combined_desc
+
+            # 3-4. планування та збереження інструкцій порціями
+            planner, writer, validator, actions_total = SessionService._plan_and_persist(
+                db, sess, struct_algo, algorithm_params, analyzed(), plan_shards, resume,
+                marker={"source": "scan", "method_ids": list(method_ids), "algorithm_id": algorithm_id,
+                        "algorithm_params": algorithm_params or {}, "incremental": incremental}
+            )
+            description_writer.flush()
+            for store in stores.values():
+                store.flush()
+
+            sess.files_total = files_total
+            sess.analysis_method_id = method_ids[0]
+            sess.analysis_method_ids = [method_id for method_id, _ in members]
+            sess.status = SessionStatus.ANALYZED
 
             sess.struct_algorithm_id = algorithm_id
-            sess.actions_total = len(instr_raw)
+            sess.struct_algorithm_params = algorithm_params or {}
+            sess.actions_total = actions_total
+            sess.processed_total = sess.applied_total = sess.failed_total = 0
+            sess.plan_findings = validator.finish()
+            sess.plan_checkpoint = None
             sess.status = SessionStatus.PLANNED
             db.commit()
 
             return {
                 "files_analyzed": sess.files_total,
                 "actions_created": sess.actions_total,
-                "breakdown": {"total": sess.actions_total}
+                "breakdown": {"total": sess.actions_total},
+                "delta": delta.summary() if watcher is None else None,
+                "source": "scan" if watcher is None else "live_index",
+                "extract_errors": extract_errors,
+                "filters": scan_filter.summary() if scan_filter else None,
+                "result_cache": {
+                    key: sum(store.counts[key] for store in stores.values())
+                    for key in ("hits", "misses")
+                },
+                "watcher": watcher.status() if watcher is not None else None,
+                "algorithm": planner.summary(),
+                "validation": SessionService._findings_summary(sess.plan_findings),
+                "persist": writer.summary()
             }
             
         except Exception as e:
@@ -473,6 +711,549 @@ class SessionService:
                 "breakdown": {"total": 0}
             }
 
+    @staticmethod
+    def _plan_and_persist(db: DBSession, sess: StructSession, struct_algo: StructAlgorithm,
+                          algorithm_params: Optional[Dict[str, Any]], descriptions, plan_shards: int,
+                          resume: bool, marker: Dict[str, Any]):
+        """
+        Спланувати потік описів і масово зберегти інструкції.
+
+        Інструкції одразу індексуються для перевірки плану; шардовані
+        алгоритми на великих сесіях плануються частинами в пулі процесів.
+        Інструкції пишуться транзакціями з маркером відновлення (marker —
+        параметри, з якими план можна продовжити).
+
+        Returns:
+            (планувальник, InstructionWriter, PlanValidator, кількість інструкцій)
+        """
+        struct_algo.root = sess.directory
+        planner = struct_algo
+        if plan_shards > 1 and struct_algo.shardable:
+            planner = ShardedPlanner(struct_algo, algorithm_params, plan_shards)
+        validator = PlanValidator(sess.directory)
+        writer = InstructionWriter(db, sess)
+        actions_total = 0
+        if resume:
+            # Уже збережені інструкції перевіряються разом з новими і не пишуться вдруге
+            for file_path, action, params in writer.resume():
+                validator.add(file_path, action, params)
+                actions_total += 1
+        writer.begin(**marker)
+        for instr in planner.run_stream(descriptions):
+            # Використовуємо file_path замість file_hash
+            file_path = instr.get("file_path", "")
+            if writer.add(file_path, instr["action"], instr["params"]):
+                validator.add(file_path, instr["action"], instr["params"])
+                actions_total += 1
+        writer.finish()
+        return planner, writer, validator, actions_total
+
+    @staticmethod
+    def replan(db: DBSession, sid, algorithm_id: str, algorithm_params: Optional[Dict[str, Any]] = None,
+               resume: bool = False) -> Optional[Dict]:
+        """
+        Будує новий план сесії іншим алгоритмом (або з іншими параметрами)
+        за збереженими описами файлів — без сканування і повторного аналізу.
+        Попередній незастосований план замінюється.
+
+        Args:
+            db: Сесія бази даних
+            sid: ID сесії структуризації
+            algorithm_id: ID алгоритму структуризації
+            algorithm_params: Параметри алгоритму
+            resume: Продовжити перерваний повторний план
+
+        Returns:
+            Optional[Dict]: Підсумок як у analyze_and_plan або None, якщо сесія не знайдена
+
+        Raises:
+            ValueError: Якщо сесія ще не аналізувалась, її план уже застосовано
+                (описи застаріли) або є частково збережений план
+        """
+        sess = db.query(StructSession).filter_by(id=sid).first()
+        if not sess:
+            return None
+
+        resume = resume and sess.status == SessionStatus.PLANNING
+        if sess.status == SessionStatus.PLANNING and not resume:
+            raise ValueError(f"Session {sid} has a partially persisted plan; resume or discard it first")
+        if sess.status in (SessionStatus.APPLYING, SessionStatus.DONE) or (sess.processed_total or 0) > 0:
+            raise ValueError(f"Session {sid} plan has already been applied; stored descriptions are stale")
+        if sess.status not in (SessionStatus.PLANNED, SessionStatus.PLANNING) or not sess.analysis_method_ids:
+            raise ValueError(f"Session {sid} has not been analyzed yet")
+
+        try:
+            struct_algo = SessionService._load_algorithm(db, algorithm_id, algorithm_params)
+            print(f"REPLAN: {struct_algo.__class__.__name__}")
+            plan_shards = (sess.scan_options or {}).get("plan_shards") or PLAN_SHARDS
+
+            if not resume:
+                # Попередній план видаляється в транзакції, яку комітить маркер відновлення
+                db.execute(delete(FileInstruction).where(FileInstruction.session_id == sess.id))
+            planner, writer, validator, actions_total = SessionService._plan_and_persist(
+                db, sess, struct_algo, algorithm_params, iter_descriptions(db, sess.id), plan_shards, resume,
+                marker={"source": "descriptions", "algorithm_id": algorithm_id,
+                        "algorithm_params": algorithm_params or {}}
+            )
+
+            sess.struct_algorithm_id = algorithm_id
+            sess.struct_algorithm_params = algorithm_params or {}
+            sess.actions_total = actions_total
+            sess.processed_total = sess.applied_total = sess.failed_total = 0
+            sess.plan_findings = validator.finish()
+            sess.plan_checkpoint = None
+            sess.status = SessionStatus.PLANNED
+            db.commit()
+
+            return {
+                "files_analyzed": sess.files_total,
+                "actions_created": sess.actions_total,
+                "breakdown": {"total": sess.actions_total},
+                "source": "descriptions",
+                "algorithm": planner.summary(),
+                "validation": SessionService._findings_summary(sess.plan_findings),
+                "persist": writer.summary()
+            }
+
+        except Exception as e:
+            db.rollback()
+            print(f"Помилка в replan: {str(e)}")
+            return {"error": str(e), "files_analyzed": 0, "actions_created": 0, "breakdown": {"total": 0}}
+
+    @staticmethod
+    def get_descriptions(db: DBSession, sid, cursor: Optional[str] = None, limit: int = DESCRIPTION_PAGE_SIZE,
+                         sort: str = "path", order: str = "asc",
+                         filters: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Сторінка збережених описів файлів сесії.
+
+        Пагінація курсорна (keyset): курсор кодує значення поля сортування
+        й id останнього рядка, тож кожна сторінка — один запит індексом
+        без OFFSET, незалежно від глибини.
+
+        Args:
+            db: Сесія бази даних
+            sid: ID сесії структуризації
+            cursor: Курсор наступної сторінки (з next_cursor попередньої відповіді)
+            limit: Розмір сторінки (не більше DESCRIPTION_PAGE_SIZE_MAX)
+            sort: Поле сортування — id, path, size, mtime, mime, extension або hash
+            order: asc або desc
+            filters: mime, extension, hash, min_size, max_size
+
+        Raises:
+            ValueError: Якщо поле сортування або курсор некоректні
+        """
+        sess = db.query(StructSession.id, StructSession.files_total).filter(StructSession.id == sid).first()
+        if not sess:
+            return None
+        after = None
+        if cursor:
+            after = SessionService._decode_cursor(cursor)
+            if len(after) != 2:
+                raise ValueError(f"Некоректний курсор: {cursor}")
+        limit = max(1, min(limit, DESCRIPTION_PAGE_SIZE_MAX))
+        items, next_key = page_descriptions(db, sess.id, after, limit, sort, order, filters)
+        return {
+            "items": items,
+            "next_cursor": SessionService._encode_cursor(next_key) if next_key is not None else None,
+            "files_total": sess.files_total or 0
+        }
+
+    @staticmethod
+    def _live_descriptors(watcher, directory: str, recursive: bool, scan_filter: Optional[ScanFilter] = None):
+        """Дескриптори з живого каталогу спостерігача (лише верхній рівень для нерекурсивної сесії)."""
+        root = os.path.abspath(directory)
+        for meta in watcher.index.descriptors():
+            if not recursive and os.path.dirname(meta["original_path"]) != root:
+                continue
+            try:
+                if scan_filter is not None and not scan_filter.accepts(meta["original_path"], root):
+                    continue
+            except OSError:
+                continue  # файл зник після останньої події спостерігача
+            yield meta
+
+    @staticmethod
+    def estimate(db: DBSession, sid, method_ids, algorithm_id, time_budget: Optional[float] = None,
+                 max_probes: Optional[int] = None, seed: Optional[int] = None,
+                 algorithm_params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Швидка оцінка обсягу роботи analyze_and_plan без повного сканування.
+
+        1. TreeEstimator робить випадкові проби дерева (з фільтрами сесії) й
+           оцінює кількість файлів, байтів і директорій з 95% інтервалами.
+        2. На файлах, вибраних пробами (до ESTIMATE_SAMPLE_FILES), запускаються
+           вибрані методи та алгоритм; кожен файл має вагу проби, тож частки
+           категорій плану проєктуються на все дерево.
+        3. Час обробки проєктується за виміряним часом на файл (опис, аналіз,
+           планування), на директорію (читання) і пропускною здатністю хешування.
+
+        Сесія не змінюється.
+        """
+        sess = db.query(StructSession).filter_by(id=sid).first()
+        if not sess:
+            return None
+
+        if isinstance(method_ids, str):
+            method_ids = [method_ids]
+        members = SessionService._load_methods(db, method_ids)
+        composite = CompositeExtractor(members)
+        struct_algo = SessionService._load_algorithm(db, algorithm_id, algorithm_params)
+
+        # Далі БД лише для вимірювання збереження: транзакція читання не
+        # тримається відкритою під час проб дерева й хешування вибірки
+        directory, recursive = sess.directory, sess.recursive
+        scan_options = dict(sess.scan_options or {})
+        db.rollback()
+
+        started = time.perf_counter()
+        tree = TreeEstimator(
+            directory, recursive,
+            ScanFilter.from_options(scan_options.get("filters")),
+            time_budget or ESTIMATE_TIME_BUDGET, max_probes or ESTIMATE_MAX_PROBES, seed
+        ).run()
+
+        # ---------- вибірка: проби цілком, поки унікальних файлів не більше ліміту ----------
+        sampled_probes, sizes = [], {}
+        for picks in tree["probes"]:
+            new = {path for path, _, _ in picks if path not in sizes}
+            if sampled_probes and len(sizes) + len(new) > ESTIMATE_SAMPLE_FILES:
+                break
+            sampled_probes.append(picks)
+            sizes.update((path, size) for path, size, _ in picks)
+
+        # ---------- опис і аналіз вибірки з вимірюванням часу ----------
+        digests = tuple(dict.fromkeys(("sha256", *composite.digests)))
+        descriptions, file_seconds = {}, []
+        hashed_bytes, hash_seconds, skipped_large = 0, 0.0, 0
+        for path, size in sizes.items():
+            full = size <= ESTIMATE_FULL_HASH_LIMIT
+            if not full and composite.digests:
+                # метод читав би великий файл повністю — файл лишається некласифікованим
+                skipped_large += 1
+                continue
+            try:
+                t0 = time.perf_counter()
+                meta = create_file_descriptor(path, None, HashTier.FULL if full else HashTier.SAMPLE, digests)
+                t1 = time.perf_counter()
+                described = composite.run(meta)
+                t2 = time.perf_counter()
+            except Exception as e:
+                print(f"Помилка оцінки файлу {path}: {e}")
+                continue
+            descriptions[path] = SessionService._combine(meta, composite.merge(described))
+            file_seconds.append((t1 - t0, t2 - t1))
+            if full:
+                hashed_bytes += size
+                hash_seconds += t1 - t0
+
+        t0 = time.perf_counter()
+        instructions = list(struct_algo.run_stream(iter(descriptions.values())))
+        plan_seconds = time.perf_counter() - t0
+
+        # Категорія файлу — ціль його інструкції (dst/new_name), інакше дія або "unchanged"
+        category_of = {}
+        for instr in instructions:
+            path = instr.get("file_path")
+            if path in descriptions and instr["action"] != ActionType.CREATE_DIR:
+                params = instr.get("params") or {}
+                category_of[path] = str(params.get("dst") or params.get("new_name") or instr["action"])
+
+        # Частки категорій — відношення ваг у пробах вибірки, масштабовані на
+        # оцінку всього дерева (за всіма пробами)
+        categories = sorted(set(category_of.values()) | {"unchanged", "unclassified"})
+        per_probe = {c: {"files": [], "bytes": []} for c in categories}
+        probe_files, probe_bytes = [], []
+        for picks in sampled_probes:
+            files_by_cat, bytes_by_cat = defaultdict(float), defaultdict(float)
+            for path, size, weight in picks:
+                if path not in descriptions:
+                    category = "unclassified"
+                else:
+                    category = category_of.get(path, "unchanged")
+                files_by_cat[category] += weight
+                bytes_by_cat[category] += weight * size
+            probe_files.append(sum(files_by_cat.values()))
+            probe_bytes.append(sum(bytes_by_cat.values()))
+            for c in categories:
+                per_probe[c]["files"].append(files_by_cat[c])
+                per_probe[c]["bytes"].append(bytes_by_cat[c])
+
+        def projected(share: Dict[str, float], total: Dict[str, float]) -> Dict[str, float]:
+            return {key: share[key] * total[key] for key in ("estimate", "low", "high")}
+
+        # ---------- час ----------
+        # Вартість збереження інструкцій вимірюється вставкою вибірки з відкатом
+        persist_seconds = SessionService._measure_persist(sid, instructions)
+        per_file_fixed = (plan_seconds + persist_seconds) / len(descriptions) if descriptions else 0.0
+
+        # Опис файлу в пулі потоків обмежений GIL, тож в оцінці паралелізм
+        # рахується лише для пулу процесів; нижня межа — ідеальний паралелізм
+        # і повне перекриття стадій конвеєра
+        scan_workers = scan_options.get("workers") or SCAN_WORKERS
+        describe_parallel = scan_workers if scan_options.get("executor") == "process" else 1
+        extract_parallel = EXTRACT_WORKERS if composite.cpu_bound else 1
+        per_file = mean_interval([
+            describe / describe_parallel + extract / extract_parallel + per_file_fixed
+            for describe, extract in file_seconds
+        ])
+        optimistic = min([per_file["low"]] + [
+            sum(max(describe / scan_workers, extract / extract_parallel) + per_file_fixed
+                for describe, extract in file_seconds) / len(file_seconds)
+        ] if file_seconds else [0.0])
+        per_dir = tree["list_seconds"] / tree["dirs_listed"] if tree["dirs_listed"] else 0.0
+        runtime = {
+            "estimate": tree["files"]["estimate"] * per_file["estimate"] + tree["dirs"]["estimate"] * per_dir,
+            "low": tree["files"]["low"] * optimistic + tree["dirs"]["low"] * per_dir,
+            "high": tree["files"]["high"] * per_file["high"] + tree["dirs"]["high"] * per_dir
+        }
+        actions_per_file = len(instructions) / len(descriptions) if descriptions else 0.0
+
+        def rounded(interval: Dict[str, float], digits: int = 0) -> Dict[str, float]:
+            return {k: round(v, digits) if digits else round(v) for k, v in interval.items()}
+
+        return {
+            "confidence": 0.95,
+            "sample": {
+                "probes": len(tree["probes"]),
+                "probes_analyzed": len(sampled_probes),
+                "dirs_listed": tree["dirs_listed"],
+                "files_analyzed": len(descriptions),
+                "files_skipped_large": skipped_large,
+                "elapsed_seconds": round(time.perf_counter() - started, 3)
+            },
+            "files": rounded(tree["files"]),
+            "bytes": rounded(tree["bytes"]),
+            "dirs": rounded(tree["dirs"]),
+            "by_depth": [{"depth": d["depth"], **rounded({k: v for k, v in d.items() if k != "depth"})}
+                         for d in tree["by_depth"]],
+            "actions": rounded({k: v * actions_per_file for k, v in tree["files"].items()}),
+            "categories": {
+                c: {
+                    "files": rounded(projected(ratio_interval(v["files"], probe_files), tree["files"])),
+                    "bytes": rounded(projected(ratio_interval(v["bytes"], probe_bytes), tree["bytes"]))
+                }
+                for c, v in per_probe.items()
+            },
+            "runtime_seconds": rounded(runtime, 2),
+            "hash_throughput_mb_s": round(hashed_bytes / hash_seconds / 1e6, 1) if hash_seconds else None
+        }
+
+    @staticmethod
+    def _measure_persist(sid, instructions: List[Dict]) -> float:
+        """
+        Час збереження інструкцій вибірки в БД: вставка з подальшим відкатом
+        в окремій короткій транзакції запису (блокування запису тримається
+        лише на час вставки вибірки).
+        """
+        if not instructions:
+            return 0.0
+        with SessionLocal() as db:
+            sess = db.query(StructSession).filter_by(id=sid).first()
+            if not sess:
+                return 0.0
+            started = time.perf_counter()
+            try:
+                writer = InstructionWriter(db, sess, commit_size=None)
+                for instr in instructions:
+                    writer.add(instr.get("file_path", ""), instr["action"], instr["params"])
+                writer.finish()
+                return time.perf_counter() - started
+            finally:
+                db.rollback()
+
+    @staticmethod
+    def _load_methods(db: DBSession, method_ids: List[str]) -> List[Tuple[str, type]]:
+        """
+        Завантажити класи методів разом із їхніми залежностями (depends_on),
+        яких немає в запиті, і впорядкувати їх для виконання.
+        """
+        classes: Dict[str, type] = {}
+        queue = list(method_ids)
+        while queue:
+            method_id = queue.pop(0)
+            if method_id in classes:
+                continue
+            m_rec = db.query(MethodRegistry).filter_by(id=method_id, enabled=True).first()
+            if not m_rec:
+                raise ValueError(f"Method '{method_id}' not found or disabled")
+            classes[method_id] = load_class(m_rec.impl_class)
+            queue.extend(classes[method_id].depends_on)
+        return CompositeExtractor.order(classes)
+
+    @staticmethod
+    def _load_algorithm(db: DBSession, algorithm_id: str,
+                        params: Optional[Dict[str, Any]] = None) -> StructAlgorithm:
+        """
+        Створити алгоритм структурування з параметрами запиту (за params_schema).
+
+        Raises:
+            ValueError: Якщо алгоритм не знайдено/вимкнено або параметри некоректні
+        """
+        a_rec = db.query(AlgorithmRegistry).filter_by(id=algorithm_id, enabled=True).first()
+        if not a_rec:
+            raise ValueError(f"Algorithm '{algorithm_id}' not found or disabled")
+        AlgoCls: type[StructAlgorithm] = load_class(a_rec.impl_class)
+        try:
+            return AlgoCls(**(params or {}))
+        except TypeError as e:
+            raise ValueError(f"Invalid parameters for algorithm '{algorithm_id}': {e}")
+
+    @staticmethod
+    def _cached_results(stores: Dict[str, MethodResultStore], meta: Dict) -> Dict[str, Dict]:
+        cached = {}
+        for method_id, store in stores.items():
+            dsc = store.get(meta)
+            if dsc is not None:
+                cached[method_id] = dsc
+        return cached
+
+    @staticmethod
+    def _store_results(stores: Dict[str, MethodResultStore], meta: Dict,
+                       described: Dict[str, Dict], cached: Dict[str, Dict]) -> None:
+        for method_id, dsc in described.items():
+            if method_id not in cached:
+                stores[method_id].put(meta, dsc)
+
+    @staticmethod
+    def _describe(composite: CompositeExtractor, meta: Dict, stores: Dict[str, MethodResultStore]) -> Dict:
+        """Обчислити опис файлу всіма методами (або взяти з кешу) і доповнити його шляхом та хешем."""
+        cached = SessionService._cached_results(stores, meta)
+        if len(cached) < len(stores):
+            print(f"ANALYZE: {meta['filename']}")
+        described = composite.run(meta, cached)
+        SessionService._store_results(stores, meta, described, cached)
+        return SessionService._combine(meta, composite.merge(described))
+
+    @staticmethod
+    def _describe_in_pool(members: List[Tuple[str, type]], composite: CompositeExtractor, metas,
+                          stores: Dict[str, MethodResultStore], extract_errors: Dict):
+        """
+        Опис файлів CPU-важкими методами в пулі процесів.
+
+        Файли, для яких у кеші є описи всіх методів, не надсилаються воркерам.
+        Файли, на яких метод впав або перевищив ліміт часу, не потрапляють у
+        план — вони рахуються в extract_errors (перші DELTA_PATHS_LIMIT шляхів).
+        """
+        cached = set()
+
+        def resolve(meta):
+            found = SessionService._cached_results(stores, meta)
+            if len(found) < len(stores):
+                return None
+            cached.add(id(meta))
+            return found
+
+        with BatchExecutor(CompositeExtractor, (tuple(members),)) as executor:
+            for meta, described, error in executor.map(metas, resolve):
+                if error is not None:
+                    print(f"Помилка аналізу файлу {meta.get('original_path')}: {error}")
+                    extract_errors["count"] += 1
+                    if len(extract_errors["items"]) < DELTA_PATHS_LIMIT:
+                        extract_errors["items"].append({"path": meta.get("original_path"), "error": error})
+                    continue
+                if id(meta) in cached:
+                    cached.discard(id(meta))
+                else:
+                    SessionService._store_results(stores, meta, described, {})
+                yield SessionService._combine(meta, composite.merge(described))
+
+    @staticmethod
+    def _combine(meta: Dict, dsc: Dict) -> Dict:
+        # Додаємо повну інформацію про файл включно з шляхом; числові поля
+        # дескриптора (розмір, дати) доступні алгоритмам, якщо метод їх не перевизначив
+        return {
+            "size_bytes": meta.get("size_bytes"),
+            "mtime": meta.get("mtime"),
+            "created_at": meta.get("created_at"),
+            **dsc,
+            "file_hash": meta.get("file_hash"),
+            "hash_tier": meta.get("hash_tier"),
+            "original_path": meta.get("original_path")
+        }
+
+    @staticmethod
+    def _findings_summary(findings: Optional[Dict]) -> Optional[Dict]:
+        """Знахідки перевірки без переліку записів (для звіту обробки)."""
+        if findings is None:
+            return None
+        return {key: value for key, value in findings.items() if key != "items"}
+
+    @staticmethod
+    def validate_plan(db: DBSession, sid) -> Optional[Dict]:
+        """
+        Повторно перевіряє збережений план (інструкції PENDING) проти
+        поточного стану файлової системи і зберігає знахідки в сесії.
+
+        Args:
+            db: Сесія бази даних
+            sid: ID сесії структуризації
+
+        Returns:
+            Optional[Dict]: Знахідки PlanValidator або None, якщо сесія не знайдена
+        """
+        sess = db.query(StructSession).filter_by(id=sid).first()
+        if not sess:
+            return None
+
+        validator = PlanValidator(sess.directory)
+        rows = db.query(FileInstruction.file_path, FileInstruction.action, FileInstruction.params).filter(
+            FileInstruction.session_id == sid,
+            FileInstruction.status == InstructionStatus.PENDING
+        ).yield_per(PERSIST_CHUNK_SIZE)
+        for file_path, action, params in rows:
+            validator.add(file_path, action, params)
+
+        sess.plan_findings = validator.finish()
+        db.commit()
+        return sess.plan_findings
+
+    @staticmethod
+    def resume_plan(db: DBSession, sid) -> Optional[Dict]:
+        """
+        Продовжує перерваний план (статус PLANNING) з параметрами з маркера
+        відновлення: дерево аналізується заново (з кешами відбитків і
+        результатів методів) або, для повторного плану, описи читаються
+        з file_descriptions; вже збережені інструкції не пишуться вдруге.
+
+        Returns:
+            Optional[Dict]: Підсумок як у analyze_and_plan або None, якщо сесія не знайдена
+
+        Raises:
+            ValueError: Якщо сесія не має перерваного плану
+        """
+        sess = db.query(StructSession).filter_by(id=sid).first()
+        if not sess:
+            return None
+        checkpoint = sess.plan_checkpoint
+        if sess.status != SessionStatus.PLANNING or not checkpoint:
+            raise ValueError(f"Session {sid} has no interrupted plan to resume")
+        if checkpoint.get("source") == "descriptions":
+            return SessionService.replan(db, sid, checkpoint["algorithm_id"],
+                                         checkpoint.get("algorithm_params"), resume=True)
+        return SessionService.analyze_and_plan(
+            db, sid, checkpoint["method_ids"], checkpoint["algorithm_id"],
+            checkpoint.get("incremental", False), checkpoint.get("algorithm_params"), resume=True
+        )
+
+    @staticmethod
+    def discard_plan(db: DBSession, sid) -> Optional[Dict]:
+        """
+        Відкидає збережений план сесії (зокрема частково збережений):
+        видаляє інструкції й описи файлів і повертає сесію в стан NEW.
+
+        Returns:
+            Optional[Dict]: Кількість видалених інструкцій або None, якщо сесія не знайдена
+        """
+        sess = db.query(StructSession).filter_by(id=sid).first()
+        if not sess:
+            return None
+        if sess.status == SessionStatus.APPLYING:
+            raise ValueError(f"Session {sid} is being applied")
+        # Описи без плану не використовуються: наступний аналіз збере їх заново
+        clear_descriptions(db, sess.id)
+        return {"discarded": discard_plan(db, sess), "status": sess.status}
+
     @staticmethod
     def get_preview(db: DBSession, sid) -> Optional[Dict]:
         """
@@ -503,12 +1284,26 @@ class SessionService:
         
         # Список файлів, які потрібно перемістити
         files_to_move = []
+        # Файли, що переміщуються з новим ім'ям
+        files_to_rename = []
+        # Файли, що замінюються жорстким посиланням (лишаються на місці)
+        files_to_link = []
         for instr in instructions:
             if instr.action == ActionType.MOVE_FILE:
                 file_path = instr.file_path
                 dst_dir = instr.params.get("dst", "")
                 if file_path and dst_dir:
                     files_to_move.append((file_path, dst_dir))
+            elif instr.action == ActionType.RENAME_FILE:
+                file_path = instr.file_path
+                dst = instr.params.get("dst", "")
+                if file_path and dst:
+                    files_to_rename.append((file_path, dst))
+            elif instr.action == ActionType.HARDLINK_FILE:
+                file_path = instr.file_path
+                target = instr.params.get("target", "")
+                if file_path and target:
+                    files_to_link.append((file_path, target))
         
         # Створюємо дерево у потрібному форматі
         tree = {}
@@ -550,6 +1345,30 @@ class SessionService:
             
             # Додаємо файл з інформацією про переміщення
             current_node[file_name] = f"MOVE->{dst_dir}"
+
+        # Перейменовані файли показуємо під новим ім'ям у цільовій директорії
+        for file_path, dst in files_to_rename:
+            *dst_parts, new_name = dst.strip('/\\').split('/')
+
+            current_node = tree
+            for part in dst_parts:
+                if part:
+                    current_node = current_node.setdefault(part, {})
+
+            current_node[new_name] = f"RENAME<-{os.path.basename(file_path)}"
+
+        # Жорсткі посилання показуємо на їхньому поточному місці
+        for file_path, target in files_to_link:
+            rel_path = os.path.relpath(file_path, session.directory or os.sep).replace(os.sep, "/")
+            *dir_parts, file_name = rel_path.split("/")
+
+            current_node = tree
+            for part in dir_parts:
+                if part and part != os.curdir:
+                    current_node = current_node.setdefault(part, {})
+
+            rel_target = os.path.relpath(target, session.directory or os.sep).replace(os.sep, "/")
+            current_node[file_name] = f"HARDLINK->{rel_target}"
         
         return {"tree": tree}
 
@@ -575,153 +1394,306 @@ class SessionService:
         base_directory = sess.directory
         if not base_directory:
             return {"applied": 0, "failed": 0, "errors": ["Session has no directory specified"]}
+        if sess.status == SessionStatus.PLANNING:
+            return {"applied": 0, "failed": 0,
+                    "errors": ["Plan is only partially persisted; resume or discard it first"]}
 
-        # Отримуємо всі інструкції зі статусом PENDING
-        instrs = db.query(FileInstruction).filter(
+        # Отримуємо всі інструкції зі статусом PENDING (індекс session_id, status);
+        # рядки без ORM-об'єктів — статуси пишуться порціями окремими UPDATE
+        instrs = db.query(
+            FileInstruction.id, FileInstruction.file_path, FileInstruction.action, FileInstruction.params
+        ).filter(
             FileInstruction.session_id == sid,
             FileInstruction.status == InstructionStatus.PENDING
         ).all()
 
         applied = failed = 0
         errors: List[str] = []
+
+        # Результати поточної порції: статус → id інструкцій
+        outcomes = {InstructionStatus.APPLIED: [], InstructionStatus.FAILED: []}
+        # Лічильники сесії накопичуються з попередніх запусків apply
+        progress = {
+            "processed": sess.processed_total or 0,
+            "applied": sess.applied_total or 0,
+            "failed": sess.failed_total or 0
+        }
+        if not dry_run:
+            sess.status = SessionStatus.APPLYING
+            db.commit()
         
         # Множина директорій, які потрібно перевірити на порожність після переміщення файлів
         empty_dir_candidates = set()
 
-        for instr in instrs:
-            try:
-                # Виконуємо дію відповідно до типу інструкції
-                if instr.action == ActionType.CREATE_DIR:
-                    # Створюємо директорію у базовій директорії сесії
-                    dir_path = os.path.join(base_directory, instr.params.get("path", ""))
-                    if not dry_run:
-                        os.makedirs(dir_path, exist_ok=True)
-                    instr.status = InstructionStatus.APPLIED
-                    applied += 1
+        try:
+            for position, instr in enumerate(instrs, 1):
+                outcome = None
+                try:
+                    # Виконуємо дію відповідно до типу інструкції
+                    if instr.action == ActionType.CREATE_DIR:
+                        # Створюємо директорію у базовій директорії сесії
+                        dir_path = os.path.join(base_directory, instr.params.get("path", ""))
+                        if not dry_run:
+                            os.makedirs(dir_path, exist_ok=True)
+                        outcome = InstructionStatus.APPLIED
+                        applied += 1
                     
-                elif instr.action == ActionType.DELETE_EMPTY_DIR:
-                    # Видаляємо порожню директорію
-                    dir_path = os.path.join(base_directory, instr.params.get("path", ""))
-                    if not dry_run:
-                        if os.path.isdir(dir_path) and not os.listdir(dir_path):
-                            os.rmdir(dir_path)
-                            instr.status = InstructionStatus.APPLIED
-                            applied += 1
-                        else:
-                            instr.status = InstructionStatus.FAILED
-                            error_msg = f"Directory is not empty or does not exist: {dir_path}"
-                            errors.append(error_msg)
-                            failed += 1
+                    elif instr.action == ActionType.DELETE_EMPTY_DIR:
+                        # Видаляємо порожню директорію
+                        dir_path = os.path.join(base_directory, instr.params.get("path", ""))
+                        if not dry_run:
+                            if os.path.isdir(dir_path) and not os.listdir(dir_path):
+                                os.rmdir(dir_path)
+                                outcome = InstructionStatus.APPLIED
+                                applied += 1
+                            else:
+                                outcome = InstructionStatus.FAILED
+                                error_msg = f"Directory is not empty or does not exist: {dir_path}"
+                                errors.append(error_msg)
+                                failed += 1
                     
-                elif instr.action == ActionType.MOVE_FILE:
-                    # Переміщуємо файл
-                    src_path = instr.file_path  # Повний шлях до файлу
-                    src_dir = os.path.dirname(src_path)  # Директорія, з якої переміщуємо файл
+                    elif instr.action == ActionType.MOVE_FILE:
+                        # Переміщуємо файл
+                        src_path = instr.file_path  # Повний шлях до файлу
+                        src_dir = os.path.dirname(src_path)  # Директорія, з якої переміщуємо файл
                     
-                    # Додаємо директорію до кандидатів на видалення
-                    empty_dir_candidates.add(src_dir)
+                        # Додаємо директорію до кандидатів на видалення
+                        empty_dir_candidates.add(src_dir)
                     
-                    # Цільовий шлях - базова директорія + відносний шлях
-                    dst_dir = os.path.join(base_directory, instr.params.get("dst", "").rstrip("\\").rstrip("/"))
-                    dst_path = os.path.join(dst_dir, os.path.basename(src_path))
+                        # Цільовий шлях - базова директорія + відносний шлях
+                        dst_dir = os.path.join(base_directory, instr.params.get("dst", "").rstrip("\\").rstrip("/"))
+                        dst_path = os.path.join(dst_dir, os.path.basename(src_path))
                     
-                    if not dry_run:
-                        if os.path.exists(src_path):
-                            # Переконуємося, що цільова директорія існує
-                            os.makedirs(dst_dir, exist_ok=True)
+                        if not dry_run:
+                            if SessionService._would_overwrite(src_path, dst_path):
+                                outcome = InstructionStatus.FAILED
+                                errors.append(f"Destination already exists: {dst_path}")
+                                failed += 1
+                            elif os.path.exists(src_path):
+                                # Переконуємося, що цільова директорія існує
+                                os.makedirs(dst_dir, exist_ok=True)
                             
-                            # Переміщуємо файл
-                            shutil.move(src_path, dst_path)
-                            instr.status = InstructionStatus.APPLIED
-                            applied += 1
-                        else:
-                            instr.status = InstructionStatus.FAILED
-                            error_msg = f"Source file does not exist: {src_path}"
-                            errors.append(error_msg)
-                            failed += 1
+                                # Переміщуємо файл
+                                shutil.move(src_path, dst_path)
+                                outcome = InstructionStatus.APPLIED
+                                applied += 1
+                            else:
+                                outcome = InstructionStatus.FAILED
+                                error_msg = f"Source file does not exist: {src_path}"
+                                errors.append(error_msg)
+                                failed += 1
                     
-                elif instr.action == ActionType.RENAME_FILE:
-                    # Перейменовуємо файл
-                    src_path = instr.file_path  # Повний шлях до файлу
-                    src_dir = os.path.dirname(src_path)  # Директорія, з якої переміщуємо файл
+                    elif instr.action == ActionType.RENAME_FILE:
+                        # Перейменовуємо файл
+                        src_path = instr.file_path  # Повний шлях до файлу
+                        src_dir = os.path.dirname(src_path)  # Директорія, з якої переміщуємо файл
                     
-                    # Додаємо директорію до кандидатів на видалення
-                    empty_dir_candidates.add(src_dir)
+                        # Додаємо директорію до кандидатів на видалення
+                        empty_dir_candidates.add(src_dir)
                     
-                    dst_path = os.path.join(base_directory, instr.params.get("dst", ""))
+                        dst_path = os.path.join(base_directory, instr.params.get("dst", ""))
                     
-                    if not dry_run:
-                        if os.path.exists(src_path):
-                            # Переконуємося, що цільова директорія існує
-                            dst_dir = os.path.dirname(dst_path)
-                            os.makedirs(dst_dir, exist_ok=True)
+                        if not dry_run:
+                            if SessionService._would_overwrite(src_path, dst_path):
+                                outcome = InstructionStatus.FAILED
+                                errors.append(f"Destination already exists: {dst_path}")
+                                failed += 1
+                            elif os.path.exists(src_path):
+                                # Переконуємося, що цільова директорія існує
+                                dst_dir = os.path.dirname(dst_path)
+                                os.makedirs(dst_dir, exist_ok=True)
                             
-                            # Перейменовуємо файл
-                            os.rename(src_path, dst_path)
-                            instr.status = InstructionStatus.APPLIED
-                            applied += 1
-                        else:
-                            instr.status = InstructionStatus.FAILED
-                            error_msg = f"Source file does not exist: {src_path}"
-                            errors.append(error_msg)
-                            failed += 1
+                                # Перейменовуємо файл
+                                os.rename(src_path, dst_path)
+                                outcome = InstructionStatus.APPLIED
+                                applied += 1
+                            else:
+                                outcome = InstructionStatus.FAILED
+                                error_msg = f"Source file does not exist: {src_path}"
+                                errors.append(error_msg)
+                                failed += 1
                 
-                else:
-                    instr.status = InstructionStatus.FAILED
-                    error_msg = f"Unknown action: {instr.action}"
+                    elif instr.action == ActionType.HARDLINK_FILE:
+                        # Замінюємо дублікат жорстким посиланням на канонічну копію
+                        src_path = instr.file_path  # Повний шлях до дубліката
+                        target_path = instr.params.get("target", "")
+
+                        if not dry_run:
+                            error_msg = SessionService._replace_with_hardlink(src_path, target_path)
+                            if error_msg is None:
+                                outcome = InstructionStatus.APPLIED
+                                applied += 1
+                            else:
+                                outcome = InstructionStatus.FAILED
+                                errors.append(error_msg)
+                                failed += 1
+
+                    else:
+                        outcome = InstructionStatus.FAILED
+                        error_msg = f"Unknown action: {instr.action}"
+                        errors.append(error_msg)
+                        failed += 1
+                    
+                except Exception as exc:
+                    outcome = InstructionStatus.FAILED
+                    error_msg = f"{instr.action} - {str(exc)}"
                     errors.append(error_msg)
                     failed += 1
-                    
-            except Exception as exc:
-                instr.status = InstructionStatus.FAILED
-                error_msg = f"{instr.action} - {str(exc)}"
-                errors.append(error_msg)
-                failed += 1
 
-        # Видаляємо порожні директорії після переміщення файлів
-        if not dry_run:
-            # Сортуємо директорії за довжиною шляху (щоб спочатку видаляти найглибші)
-            sorted_dirs = sorted(empty_dir_candidates, key=lambda x: len(x.split(os.sep)), reverse=True)
+                if outcome is not None:
+                    outcomes[outcome].append(instr.id)
+                if not dry_run and position % APPLY_PROGRESS_BATCH == 0:
+                    SessionService._record_progress(db, sess, outcomes, progress)
+
+            # Видаляємо порожні директорії після переміщення файлів
+            if not dry_run:
+                # Сортуємо директорії за довжиною шляху (щоб спочатку видаляти найглибші)
+                sorted_dirs = sorted(empty_dir_candidates, key=lambda x: len(x.split(os.sep)), reverse=True)
             
-            for dir_path in sorted_dirs:
-                try:
-                    # Перевіряємо, чи директорія існує
-                    if os.path.isdir(dir_path):
-                        # Перевіряємо, чи директорія порожня
-                        if not os.listdir(dir_path):
-                            os.rmdir(dir_path)
-                            print(f"Removed empty directory: {dir_path}")
+                for dir_path in sorted_dirs:
+                    try:
+                        # Перевіряємо, чи директорія існує
+                        if os.path.isdir(dir_path):
+                            # Перевіряємо, чи директорія порожня
+                            if not os.listdir(dir_path):
+                                os.rmdir(dir_path)
+                                print(f"Removed empty directory: {dir_path}")
                             
-                            # Додаємо батьківську директорію до кандидатів на видалення
-                            parent_dir = os.path.dirname(dir_path)
-                            if parent_dir and parent_dir != base_directory:
-                                sorted_dirs.append(parent_dir)
-                except Exception as exc:
-                    print(f"Failed to remove directory {dir_path}: {str(exc)}")
+                                # Додаємо батьківську директорію до кандидатів на видалення
+                                parent_dir = os.path.dirname(dir_path)
+                                if parent_dir and parent_dir != base_directory:
+                                    sorted_dirs.append(parent_dir)
+                    except Exception as exc:
+                        print(f"Failed to remove directory {dir_path}: {str(exc)}")
 
-        if not dry_run:
-            # Оновлюємо статус сесії
-            sess.status = SessionStatus.DONE if failed == 0 else SessionStatus.FAILED
-            db.commit()
+                # Оновлюємо статус сесії разом з останньою порцією статусів
+                sess.status = SessionStatus.DONE if failed == 0 else SessionStatus.FAILED
+                SessionService._record_progress(db, sess, outcomes, progress)
+        except Exception as exc:
+            # Сесія не повинна лишитися в APPLYING назавжди (такий план не можна ні
+            # відкинути, ні перебудувати): FAILED і лічильники вже виконаних дій
+            db.rollback()
+            print(f"Помилка в apply_plan: {str(exc)}")
+            errors.append(f"Apply aborted: {str(exc)}")
+            if not dry_run:
+                SessionService._abort_apply(db, sess, outcomes, progress)
+            return {"applied": applied, "failed": failed, "errors": errors}
 
         return {"applied": applied, "failed": failed, "errors": errors}
 
+    @staticmethod
+    def _record_progress(db: DBSession, sess: StructSession, outcomes: Dict[str, List], progress: Dict[str, int]) -> None:
+        """
+        Записати статуси порції інструкцій (по одному UPDATE на статус),
+        додати їх до лічильників сесії і закомітити.
+        """
+        totals = dict(progress)
+        for status, ids in outcomes.items():
+            if not ids:
+                continue
+            db.execute(
+                update(FileInstruction).where(FileInstruction.id.in_(ids)).values(status=status),
+                execution_options={"synchronize_session": False}
+            )
+            totals["processed"] += len(ids)
+            totals["applied" if status == InstructionStatus.APPLIED else "failed"] += len(ids)
+        sess.processed_total = totals["processed"]
+        sess.applied_total = totals["applied"]
+        sess.failed_total = totals["failed"]
+        db.commit()
+        # Порція врахована лише після коміту: при помилці її можна записати повторно
+        progress.update(totals)
+        for ids in outcomes.values():
+            ids.clear()
+
+    @staticmethod
+    def _abort_apply(db: DBSession, sess: StructSession, outcomes: Dict[str, List], progress: Dict[str, int]) -> None:
+        """
+        Позначити перерване застосування як FAILED разом із незаписаною порцією
+        статусів; якщо й це не вдається — зберегти хоча б статус сесії.
+        """
+        try:
+            sess.status = SessionStatus.FAILED
+            SessionService._record_progress(db, sess, outcomes, progress)
+        except Exception as exc:
+            db.rollback()
+            print(f"Помилка запису прогресу apply_plan: {str(exc)}")
+            db.execute(
+                update(StructSession).where(StructSession.id == sess.id).values(status=SessionStatus.FAILED),
+                execution_options={"synchronize_session": False}
+            )
+            db.commit()
+
+    @staticmethod
+    def _would_overwrite(src_path: str, dst_path: str) -> bool:
+        """
+        Чи займає ціль інший файл: shutil.move/os.rename на POSIX мовчки
+        перезаписують його, тож такі дії не виконуються.
+        """
+        if not os.path.lexists(dst_path):
+            return False
+        try:
+            return not os.path.samefile(src_path, dst_path)
+        except OSError:
+            return True
+
+    @staticmethod
+    def _replace_with_hardlink(src_path: str, target_path: str) -> Optional[str]:
+        """
+        Замінити файл src_path жорстким посиланням на target_path.
+
+        Перед заміною вміст обох файлів перевіряється повторно (файли могли
+        змінитися після планування); посилання створюється під тимчасовим
+        ім'ям і атомарно підміняє дублікат.
+
+        Returns:
+            Optional[str]: Повідомлення про помилку або None, якщо успішно
+        """
+        if not os.path.isfile(src_path):
+            return f"Source file does not exist: {src_path}"
+        if not os.path.isfile(target_path):
+            return f"Hardlink target does not exist: {target_path}"
+        src_stat, target_stat = os.stat(src_path), os.stat(target_path)
+        if os.path.samestat(src_stat, target_stat):
+            return None  # уже одне й те саме посилання
+        if src_stat.st_dev != target_stat.st_dev:
+            return f"Hardlink target is on another filesystem: {target_path}"
+        if src_stat.st_size != target_stat.st_size or \
+           get_file_fingerprint(src_path, src_stat, HashTier.FULL)["file_hash"] != \
+           get_file_fingerprint(target_path, target_stat, HashTier.FULL)["file_hash"]:
+            return f"File content changed since planning: {src_path}"
+
+        tmp_path = f"{src_path}.{uuid4().hex[:8]}.link"
+        os.link(target_path, tmp_path)
+        try:
+            os.replace(tmp_path, src_path)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+        return None
+
     # ---------- PROGRESS ----------
     @staticmethod
     def get_progress(db: DBSession, sid) -> Optional[Dict]:
-        sess = db.query(StructSession).filter(StructSession.id == sid).first()
+        # Один рядок сесії за первинним ключем, лише потрібні колонки
+        sess = db.query(
+            StructSession.status, StructSession.actions_total, StructSession.processed_total,
+            StructSession.applied_total, StructSession.failed_total
+        ).filter(StructSession.id == sid).first()
         if not sess:
             return None
 
+        counters = {
+            "total": sess.actions_total or 0,
+            "processed": sess.processed_total or 0,
+            "applied": sess.applied_total or 0,
+            "failed": sess.failed_total or 0
+        }
         if sess.status not in {SessionStatus.APPLYING, SessionStatus.PLANNED}:
             # якщо не в процесі – 0 або 100 %
             percent = 100 if sess.status == SessionStatus.DONE else 0
-            return {"percent": percent, "status": sess.status}
+            return {"percent": percent, "status": sess.status, **counters}
 
-        total = sess.actions_total or 1
-        done = db.query(FileInstruction).filter(
-            FileInstruction.session_id == sid,
-            FileInstruction.status != InstructionStatus.PENDING
-        ).count()
-        percent = int(done / total * 100)
-        return {"percent": percent, "status": sess.status}
+        total = counters["total"] or 1
+        percent = min(100, int(counters["processed"] / total * 100))
+        return {"percent": percent, "status": sess.status, **counters}
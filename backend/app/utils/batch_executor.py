@@ -0,0 +1,213 @@
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..config import EXTRACT_CHUNK_SIZE, EXTRACT_ITEM_TIMEOUT, EXTRACT_WORKERS
+
+# Запас часу (с) понад ліміт порції, після якого воркер вважається завислим
+HARD_TIMEOUT_GRACE = 5.0
+# Скільки разів файл повторюється окремо після падіння воркера
+MAX_ISOLATED_ATTEMPTS = 2
+
+# Результат одного файлу: (опис, помилка) — рівно одне з полів не None
+ItemResult = Tuple[Optional[Dict], Optional[str]]
+
+# Екземпляри екстракторів у процесі-воркері (створюються один раз на клас і аргументи)
+_extractors: Dict[tuple, object] = {}
+
+
+class ItemTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise ItemTimeout()
+
+
+@contextmanager
+def _time_limit(seconds: Optional[float]):
+    """Обмежити час виконання блоку через SIGALRM (лише Unix, головний потік воркера)."""
+    if not seconds or not hasattr(signal, "setitimer"):
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _run_chunk(extractor_cls: type, init_args: tuple, chunk: List[Dict],
+               item_timeout: Optional[float]) -> List[ItemResult]:
+    """
+    Виконати порцію у воркері.
+
+    Спершу порція йде в run_batch з лімітом item_timeout * len(chunk); якщо він
+    падає або перевищує ліміт — кожен файл повторюється окремо через run з
+    власним лімітом, тож помилка одного файлу не зачіпає решту порції.
+    """
+    key = (extractor_cls, init_args)
+    extractor = _extractors.get(key)
+    if extractor is None:
+        extractor = _extractors[key] = extractor_cls(*init_args)
+
+    if len(chunk) > 1:
+        try:
+            with _time_limit(item_timeout and item_timeout * len(chunk)):
+                results = extractor.run_batch(chunk)
+            if len(results) == len(chunk):
+                return [(result, None) for result in results]
+        except Exception:
+            pass
+
+    isolated: List[ItemResult] = []
+    for item in chunk:
+        try:
+            with _time_limit(item_timeout):
+                isolated.append((extractor.run(item), None))
+        except ItemTimeout:
+            isolated.append((None, f"timeout after {item_timeout}s"))
+        except Exception as e:
+            isolated.append((None, f"{type(e).__name__}: {e}"))
+    return isolated
+
+
+class BatchExecutor:
+    """
+    Виконання CPU-важкого екстрактора в пулі процесів.
+
+    Описи групуються в порції по chunk_size і надсилаються воркерам; у польоті
+    тримається не більше порцій, ніж воркерів, тож пам'ять обмежена.
+    Ізоляція помилок:
+      - виняток або SIGALRM-таймаут файлу повертається як помилка лише цього файлу;
+      - якщо воркер падає (BrokenProcessPool) або зависає в C-коді довше за
+        жорсткий ліміт, пул перезапускається, а файли порції повторюються
+        поодинці; файл, що знову валить воркер, позначається помилкою.
+    """
+
+    def __init__(
+        self,
+        extractor_cls: type,
+        init_args: tuple = (),
+        workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        item_timeout: Optional[float] = EXTRACT_ITEM_TIMEOUT
+    ):
+        self.extractor_cls = extractor_cls
+        self.init_args = init_args
+        self.workers = workers or EXTRACT_WORKERS
+        self.chunk_size = chunk_size or EXTRACT_CHUNK_SIZE
+        self.item_timeout = item_timeout
+        self.restarts = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def map(
+        self,
+        metas: Iterable[Dict],
+        resolve: Optional[Callable[[Dict], Optional[Dict]]] = None
+    ) -> Iterator[Tuple[Dict, Optional[Dict], Optional[str]]]:
+        """
+        Обробити описи файлів.
+
+        Args:
+            metas: Дескриптори файлів
+            resolve: Готовий опис файлу без запуску воркера (напр. з кешу) або None
+
+        Yields:
+            (meta, опис, помилка) у порядку завершення порцій
+        """
+        pending: Dict = {}
+        chunk: List[Dict] = []
+        for meta in metas:
+            if resolve is not None:
+                resolved = resolve(meta)
+                if resolved is not None:
+                    yield meta, resolved, None
+                    continue
+            chunk.append(meta)
+            if len(chunk) >= self.chunk_size:
+                self._submit(pending, chunk, 0)
+                chunk = []
+                while len(pending) >= self.workers:
+                    yield from self._collect(pending)
+        if chunk:
+            self._submit(pending, chunk, 0)
+        while pending:
+            yield from self._collect(pending)
+
+    def _submit(self, pending: Dict, chunk: List[Dict], attempt: int) -> None:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        future = self._pool.submit(_run_chunk, self.extractor_cls, self.init_args, chunk, self.item_timeout)
+        pending[future] = (chunk, attempt, time.monotonic() + self._hard_limit(len(chunk)))
+
+    def _hard_limit(self, size: int) -> float:
+        if not self.item_timeout:
+            return float("inf")
+        # run_batch + поодинокий повтор у найгіршому випадку
+        return self.item_timeout * size * 2 + HARD_TIMEOUT_GRACE
+
+    def _collect(self, pending: Dict) -> Iterator[Tuple[Dict, Optional[Dict], Optional[str]]]:
+        deadline = min(entry[2] for entry in pending.values())
+        timeout = max(0.0, deadline - time.monotonic()) if deadline != float("inf") else None
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        if not done:
+            # Жоден воркер не завершився вчасно — зупиняємо зависли процеси
+            self._kill_pool()
+            done, _ = wait(pending)
+
+        broken: List[Tuple[List[Dict], int]] = []
+        for future in done:
+            chunk, attempt, _ = pending.pop(future)
+            try:
+                results = future.result()
+            except BrokenProcessPool:
+                broken.append((chunk, attempt))
+                continue
+            except Exception as e:
+                results = [(None, f"{type(e).__name__}: {e}")] * len(chunk)
+            for meta, (result, error) in zip(chunk, results):
+                yield meta, result, error
+
+        if broken:
+            self._restart_pool(pending)
+            for chunk, attempt in broken:
+                if len(chunk) == 1 and attempt + 1 >= MAX_ISOLATED_ATTEMPTS:
+                    yield chunk[0], None, "worker process crashed or hung"
+                    continue
+                for meta in chunk:
+                    self._submit(pending, [meta], attempt + 1 if len(chunk) == 1 else 0)
+
+    def _restart_pool(self, pending: Dict) -> None:
+        """Перестворити пул; незавершені порції старого пулу подаються наново."""
+        if self._pool is None:
+            return
+        orphaned = [(chunk, attempt) for chunk, attempt, _ in pending.values()]
+        pending.clear()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+        self.restarts += 1
+        for chunk, attempt in orphaned:
+            self._submit(pending, chunk, attempt)
+
+    def _kill_pool(self) -> None:
+        # ProcessPoolExecutor не має публічного terminate (до Python 3.14)
+        for process in list(getattr(self._pool, "_processes", {}).values()):
+            process.terminate()
@@ -1,47 +1,495 @@
 import os
-from typing import List, Dict
-from .file_analyzer import create_file_descriptor
+import stat
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
-def scan_dir(directory: str, recursive: bool = False) -> list:
+from ..config import DELTA_PATHS_LIMIT, SCAN_QUEUE_DEPTH, SCAN_WORKERS
+from .external_sort import BlockWriter, ExternalSorter, read_blocks
+from .file_analyzer import HashTier, create_file_descriptor, get_created_at
+from .fingerprint_cache import get_fingerprint_cache
+from .scan_filter import ScanFilter
+from .snapshot_store import DirectorySnapshotStore
+
+
+def _child_rel(rel_dir: str, name: str) -> str:
+    return f"{rel_dir}/{name}" if rel_dir else name
+
+
+def iter_file_entries(
+    directory: str,
+    recursive: bool = False,
+    scan_filter: Optional[ScanFilter] = None
+) -> Iterator[os.DirEntry]:
+    """
+    Обійти директорію через os.scandir і повертати записи (DirEntry) файлів.
+
+    Використовує явний стек замість os.walk, тому тип запису береться з DirEntry
+    без додаткових викликів isdir/isfile. Символьні посилання на директорії не розкриваються.
+
+    Args:
+        directory (str): Шлях до директорії для сканування
+        recursive (bool): Чи заходити у піддиректорії
+        scan_filter (ScanFilter): Фільтри — відкинуті директорії не відкриваються,
+            файли перевіряються за іменем до stat і за розміром/mtime до хешування
+
+    Yields:
+        os.DirEntry: Записи файлів
+    """
+    stack = [(directory, "", 0)]
+    while stack:
+        current, rel_dir, depth = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        rel_path = _child_rel(rel_dir, entry.name)
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive and (
+                                scan_filter is None or scan_filter.match_dir(entry.name, rel_path, depth + 1)
+                            ):
+                                stack.append((entry.path, rel_path, depth + 1))
+                        elif entry.is_file():
+                            if scan_filter is not None:
+                                if not scan_filter.match_name(entry.name, rel_path):
+                                    continue
+                                if scan_filter.needs_stat:
+                                    stat_result = entry.stat()
+                                    if not scan_filter.match_stat(stat_result.st_size, stat_result.st_mtime):
+                                        continue
+                            yield entry
+                    except OSError as e:
+                        print(f"Помилка читання запису {entry.path}: {e}")
+        except OSError as e:
+            print(f"Помилка читання директорії {current}: {e}")
+
+
+class ScanDelta:
+    """
+    Зміни файлів відносно попереднього знімка директорій.
+
+    Лічильники повні, а списки шляхів обмежені DELTA_PATHS_LIMIT, щоб звіт
+    про перше сканування великого дерева не тримав у пам'яті всі шляхи.
+    """
+
+    def __init__(self):
+        self.counts = {"added": 0, "removed": 0, "modified": 0}
+        self.paths: Dict[str, List[str]] = {"added": [], "removed": [], "modified": []}
+        self.dirs_listed = 0
+        self.dirs_reused = 0
+
+    def record(self, kind: str, path: str) -> None:
+        self.counts[kind] += 1
+        if len(self.paths[kind]) < DELTA_PATHS_LIMIT:
+            self.paths[kind].append(path)
+
+    def summary(self) -> Dict:
+        return {
+            **self.counts,
+            "dirs_listed": self.dirs_listed,
+            "dirs_reused": self.dirs_reused,
+            "paths": self.paths
+        }
+
+
+def _snapshot_record(stat_result: os.stat_result) -> List:
+    """Запис файлу в знімку: [size, mtime_ns, dev, ino, created_at]."""
+    return [stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_dev, stat_result.st_ino,
+            get_created_at(stat_result)]
+
+
+def _snapshot_stat(file_path: str, record: List) -> os.stat_result:
+    """
+    Відновити stat файлу з запису знімка (для кешу відбитків і дескриптора).
+    Записи старого формату без created_at доповнюються повторним stat файлу.
+    """
+    if len(record) < 5:
+        record[:] = _snapshot_record(os.stat(file_path))
+    size, mtime_ns, dev, ino, created_at = record
+    return os.stat_result(
+        (stat.S_IFREG, ino, dev, 1, 0, 0, size, 0, mtime_ns // 1_000_000_000, int(created_at)),
+        {"st_mtime": mtime_ns / 1e9, "st_mtime_ns": mtime_ns,
+         "st_ctime": created_at, "st_birthtime": created_at}
+    )
+
+
+def iter_snapshot_entries(
+    directory: str,
+    recursive: bool,
+    store: DirectorySnapshotStore,
+    delta: ScanDelta,
+    incremental: bool = True,
+    scan_filter: Optional[ScanFilter] = None
+) -> Iterator[Tuple[str, os.stat_result]]:
+    """
+    Обхід із записом знімка директорій та обчисленням змін.
+
+    Кожна директорія отримує один stat. Якщо її mtime збігається зі знімком,
+    список файлів і піддиректорій береться зі знімка без scandir і stat файлів
+    (incremental=True). Інакше директорія читається заново, а файли
+    порівнюються зі знімком: нові — added, змінені розмір/mtime — modified,
+    зниклі (разом із піддеревами видалених директорій) — removed.
+
+    Зміна вмісту файлу без зміни складу директорії не змінює mtime директорії,
+    тому в незмінених директоріях такі файли не виявляються — для них потрібне
+    повне сканування.
+
+    Знімок зберігає повний склад директорій незалежно від фільтрів: фільтри
+    лише відсікають піддерева й файли, які віддаються та потрапляють у delta.
+    Файли, відсічені за іменем, записуються без stat (запис None) і
+    отримують stat, коли їх прийме фільтр наступного сканування.
+
+    Yields:
+        Tuple: (шлях, stat) файлів поточного стану дерева
+    """
+    root = os.path.abspath(directory)
+
+    def name_matches(name: str, rel_dir: str) -> bool:
+        return scan_filter is None or scan_filter.match_name(name, _child_rel(rel_dir, name))
+
+    def stat_matches(size: int, mtime_ns: int) -> bool:
+        return scan_filter is None or scan_filter.match_stat(size, mtime_ns / 1e9)
+
+    def descend(current: str, rel_dir: str, depth: int, subdirs: Iterable[str]) -> None:
+        if not recursive:
+            return
+        for name in subdirs:
+            rel_path = _child_rel(rel_dir, name)
+            if scan_filter is None or scan_filter.match_dir(name, rel_path, depth + 1):
+                stack.append((os.path.join(current, name), rel_path, depth + 1))
+
+    stack = [(root, "", 0)]
+    while stack:
+        current, rel_dir, depth = stack.pop()
+        try:
+            dir_mtime_ns = os.stat(current).st_mtime_ns
+        except OSError as e:
+            print(f"Помилка читання директорії {current}: {e}")
+            continue
+        previous = store.get(root, current)
+
+        if incremental and previous and previous["mtime_ns"] == dir_mtime_ns:
+            # Склад директорії не змінювався — беремо його зі знімка
+            delta.dirs_reused += 1
+            for name, record in previous["files"].items():
+                if not name_matches(name, rel_dir):
+                    continue
+                file_path = os.path.join(current, name)
+                try:
+                    if record is None:
+                        # Раніше файл відсікався фільтром за іменем і stat не має
+                        record = previous["files"][name] = _snapshot_record(os.stat(file_path))
+                    if not stat_matches(record[0], record[1]):
+                        continue
+                    stat_result = _snapshot_stat(file_path, record)
+                except OSError as e:
+                    print(f"Помилка обробки файлу {file_path}: {e}")
+                    continue
+                yield file_path, stat_result
+            # Після відтворення: записи старого формату вже доповнені created_at
+            store.put(root, current, previous)
+            descend(current, rel_dir, depth, previous["subdirs"])
+            continue
+
+        delta.dirs_listed += 1
+        files: Dict[str, Optional[List[int]]] = {}
+        matched = set()
+        subdirs: List[str] = []
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                        elif entry.is_file():
+                            if not name_matches(entry.name, rel_dir):
+                                files[entry.name] = None
+                                continue
+                            stat_result = entry.stat()
+                            files[entry.name] = _snapshot_record(stat_result)
+                            if stat_matches(stat_result.st_size, stat_result.st_mtime_ns):
+                                matched.add(entry.name)
+                                yield entry.path, stat_result
+                    except OSError as e:
+                        print(f"Помилка читання запису {entry.path}: {e}")
+        except OSError as e:
+            print(f"Помилка читання директорії {current}: {e}")
+            continue
+
+        old_files = previous["files"] if previous else {}
+        for name in matched:
+            if name not in old_files:
+                delta.record("added", os.path.join(current, name))
+            elif old_files[name] is not None and old_files[name][:2] != files[name][:2]:
+                # Файл без stat у знімку (раніше відсікався за іменем) порівняти нема з чим
+                delta.record("modified", os.path.join(current, name))
+        for name in old_files.keys() - files.keys():
+            if scan_filter is None or scan_filter.match_name(name, _child_rel(rel_dir, name), count=False):
+                delta.record("removed", os.path.join(current, name))
+        if previous:
+            for name in set(previous["subdirs"]) - set(subdirs):
+                _record_removed_subtree(store, root, os.path.join(current, name), delta)
+
+        store.put(root, current, {
+            "mtime_ns": dir_mtime_ns,
+            "child_count": len(files) + len(subdirs),
+            "subdirs": subdirs,
+            "files": files
+        })
+        descend(current, rel_dir, depth, subdirs)
+
+
+def _record_removed_subtree(store: DirectorySnapshotStore, root: str, path: str, delta: ScanDelta) -> None:
+    """Позначити як видалені всі файли піддерева, що зникло, і видалити його зі знімка."""
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        previous = store.get(root, current)
+        if not previous:
+            continue
+        store.discard(root, current)
+        for name in previous["files"]:
+            delta.record("removed", os.path.join(current, name))
+        stack.extend(os.path.join(current, name) for name in previous["subdirs"])
+
+
+def _collect_done(pending: Dict) -> Iterator[Dict]:
+    """Дочекатися хоча б одного завершеного завдання й віддати готові дескриптори."""
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        file_path = pending.pop(future)
+        try:
+            yield future.result()
+        except Exception as e:
+            print(f"Помилка обробки файлу {file_path}: {e}")
+
+
+def iter_stat_entries(entries: Iterator[os.DirEntry]) -> Iterator[Tuple[str, os.stat_result]]:
+    """Перетворити записи DirEntry на пари (шлях, stat), пропускаючи недоступні файли."""
+    for entry in entries:
+        try:
+            yield entry.path, entry.stat()
+        except OSError as e:
+            print(f"Помилка обробки файлу {entry.path}: {e}")
+
+
+def iter_descriptors(
+    files: Iterable[Tuple[str, os.stat_result]],
+    workers: Optional[int] = None,
+    queue_depth: Optional[int] = None,
+    executor: str = "thread",
+    hash_mode: Union[str, Callable[[os.stat_result], str]] = HashTier.FULL,
+    digests: Sequence[str] = ("sha256",)
+) -> Iterator[Dict]:
+    """
+    Обчислити дескриптори файлів у пулі воркерів.
+
+    Хешування та визначення типу виконуються паралельно; кількість незавершених
+    завдань обмежена queue_depth, тому обхід директорій не випереджає обробку.
+
+    Args:
+        files: Пари (шлях, stat) — stat береться з DirEntry
+        workers: Кількість воркерів (None — SCAN_WORKERS, 1 — без пулу)
+        queue_depth: Макс. кількість завдань у черзі пулу (None — SCAN_QUEUE_DEPTH)
+        executor: "thread" або "process"
+        hash_mode: Рівень хешування (HashTier) або функція stat -> рівень
+        digests: Дайджести, що рахуються за одне читання файлу на рівні "full"
+
+    Yields:
+        Dict: Дескриптори файлів у порядку завершення обробки
+    """
+    workers = workers or SCAN_WORKERS
+    queue_depth = max(queue_depth or SCAN_QUEUE_DEPTH, workers)
+    mode_for = hash_mode if callable(hash_mode) else (lambda _: hash_mode)
+
+    if workers <= 1:
+        for file_path, stat_result in files:
+            try:
+                yield create_file_descriptor(file_path, stat_result, mode_for(stat_result), digests)
+            except Exception as e:
+                print(f"Помилка обробки файлу {file_path}: {e}")
+        return
+
+    pool_cls = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    with pool_cls(max_workers=workers) as pool:
+        pending = {}
+        for file_path, stat_result in files:
+            future = pool.submit(create_file_descriptor, file_path, stat_result, mode_for(stat_result), digests)
+            pending[future] = file_path
+            if len(pending) >= queue_depth:
+                yield from _collect_done(pending)
+
+        while pending:
+            yield from _collect_done(pending)
+
+
+def _size_tiers(records: Iterable[Tuple[int, str, os.stat_result]], tier: Dict[str, str]) -> Iterator[Tuple[str, os.stat_result]]:
+    """
+    Пари (шлях, stat) з потоку, відсортованого за розміром. Перед кожною парою
+    tier["mode"] отримує її рівень: SIZE для унікального розміру, SAMPLE для
+    групи однакового розміру (сусідній запис має той самий розмір).
+    """
+    before, previous = None, None
+    for record in records:
+        if previous is not None:
+            tier["mode"] = HashTier.SAMPLE if previous[0] in (before, record[0]) else HashTier.SIZE
+            before = previous[0]
+            yield previous[1], previous[2]
+        previous = record
+    if previous is not None:
+        tier["mode"] = HashTier.SAMPLE if previous[0] == before else HashTier.SIZE
+        yield previous[1], previous[2]
+
+
+def iter_tiered_descriptors(
+    files: Iterable[Tuple[str, os.stat_result]],
+    **options
+) -> Iterator[Dict]:
+    """
+    Багаторівневе хешування: розмір → sample-хеш → повний хеш.
+
+    1. Файли з унікальним розміром не читаються зовсім (рівень "size").
+    2. Для файлів однакового розміру рахується sample-хеш (початок/середина/кінець).
+    3. Повний SHA-256 рахується лише для груп, у яких збіглися sample-хеші.
+
+    Групування — зовнішнім сортуванням (ExternalSorter), як у DEDUP: пари
+    (шлях, stat) сортуються за розміром, дескриптори рівня "sample" — за
+    (розмір, sample-хеш), тож пам'ять обмежена буфером сортування, а не
+    розміром дерева.
+    """
+    with ExternalSorter(key=itemgetter(0)) as by_size, \
+            ExternalSorter(key=itemgetter(0, 1)) as by_sample:
+        for file_path, stat_result in files:
+            by_size.add((stat_result.st_size, file_path, stat_result))
+
+        # Рівень файлу визначається сусідами у відсортованому потоці; iter_descriptors
+        # викликає hash_mode одразу після отримання пари, тож tier["mode"] актуальний
+        tier: Dict[str, str] = {}
+        for desc in iter_descriptors(_size_tiers(by_size.sorted(), tier),
+                                     hash_mode=lambda _: tier["mode"], **options):
+            if desc["hash_tier"] == HashTier.SAMPLE:
+                by_sample.add((desc["size_bytes"], desc["file_hash"], desc))
+            else:
+                yield desc
+        by_size.close()
+
+        # Дескриптори з унікальною вибіркою готові; решта — кандидати на повний хеш
+        collided = BlockWriter(prefix="tiered-full-")
+        try:
+            previous, emitted = None, False
+            for record in by_sample.sorted():
+                if previous is not None and record[:2] == previous[:2]:
+                    if not emitted:
+                        collided.add(previous[2]["original_path"])
+                        emitted = True
+                    collided.add(record[2]["original_path"])
+                else:
+                    if previous is not None and not emitted:
+                        yield previous[2]
+                    emitted = False
+                previous = record
+            if previous is not None and not emitted:
+                yield previous[2]
+            by_sample.close()
+
+            def restat(paths: Iterable[str]) -> Iterator[Tuple[str, os.stat_result]]:
+                for file_path in paths:
+                    try:
+                        yield file_path, os.stat(file_path)
+                    except OSError as e:
+                        print(f"Помилка обробки файлу {file_path}: {e}")
+
+            yield from iter_descriptors(restat(read_blocks(collided.close())), hash_mode=HashTier.FULL, **options)
+        finally:
+            collided.close()
+            try:
+                os.remove(collided.path)
+            except OSError:
+                pass
+
+
+def iter_scan_dir(
+    directory: str,
+    recursive: bool = False,
+    workers: Optional[int] = None,
+    queue_depth: Optional[int] = None,
+    executor: str = "thread",
+    hash_mode: str = "full",
+    digests: Sequence[str] = ("sha256",),
+    snapshot: Optional[DirectorySnapshotStore] = None,
+    incremental: bool = False,
+    delta: Optional[ScanDelta] = None,
+    scan_filter: Optional[ScanFilter] = None
+) -> Iterator[Dict]:
+    """Генераторний варіант scan_dir: дескриптори віддаються по мірі готовності."""
+    if snapshot is not None:
+        root = os.path.abspath(directory)
+        files = iter_snapshot_entries(directory, recursive, snapshot,
+                                      delta if delta is not None else ScanDelta(), incremental, scan_filter)
+    else:
+        files = iter_stat_entries(iter_file_entries(directory, recursive, scan_filter))
+
+    options = {"workers": workers, "queue_depth": queue_depth, "executor": executor, "digests": digests}
+    try:
+        if hash_mode == "tiered":
+            yield from iter_tiered_descriptors(files, **options)
+        else:
+            yield from iter_descriptors(files, hash_mode=HashTier.FULL, **options)
+    finally:
+        # Зберігаємо нові відбитки, обчислені під час сканування
+        cache = get_fingerprint_cache()
+        if cache:
+            cache.flush()
+        if snapshot is not None:
+            snapshot.finish(root)
+
+
+def scan_dir(
+    directory: str,
+    recursive: bool = False,
+    workers: Optional[int] = None,
+    queue_depth: Optional[int] = None,
+    executor: str = "thread",
+    hash_mode: str = "full",
+    digests: Sequence[str] = ("sha256",),
+    stream: bool = False,
+    snapshot: Optional[DirectorySnapshotStore] = None,
+    incremental: bool = False,
+    delta: Optional[ScanDelta] = None,
+    scan_filter: Optional[ScanFilter] = None
+) -> Union[List[Dict], Iterator[Dict]]:
     """
     Сканувати директорію та повернути список файлових дескрипторів.
-    
+
     Args:
         directory (str): Шлях до директорії для сканування
         recursive (bool): Чи сканувати підкаталоги рекурсивно
-        
+        workers (int): Кількість воркерів пулу (None — значення з конфігурації)
+        queue_depth (int): Макс. кількість файлів у черзі пулу
+        executor (str): Тип пулу — "thread" або "process"
+        hash_mode (str): "full" — SHA-256 для кожного файлу, "tiered" — розмір → вибірка → повний хеш
+        digests (Sequence[str]): Дайджести, що рахуються за одне читання (напр. ("sha256", "md5"))
+        stream (bool): Повернути генератор замість списку (пам'ять не залежить від кількості файлів)
+        snapshot (DirectorySnapshotStore): Сховище знімка директорій — якщо задано,
+            після сканування зберігається знімок, а зміни записуються в delta
+        incremental (bool): Не читати директорії, mtime яких збігається зі знімком
+        delta (ScanDelta): Куди записати додані/видалені/змінені файли
+        scan_filter (ScanFilter): Glob-правила, розмір, глибина, приховані файли, вікно mtime;
+            лічильники відсіяних записів накопичуються в самому фільтрі
+
     Returns:
-        list: Список файлових дескрипторів
+        list | Iterator: Файлові дескриптори (у порядку завершення обробки)
     """
     # Перевірка наявності директорії
     if not os.path.exists(directory):
         raise FileNotFoundError(f"Директорію не знайдено: {directory}")
-    
+
     if not os.path.isdir(directory):
         raise NotADirectoryError(f"Не є директорією: {directory}")
-    
-    file_descriptors = []
-    
-    # Визначення файлів для сканування в залежності від параметра recursive
-    if recursive:
-        # Обхід директорії та всіх піддиректорій
-        for root, _, files in os.walk(directory):
-            for file_name in files:
-                file_path = os.path.join(root, file_name)
-                try:
-                    file_descriptor = create_file_descriptor(file_path)
-                    file_descriptors.append(file_descriptor)
-                except Exception as e:
-                    print(f"Помилка обробки файлу {file_path}: {e}")
-    else:
-        # Сканування тільки файлів верхнього рівня
-        for item in os.listdir(directory):
-            item_path = os.path.join(directory, item)
-            if os.path.isfile(item_path):
-                try:
-                    file_descriptor = create_file_descriptor(item_path)
-                    file_descriptors.append(file_descriptor)
-                except Exception as e:
-                    print(f"Помилка обробки файлу {item_path}: {e}")
-    
-    return file_descriptors
+
+    if incremental and snapshot is None:
+        raise ValueError("Інкрементальне сканування потребує знімка директорій (snapshot)")
+
+    descriptors = iter_scan_dir(directory, recursive, workers, queue_depth, executor,
+                                hash_mode, digests, snapshot, incremental, delta, scan_filter)
+    return descriptors if stream else list(descriptors)
@@ -0,0 +1,135 @@
+import heapq
+import os
+import pickle
+import tempfile
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+from ..config import SORT_BUFFER_RECORDS, SORT_TMP_DIR
+
+# Записів в одному pickle-блоці файлу серії (менше викликів pickle на запис)
+_BLOCK_RECORDS = 4096
+# Макс. серій, що зливаються одночасно (обмеження відкритих файлів)
+MAX_MERGE_FANIN = 128
+
+
+class BlockWriter:
+    """
+    Запис потоку записів у тимчасовий файл pickle-блоками по _BLOCK_RECORDS.
+    Файл читається назад read_blocks(); видаляє його власник шляху.
+    """
+
+    def __init__(self, tmp_dir: Optional[str] = SORT_TMP_DIR, prefix: str = "sort-run-"):
+        fd, self.path = tempfile.mkstemp(prefix=prefix, suffix=".bin", dir=tmp_dir)
+        self._file = os.fdopen(fd, "wb")
+        self._block: List[Any] = []
+        self.count = 0
+
+    def add(self, record: Any) -> None:
+        self._block.append(record)
+        self.count += 1
+        if len(self._block) >= _BLOCK_RECORDS:
+            pickle.dump(self._block, self._file, pickle.HIGHEST_PROTOCOL)
+            self._block = []
+
+    def close(self) -> str:
+        """Дописати останній блок і закрити файл; повертає шлях."""
+        if self._file.closed:
+            return self.path
+        if self._block:
+            pickle.dump(self._block, self._file, pickle.HIGHEST_PROTOCOL)
+            self._block = []
+        self._file.close()
+        return self.path
+
+
+def read_blocks(path: str) -> Iterator[Any]:
+    """Записи файлу, записаного BlockWriter, у порядку запису."""
+    with open(path, "rb") as f:
+        while True:
+            try:
+                block = pickle.load(f)
+            except EOFError:
+                return
+            yield from block
+
+
+class ExternalSorter:
+    """
+    Сортування потоку записів, що може не вміщатися в пам'ять.
+
+    Записи накопичуються в буфері до buffer_records; повний буфер сортується
+    і скидається на диск окремою серією (pickle-блоками у тимчасовому файлі).
+    sorted() зливає серії heapq.merge — у пам'яті одночасно лише буфер і по
+    одному блоку з кожної серії. Якщо серій не було, сортування відбувається
+    повністю в пам'яті. Тимчасові файли видаляються в close().
+    """
+
+    def __init__(self, key: Optional[Callable[[Any], Any]] = None,
+                 buffer_records: int = SORT_BUFFER_RECORDS, tmp_dir: Optional[str] = SORT_TMP_DIR):
+        self.key = key
+        self.buffer_records = max(1, buffer_records)
+        self.tmp_dir = tmp_dir
+        self.count = 0
+        self._buffer: List[Any] = []
+        self._runs: List[str] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def spilled_runs(self) -> int:
+        return len(self._runs)
+
+    def add(self, record: Any) -> None:
+        self._buffer.append(record)
+        self.count += 1
+        if len(self._buffer) >= self.buffer_records:
+            self._spill()
+
+    def extend(self, records: Iterable[Any]) -> None:
+        for record in records:
+            self.add(record)
+
+    def _spill(self) -> None:
+        self._buffer.sort(key=self.key)
+        self._runs.append(self._write_run(self._buffer))
+        self._buffer = []
+
+    def _write_run(self, records: Iterable[Any]) -> str:
+        writer = BlockWriter(self.tmp_dir)
+        for record in records:
+            writer.add(record)
+        return writer.close()
+
+    def _reduce_runs(self) -> None:
+        """Злити серії порціями, доки їх не стане не більше MAX_MERGE_FANIN."""
+        while len(self._runs) > MAX_MERGE_FANIN:
+            group, self._runs = self._runs[:MAX_MERGE_FANIN], self._runs[MAX_MERGE_FANIN:]
+            merged = heapq.merge(*(read_blocks(path) for path in group), key=self.key)
+            self._runs.append(self._write_run(merged))
+            for path in group:
+                os.remove(path)
+
+    def sorted(self) -> Iterator[Any]:
+        """Усі додані записи у відсортованому порядку (один раз)."""
+        self._buffer.sort(key=self.key)
+        if not self._runs:
+            buffer, self._buffer = self._buffer, []
+            yield from buffer
+            return
+        self._reduce_runs()
+        runs = [read_blocks(path) for path in self._runs]
+        buffer, self._buffer = self._buffer, []
+        yield from heapq.merge(*runs, buffer, key=self.key)
+
+    def close(self) -> None:
+        for path in self._runs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._runs = []
+        self._buffer = []
@@ -1,8 +1,13 @@
 import os
 import hashlib
-import platform
 import mimetypes
-from typing import Dict, Any
+import threading
+from collections import defaultdict
+from enum import Enum
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+from ..config import HASH_BUFFER_SIZE, HASH_SAMPLE_SIZE, MAGIC_HEADER_SIZE
+from .fingerprint_cache import get_fingerprint_cache
 
 # Адаптуємо імпорт magic для різних ОС
 try:
@@ -19,40 +24,210 @@ except ImportError:
         # Ініціалізуємо mimetypes
         mimetypes.init()
 
+_MISSING = object()
+
+def compute_digests_with_header(file_path: str, algorithms: Sequence[str] = ("sha256",),
+                                buffer_size: int = HASH_BUFFER_SIZE,
+                                header_size: int = MAGIC_HEADER_SIZE) -> Tuple[Dict[str, str], bytes]:
+    """
+    Обчислити кілька дайджестів файлу за один прохід читання.
+
+    Кожен прочитаний блок передається всім хешерам, тож MD5 + SHA-1 + SHA-256
+    коштують одне читання файлу. Файл читається через readinto у повторно
+    використовуваний буфер незалежно від розміру: mmap для послідовного
+    хешу нічого не заощаджує, а файл, обрізаний під час читання, вбив би
+    воркер сигналом SIGBUS замість звичайної помилки читання.
+
+    Args:
+        file_path: Шлях до файлу
+        algorithms: Назви алгоритмів hashlib (напр. "md5", "sha1", "sha256")
+        buffer_size: Розмір блоку читання в байтах
+        header_size: Скільки перших байтів повернути для визначення типу
+
+    Returns:
+        Tuple: ({алгоритм: hex-дайджест}, перші header_size байтів файлу)
+    """
+    hashers = [(name, hashlib.new(name)) for name in dict.fromkeys(algorithms)]
+    header = b""
+
+    buffer = bytearray(max(buffer_size, header_size))
+    with open(file_path, "rb", buffering=0) as f, memoryview(buffer) as view:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            with view[:read] as block:
+                if len(header) < header_size:
+                    header += bytes(block[:header_size - len(header)])
+                for _, hasher in hashers:
+                    hasher.update(block)
+
+    return {name: hasher.hexdigest() for name, hasher in hashers}, header
+
+def compute_digests(file_path: str, algorithms: Sequence[str] = ("sha256",),
+                    buffer_size: int = HASH_BUFFER_SIZE) -> Dict[str, str]:
+    """Обчислити кілька дайджестів файлу за один прохід читання (див. compute_digests_with_header)."""
+    return compute_digests_with_header(file_path, algorithms, buffer_size, header_size=0)[0]
+
 def get_file_hash(file_path: str) -> str:
     """Обчислити хеш SHA-256 файлу."""
-    sha256_hash = hashlib.sha256()
-    
+    return compute_digests(file_path, ("sha256",))["sha256"]
+
+class HashTier(str, Enum):
+    SIZE = "size"        # розмір унікальний — хеш вмісту не обчислюється
+    SAMPLE = "sample"    # хеш вибірки: початок, середина та кінець файлу
+    FULL = "full"        # повний SHA-256
+
+
+def _sample_hash_with_header(file_path: str, size: int, sample_size: int) -> Tuple[str, bytes]:
+    """Sample-хеш і перший фрагмент файлу (він же заголовок для визначення типу)."""
+    sample_hash = hashlib.sha256()
+    offsets = (0, max(0, (size - sample_size) // 2), max(0, size - sample_size))
+    header = b""
+
     with open(file_path, "rb") as f:
-        # Читати та оновлювати хеш блоками по 4К
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
-            
-    return sha256_hash.hexdigest()
-
-def get_file_type(file_path: str) -> str:
-    """Визначити тип файлу використовуючи magic."""
-    system = platform.system()
-    
+        for offset in offsets:
+            f.seek(offset)
+            chunk = f.read(sample_size)
+            if not header:
+                header = chunk
+            sample_hash.update(chunk)
+
+    return sample_hash.hexdigest(), header
+
+def get_sample_hash(file_path: str, size: int, sample_size: int = HASH_SAMPLE_SIZE) -> str:
+    """
+    Обчислити SHA-256 від трьох фрагментів файлу (початок, середина, кінець).
+
+    Дешевий фільтр для файлів однакового розміру: різні sample-хеші гарантують
+    різний вміст, однакові — лише кандидати на повне порівняння.
+    """
+    return _sample_hash_with_header(file_path, size, sample_size)[0]
+
+def read_header(file_path: str, header_size: int = MAGIC_HEADER_SIZE) -> bytes:
+    """Прочитати перші header_size байтів файлу."""
+    with open(file_path, "rb") as f:
+        return f.read(header_size)
+
+class SharedFileBuffers:
+    """
+    Дані одного файлу, спільні для всіх методів композитного аналізу.
+
+    Заголовок, повний вміст і дайджести читаються ліниво й не більше одного
+    разу: перший запит дайджесту обчислює всі дайджести, оголошені методами,
+    за один прохід (і заодно зберігає заголовок).
+    """
+
+    def __init__(self, file_path: str, digests: Sequence[str] = (), known: Optional[Dict[str, str]] = None):
+        self.file_path = file_path
+        self._algorithms = tuple(digests)
+        self._digests: Dict[str, str] = dict(known or {})
+        self._header: Optional[bytes] = None
+        self._content: Optional[bytes] = None
+
+    @property
+    def header(self) -> bytes:
+        if self._header is None:
+            self._header = (
+                self._content[:MAGIC_HEADER_SIZE] if self._content is not None
+                else read_header(self.file_path)
+            )
+        return self._header
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            with open(self.file_path, "rb") as f:
+                self._content = f.read()
+        return self._content
+
+    def digest(self, algorithm: str) -> str:
+        if algorithm not in self._digests:
+            missing = [a for a in dict.fromkeys((*self._algorithms, algorithm)) if a not in self._digests]
+            if self._content is not None:
+                self._digests.update({a: hashlib.new(a, self._content).hexdigest() for a in missing})
+            else:
+                digests, header = compute_digests_with_header(self.file_path, missing)
+                self._digests.update(digests)
+                if self._header is None:
+                    self._header = header
+        return self._digests[algorithm]
+
+# Сигнатури форматів, які однозначно визначаються за першими байтами.
+# Для них libmagic не викликається. Формати-контейнери (ZIP → DOCX/XLSX/JAR,
+# RIFF → WAV/AVI, ELF з деталями архітектури тощо) свідомо не включені.
+_SIGNATURES = (
+    (((0, b"\x89PNG\r\n\x1a\n"),), "PNG image data"),
+    (((0, b"\xff\xd8\xff"),), "JPEG image data"),
+    (((0, b"GIF87a"),), "GIF image data, version 87a"),
+    (((0, b"GIF89a"),), "GIF image data, version 89a"),
+    (((0, b"%PDF-"),), "PDF document"),
+    (((0, b"\x1f\x8b"),), "gzip compressed data"),
+    (((0, b"BZh"),), "bzip2 compressed data"),
+    (((0, b"\xfd7zXZ\x00"),), "XZ compressed data"),
+    (((0, b"7z\xbc\xaf\x27\x1c"),), "7-zip archive data"),
+    (((0, b"Rar!\x1a\x07"),), "RAR archive data"),
+    (((0, b"fLaC"),), "FLAC audio bitstream data"),
+    (((0, b"OggS"),), "Ogg data"),
+    (((0, b"SQLite format 3\x00"),), "SQLite 3.x database"),
+    (((0, b"RIFF"), (8, b"WEBP")), "RIFF (little-endian) data, Web/P image"),
+)
+
+# Таблиця диспетчеризації за першим байтом: перевіряються лише кандидати з тим самим байтом
+_SIGNATURES_BY_FIRST_BYTE: Dict[int, List] = defaultdict(list)
+for _parts, _description in _SIGNATURES:
+    _SIGNATURES_BY_FIRST_BYTE[_parts[0][1][0]].append((_parts, _description))
+
+def match_signature(header: bytes) -> Optional[str]:
+    """Визначити тип за таблицею сигнатур або повернути None, якщо збігу немає."""
+    if not header:
+        return None
+    for parts, description in _SIGNATURES_BY_FIRST_BYTE.get(header[0], ()):
+        if all(header[offset:offset + len(magic_bytes)] == magic_bytes for offset, magic_bytes in parts):
+            return description
+    return None
+
+_magic_local = threading.local()
+
+def _get_magic_handle():
+    """
+    Повернути дескриптор libmagic поточного потоку.
+
+    Дескриптор створюється один раз на потік (libmagic не потокобезпечний для
+    спільного handle). None — якщо бібліотека не надає класу Magic
+    (тоді використовується функція модуля).
+    """
+    handle = getattr(_magic_local, "handle", _MISSING)
+    if handle is _MISSING:
+        try:
+            handle = magic.Magic()
+        except (AttributeError, TypeError):
+            # python-magic-bin / альтернативний API без класу Magic
+            handle = None
+        _magic_local.handle = handle
+    return handle
+
+def get_file_type(file_path: str, header: Optional[bytes] = None) -> str:
+    """
+    Визначити тип файлу за заголовком: спочатку таблиця сигнатур, потім magic.
+
+    Args:
+        file_path: Шлях до файлу (для читання заголовка та повідомлень про помилки)
+        header: Перші байти файлу, вже прочитані хешером (None — прочитати)
+    """
     try:
+        if header is None:
+            header = read_header(file_path)
+
+        signature_type = match_signature(header)
+        if signature_type:
+            return signature_type
+
         if has_magic:
-            # Використовуємо різні версії magic в залежності від ОС
-            if system == "Windows":
-                # На Windows часто використовується інша сигнатура
-                try:
-                    m = magic.Magic()
-                    return m.from_file(file_path)
-                except (AttributeError, TypeError):
-                    # Якщо не працює, спробуємо python-magic-bin підхід
-                    return magic.from_file(file_path)
-            else:
-                # Linux/Mac підхід
-                try:
-                    m = magic.Magic()
-                    return m.from_file(file_path)
-                except (AttributeError, TypeError):
-                    # Альтернативний API
-                    return magic.from_file(file_path)
+            handle = _get_magic_handle()
+            if handle is not None:
+                return handle.from_buffer(header)
+            return magic.from_buffer(header)
         else:
             # Якщо magic недоступний, повертаємо UNKNOWN
             return "UNKNOWN"
@@ -73,16 +248,98 @@ def get_file_size(file_path: str) -> int:
     """Отримати розмір файлу в байтах."""
     return os.path.getsize(file_path)
 
-def create_file_descriptor(file_path: str) -> Dict[str, Any]:
-    """Створити дескриптор файлу з метаданими."""
+def get_file_fingerprint(file_path: str, stat_result: Optional[os.stat_result] = None,
+                         hash_mode: str = HashTier.FULL,
+                         digests: Sequence[str] = ("sha256",)) -> Dict[str, Any]:
+    """
+    Отримати хеш і тип файлу, використовуючи кеш відбитків.
+
+    Якщо файл не змінювався з попереднього обчислення (той самий device, inode,
+    розмір і mtime), значення беруться з кешу без читання файлу.
+
+    Args:
+        file_path: Шлях до файлу
+        stat_result: Готовий результат stat (None — виконати os.stat)
+        hash_mode: Рівень хешування — "full", "sample" або "size" (без хешу)
+        digests: Дайджести, потрібні на рівні "full" (рахуються за одне читання)
+
+    Returns:
+        Dict: {"file_hash": ..., "hash_tier": ..., "digests": {...}, "file_type": ...}
+    """
+    if stat_result is None:
+        stat_result = os.stat(file_path)
+
+    cache = get_fingerprint_cache()
+    cached = cache.get(stat_result) if cache else None
+    known = dict(cached["digests"]) if cached else {}
+    file_type = cached["file_type"] if cached else None
+
+    # Для малих файлів вибірка покриває весь вміст — одразу рахуємо повний хеш
+    if hash_mode == HashTier.SAMPLE and stat_result.st_size <= 3 * HASH_SAMPLE_SIZE:
+        hash_mode = HashTier.FULL
+
+    # Заголовок для визначення типу береться з першого блоку, прочитаного хешером
+    computed = {}
+    header = None
+    if hash_mode == HashTier.FULL:
+        missing = [name for name in ("sha256", *digests) if name not in known]
+        if missing:
+            computed, header = compute_digests_with_header(file_path, missing)
+    elif hash_mode == HashTier.SAMPLE and "sha256" not in known and "sample" not in known:
+        computed["sample"], header = _sample_hash_with_header(file_path, stat_result.st_size, HASH_SAMPLE_SIZE)
+    known.update(computed)
+    if file_type is None:
+        file_type = get_file_type(file_path, header)
+
+    if cache and (computed or not cached or cached["file_type"] is None):
+        cache.put(stat_result, computed, file_type)
+
+    # Повний хеш з кешу кращий за вибірку, навіть якщо запитано нижчий рівень
+    if hash_mode != HashTier.SIZE and "sha256" in known:
+        file_hash, hash_tier = known["sha256"], HashTier.FULL
+    elif hash_mode == HashTier.SAMPLE:
+        file_hash, hash_tier = known["sample"], HashTier.SAMPLE
+    else:
+        file_hash, hash_tier = None, HashTier.SIZE
+
+    return {
+        "file_hash": file_hash,
+        "hash_tier": hash_tier.value,
+        "digests": {name: known[name] for name in digests if name in known},
+        "file_type": file_type
+    }
+
+def get_created_at(stat_result: os.stat_result) -> float:
+    """Час створення файлу: st_birthtime є не на всіх платформах; на Linux st_ctime — час зміни метаданих."""
+    return getattr(stat_result, "st_birthtime", stat_result.st_ctime)
+
+def create_file_descriptor(file_path: str, stat_result: Optional[os.stat_result] = None,
+                           hash_mode: str = HashTier.FULL,
+                           digests: Sequence[str] = ("sha256",)) -> Dict[str, Any]:
+    """
+    Створити дескриптор файлу з метаданими.
+
+    Args:
+        file_path: Шлях до файлу
+        stat_result: Готовий результат stat (напр. з os.DirEntry), щоб не робити
+                     окремий системний виклик для розміру
+        hash_mode: Рівень хешування (див. HashTier)
+        digests: Дайджести, які потрібні методам аналізу (напр. ("sha256", "md5"))
+    """
     abs_path = os.path.abspath(file_path)
-    file_hash = get_file_hash(abs_path)
+    if stat_result is None:
+        stat_result = os.stat(abs_path)
+    fingerprint = get_file_fingerprint(abs_path, stat_result, hash_mode, digests)
     
     return {
-        "file_hash": file_hash,
+        "file_hash": fingerprint["file_hash"],
+        "hash_tier": fingerprint["hash_tier"],
+        "digests": fingerprint["digests"],
         "filename": os.path.basename(abs_path),
         "original_path": abs_path,
-        "file_type": get_file_type(abs_path),
+        "file_type": fingerprint["file_type"],
         "mime_type": get_mime_type(abs_path),
-        "size_bytes": get_file_size(abs_path)
-    }
\ No newline at end of file
+        "size_bytes": stat_result.st_size,
+        "mtime": stat_result.st_mtime,
+        "created_at": get_created_at(stat_result)
+    }
@@ -0,0 +1,161 @@
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ..config import (
+    FINGERPRINT_CACHE_ENABLED,
+    FINGERPRINT_CACHE_MAX_AGE_DAYS,
+    FINGERPRINT_CACHE_MAX_ENTRIES,
+    FINGERPRINT_DB_PATH,
+)
+from .sqlite_cache import BatchedSQLiteCache, ProcessLocalCache
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    dev         INTEGER NOT NULL,
+    ino         INTEGER NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    digests     TEXT    NOT NULL,
+    file_type   TEXT,
+    last_access REAL    NOT NULL,
+    PRIMARY KEY (dev, ino)
+);
+CREATE INDEX IF NOT EXISTS ix_fingerprints_last_access ON fingerprints (last_access);
+"""
+
+Key = Tuple[int, int, int, int]
+
+
+def fingerprint_key(stat_result: os.stat_result) -> Optional[Key]:
+    """
+    Ключ відбитка (device, inode, size, mtime_ns).
+
+    Повертає None, якщо ФС не надає inode (напр. stat з DirEntry на Windows) —
+    такі файли не кешуються.
+    """
+    if not stat_result.st_ino:
+        return None
+    return (stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+
+
+class FingerprintCache(BatchedSQLiteCache):
+    """
+    Дисковий кеш хешів і типу файлів (SQLite поруч з file_structure.db).
+
+    Запис дійсний, поки збігаються device, inode, розмір і mtime_ns — будь-яка
+    зміна файлу робить його промахом. Нові записи та відмітки доступу
+    накопичуються в пам'яті й скидаються пакетами; витіснення — за віком
+    (max_age_days) та LRU (max_entries).
+    """
+
+    flush_threshold = 512
+    evict_every_flushes = 64
+
+    def __init__(self, db_path: str, max_entries: int, max_age_days: float):
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 24 * 3600
+        # _pending: Key -> запис; _touched: (dev, ino) -> час доступу
+        super().__init__(db_path, _SCHEMA)
+
+    def get(self, stat_result: os.stat_result) -> Optional[Dict[str, Any]]:
+        """Повернути {"digests": {...}, "file_type": ...} або None при промаху."""
+        key = fingerprint_key(stat_result)
+        if key is None:
+            return None
+
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is not None:
+                return entry
+
+            row = self._conn.execute(
+                "SELECT digests, file_type FROM fingerprints "
+                "WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+                key
+            ).fetchone()
+            if row is None:
+                return None
+
+            self._touched[key[:2]] = time.time()
+            self._maybe_flush()
+            return {"digests": json.loads(row[0]), "file_type": row[1]}
+
+    def put(
+        self,
+        stat_result: os.stat_result,
+        digests: Optional[Dict[str, str]] = None,
+        file_type: Optional[str] = None
+    ) -> None:
+        """Зберегти (або доповнити) відбиток файлу."""
+        key = fingerprint_key(stat_result)
+        if key is None:
+            return
+
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                row = self._conn.execute(
+                    "SELECT digests, file_type FROM fingerprints "
+                    "WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+                    key
+                ).fetchone()
+                entry = {"digests": json.loads(row[0]), "file_type": row[1]} if row else {"digests": {}, "file_type": None}
+
+            # Доповнюємо наявний запис, щоб не втратити раніше обчислені дайджести
+            entry = {
+                "digests": {**entry["digests"], **(digests or {})},
+                "file_type": file_type if file_type is not None else entry["file_type"]
+            }
+            self._pending[key] = entry
+            self._maybe_flush()
+
+    def _evict_locked(self) -> int:
+        removed = self._conn.execute(
+            "DELETE FROM fingerprints WHERE last_access < ?",
+            (time.time() - self.max_age_seconds,)
+        ).rowcount
+
+        total = self._conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+        excess = total - self.max_entries
+        if excess > 0:
+            removed += self._conn.execute(
+                "DELETE FROM fingerprints WHERE rowid IN "
+                "(SELECT rowid FROM fingerprints ORDER BY last_access LIMIT ?)",
+                (excess,)
+            ).rowcount
+        return removed
+
+    def _write_locked(self, now: float) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO fingerprints "
+            "(dev, ino, size, mtime_ns, digests, file_type, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (*key, json.dumps(entry["digests"]), entry["file_type"], now)
+                for key, entry in self._pending.items()
+            ]
+        )
+        self._conn.executemany(
+            "UPDATE fingerprints SET last_access = ? WHERE dev = ? AND ino = ?",
+            [(ts, dev, ino) for (dev, ino), ts in self._touched.items()]
+        )
+
+
+_cache = ProcessLocalCache(
+    lambda: FingerprintCache(FINGERPRINT_DB_PATH, FINGERPRINT_CACHE_MAX_ENTRIES, FINGERPRINT_CACHE_MAX_AGE_DAYS),
+    f"Кеш відбитків ({FINGERPRINT_DB_PATH})"
+)
+
+
+def get_fingerprint_cache() -> Optional[FingerprintCache]:
+    """
+    Кеш відбитків поточного процесу (None, якщо кеш вимкнено).
+
+    У дочірніх процесах пулу створюється окремий екземпляр; відкладені записи
+    скидаються при завершенні процесу.
+    """
+    if not FINGERPRINT_CACHE_ENABLED:
+        return None
+    return _cache.get()
@@ -0,0 +1,360 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import platform
+import select
+import struct
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+from ..config import WATCH_COALESCE_SECONDS, WATCH_MAX_DELAY_SECONDS
+from .directory_scanner import ScanDelta, scan_dir
+from .file_analyzer import create_file_descriptor
+from .fingerprint_cache import get_fingerprint_cache
+from .snapshot_store import get_snapshot_store
+
+# Константи з <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_ATTRIB | IN_CREATE | IN_DELETE |
+    IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+
+_EVENT_HEADER = struct.Struct("iIII")   # wd, mask, cookie, len
+
+
+class _Inotify:
+    """Мінімальна обгортка над inotify через ctypes (лише стандартна бібліотека)."""
+
+    def __init__(self):
+        if platform.system() != "Linux":
+            raise RuntimeError("Спостереження через inotify доступне лише в Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: str, mask: int = WATCH_MASK) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self) -> Iterator[tuple]:
+        """Прочитати всі доступні події: (wd, mask, cookie, name)."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            yield wd, mask, cookie, name
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class LiveIndex:
+    """Потокобезпечний каталог дескрипторів файлів: шлях → дескриптор."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: Dict[str, Dict] = {}
+
+    def replace(self, descriptors: Iterator[Dict]) -> None:
+        items = {desc["original_path"]: desc for desc in descriptors}
+        with self._lock:
+            self._items = items
+
+    def upsert(self, descriptor: Dict) -> None:
+        with self._lock:
+            self._items[descriptor["original_path"]] = descriptor
+
+    def remove(self, path: str) -> None:
+        with self._lock:
+            self._items.pop(path, None)
+
+    def remove_prefix(self, directory: str) -> None:
+        prefix = os.path.join(directory, "")
+        with self._lock:
+            for path in [p for p in self._items if p.startswith(prefix)]:
+                del self._items[path]
+
+    def descriptors(self) -> List[Dict]:
+        """Знімок каталогу (копії дескрипторів) для аналізу."""
+        with self._lock:
+            return [dict(desc) for desc in self._items.values()]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class InotifyWatcher(threading.Thread):
+    """
+    Фоновий спостерігач, що підтримує LiveIndex директорії в актуальному стані.
+
+    Події накопичуються й обробляються пакетом, коли настає пауза
+    WATCH_COALESCE_SECONDS (або найстаріша подія чекає довше за
+    WATCH_MAX_DELAY_SECONDS) — так серія записів одного файлу дає один
+    перерахунок. При переповненні черги ядра (IN_Q_OVERFLOW) каталог
+    перебудовується повним скануванням: втрачені події могли змінити вміст
+    файлів без зміни mtime їхніх директорій, тож знімок директорій тут
+    не допомагає.
+    """
+
+    def __init__(self, directory: str, recursive: bool = True, scan_options: Optional[Dict] = None):
+        super().__init__(daemon=True, name=f"inotify:{directory}")
+        self.directory = os.path.abspath(directory)
+        self.recursive = recursive
+        self.scan_options = scan_options or {}
+        self.index = LiveIndex()
+
+        self.ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._inotify = _Inotify()
+        self._wd_to_path: Dict[int, str] = {}
+        self._path_to_wd: Dict[str, int] = {}
+
+        # Відкладені зміни: шлях → подія ("file", "dir", "removed")
+        self._pending: Dict[str, str] = {}
+        self._oldest_pending: Optional[float] = None
+        self._last_event: Optional[float] = None
+
+        self.events_total = 0
+        self.batches_total = 0
+        self.overflows = 0
+        self.watch_errors = 0
+        self.error: Optional[str] = None
+
+    # ---------- Стан ----------
+    @property
+    def lag_seconds(self) -> float:
+        """Скільки часу найстаріша необроблена подія чекає на застосування."""
+        oldest = self._oldest_pending
+        return round(time.monotonic() - oldest, 3) if oldest is not None else 0.0
+
+    def status(self) -> Dict:
+        return {
+            "directory": self.directory,
+            "recursive": self.recursive,
+            "ready": self.ready.is_set(),
+            "running": self.is_alive(),
+            "files": len(self.index),
+            "watches": len(self._wd_to_path),
+            "pending": len(self._pending),
+            "lag_seconds": self.lag_seconds,
+            "events_total": self.events_total,
+            "batches_total": self.batches_total,
+            "overflows": self.overflows,
+            "watch_errors": self.watch_errors,
+            "error": self.error
+        }
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    # ---------- Цикл ----------
+    def run(self) -> None:
+        try:
+            self._watch_tree(self.directory)
+            self._rescan()
+            self.ready.set()
+
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([self._inotify.fd], [], [], WATCH_COALESCE_SECONDS / 2)
+                if readable:
+                    self._collect_events()
+                if self._pending and self._batch_due():
+                    self._apply_pending()
+        except Exception as e:
+            self.error = str(e)
+            print(f"Спостерігач {self.directory} зупинено через помилку: {e}")
+        finally:
+            self._inotify.close()
+
+    def _batch_due(self) -> bool:
+        now = time.monotonic()
+        return (
+            now - self._last_event >= WATCH_COALESCE_SECONDS or
+            now - self._oldest_pending >= WATCH_MAX_DELAY_SECONDS
+        )
+
+    def _collect_events(self) -> None:
+        now = time.monotonic()
+        for wd, mask, _, name in self._inotify.read_events():
+            self.events_total += 1
+
+            if mask & IN_Q_OVERFLOW:
+                self.overflows += 1
+                self._pending.clear()
+                self._oldest_pending = None
+                if self.recursive:
+                    self._watch_tree(self.directory)
+                self._rescan()
+                continue
+
+            parent = self._wd_to_path.get(wd)
+            if mask & IN_IGNORED:
+                if parent is not None:
+                    self._forget_watch(parent)
+                continue
+            if parent is None:
+                continue
+
+            path = os.path.join(parent, name) if name else parent
+            if mask & (IN_DELETE | IN_MOVED_FROM | IN_DELETE_SELF | IN_MOVE_SELF):
+                self._pending[path] = "removed"
+            elif mask & IN_ISDIR:
+                self._pending[path] = "dir"
+            else:
+                self._pending[path] = "file"
+
+            self._last_event = now
+            if self._oldest_pending is None:
+                self._oldest_pending = now
+
+    def _apply_pending(self) -> None:
+        pending, self._pending = self._pending, {}
+        for path, kind in pending.items():
+            if kind == "removed" and not os.path.lexists(path):
+                self.index.remove(path)
+                self.index.remove_prefix(path)
+                for watched in [p for p in self._path_to_wd if p == path or p.startswith(os.path.join(path, ""))]:
+                    self._forget_watch(watched, remove=True)
+            elif kind == "dir" or os.path.isdir(path):
+                if self.recursive:
+                    self._watch_tree(path)
+                    for desc in scan_dir(path, True, **self.scan_options):
+                        self.index.upsert(desc)
+            elif os.path.isfile(path):
+                try:
+                    self.index.upsert(create_file_descriptor(path))
+                except OSError as e:
+                    print(f"Помилка обробки файлу {path}: {e}")
+
+        cache = get_fingerprint_cache()
+        if cache:
+            cache.flush()
+        self.batches_total += 1
+        self._oldest_pending = None
+
+    def _rescan(self) -> None:
+        """Перебудувати каталог повним скануванням (знімок директорій оновлюється)."""
+        self.index.replace(scan_dir(
+            self.directory, self.recursive,
+            snapshot=get_snapshot_store(), incremental=False, delta=ScanDelta(),
+            **self.scan_options
+        ))
+
+    # ---------- Спостереження за директоріями ----------
+    def _watch_tree(self, directory: str) -> None:
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            if current not in self._path_to_wd:
+                try:
+                    wd = self._inotify.add_watch(current)
+                except OSError as e:
+                    self.watch_errors += 1
+                    if e.errno == errno.ENOSPC:
+                        print(f"Досягнуто ліміт inotify watch (fs.inotify.max_user_watches): {current}")
+                    continue
+                self._wd_to_path[wd] = current
+                self._path_to_wd[current] = wd
+            if not self.recursive:
+                continue
+            try:
+                with os.scandir(current) as it:
+                    stack.extend(e.path for e in it if e.is_dir(follow_symlinks=False))
+            except OSError as e:
+                print(f"Помилка читання директорії {current}: {e}")
+
+    def _forget_watch(self, path: str, remove: bool = False) -> None:
+        wd = self._path_to_wd.pop(path, None)
+        if wd is None:
+            return
+        self._wd_to_path.pop(wd, None)
+        if remove:
+            self._inotify.rm_watch(wd)
+
+
+# ---------- Реєстр спостерігачів процесу ----------
+_watchers: Dict[str, InotifyWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def start_watcher(directory: str, recursive: bool = True, scan_options: Optional[Dict] = None) -> InotifyWatcher:
+    """Запустити спостерігач для директорії (або повернути вже запущений)."""
+    directory = os.path.abspath(directory)
+    if not os.path.isdir(directory):
+        raise ValueError(f"Директорія не існує: {directory}")
+
+    with _watchers_lock:
+        watcher = _watchers.get(directory)
+        if watcher is not None and watcher.is_alive():
+            return watcher
+        watcher = InotifyWatcher(directory, recursive, scan_options)
+        watcher.start()
+        _watchers[directory] = watcher
+        return watcher
+
+
+def stop_watcher(directory: str) -> bool:
+    with _watchers_lock:
+        watcher = _watchers.pop(os.path.abspath(directory), None)
+    if watcher is None:
+        return False
+    watcher.stop()
+    watcher.join()
+    return True
+
+
+def list_watchers() -> List[Dict]:
+    with _watchers_lock:
+        return [watcher.status() for watcher in _watchers.values()]
+
+
+def get_active_watcher(directory: str, recursive: bool) -> Optional[InotifyWatcher]:
+    """
+    Активний і готовий спостерігач, що покриває директорію сканування.
+
+    Рекурсивний спостерігач покриває й нерекурсивне сканування тієї самої
+    директорії — зайві файли піддиректорій відфільтровує сам виклик.
+    """
+    with _watchers_lock:
+        watcher = _watchers.get(os.path.abspath(directory))
+    if watcher is None or not watcher.is_alive() or not watcher.ready.is_set():
+        return None
+    if recursive and not watcher.recursive:
+        return None
+    return watcher
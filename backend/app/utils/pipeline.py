@@ -0,0 +1,68 @@
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def bounded_map(func: Callable[[Any], Any], iterable: Iterable, max_in_flight: int) -> Iterator[Any]:
+    """
+    Виконати стадію конвеєра у фоновому потоці з обмеженою чергою.
+
+    Фоновий потік читає iterable, застосовує func і кладе результати в чергу
+    розміром max_in_flight. Коли споживач відстає, потік блокується на put —
+    так забезпечується зворотний тиск і стала пам'ять незалежно від кількості
+    елементів. Виняток стадії повторно піднімається у споживача.
+
+    Args:
+        func: Функція обробки одного елемента
+        iterable: Джерело елементів (напр. генератор scan_dir)
+        max_in_flight: Макс. кількість оброблених, але ще не спожитих елементів
+
+    Yields:
+        Результати func у порядку надходження
+    """
+    results: queue.Queue = queue.Queue(maxsize=max(1, max_in_flight))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(func(item)):
+                    return
+        except BaseException as exc:
+            put(_StageError(exc))
+        else:
+            put(_DONE)
+        finally:
+            close = getattr(iterable, "close", None)
+            if close:
+                close()
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _StageError):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        worker.join()
@@ -0,0 +1,89 @@
+import math
+from bisect import bisect_right
+from typing import List, Sequence
+
+
+class QuantileSketch:
+    """
+    Потокова оцінка кількох квантилів алгоритмом P² (Jain & Chlamtac, 1985)
+    у розширенні на m квантилів (Raatikainen): 2m + 3 маркери — мінімум,
+    кожен квантиль p, середини між сусідніми квантилями і максимум.
+
+    Після кожного значення маркери зсуваються до бажаних позицій
+    параболічною інтерполяцією, тож пам'ять O(m) незалежно від кількості
+    значень, а всі квантилі оновлюються одним пошуком комірки. Поки значень
+    не більше, ніж маркерів, вони зберігаються як є і квантилі точні.
+    """
+
+    def __init__(self, probabilities: Sequence[float]):
+        """
+        Raises:
+            ValueError: Якщо ймовірності не зростають строго в межах (0, 1)
+        """
+        probabilities = list(probabilities)
+        if not probabilities or any(not 0.0 < p < 1.0 for p in probabilities) or \
+           any(a >= b for a, b in zip(probabilities, probabilities[1:])):
+            raise ValueError("Quantiles must be strictly increasing probabilities in (0, 1)")
+        self.probabilities = probabilities
+
+        markers = [0.0]
+        previous = 0.0
+        for p in probabilities:
+            markers += [(previous + p) / 2, p]
+            previous = p
+        markers += [(previous + 1.0) / 2, 1.0]
+
+        self.count = 0
+        self._size = len(markers)
+        self._markers = markers
+        self._heights: List[float] = []
+        self._positions = list(range(1, self._size + 1))
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        q = self._heights
+        size = self._size
+        if self.count <= size:
+            q.append(x)
+            if self.count == size:
+                q.sort()
+            return
+
+        # 1. комірка k, в яку потрапляє x (крайні маркери розширюються)
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[-1]:
+            q[-1] = x
+            k = size - 2
+        else:
+            k = bisect_right(q, x) - 1
+
+        n = self._positions
+        n[k + 1:] = [position + 1 for position in n[k + 1:]]
+
+        # 2. зсунути внутрішні маркери до бажаних позицій 1 + (count - 1) * p
+        scale = self.count - 1
+        markers = self._markers
+        for i in range(1, size - 1):
+            d = 1 + scale * markers[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = q[i] + step / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < candidate < q[i + 1]:
+                    # парабола вийшла за сусідні маркери — лінійна інтерполяція
+                    candidate = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                q[i] = candidate
+                n[i] += step
+
+    def values(self) -> List[float]:
+        """Оцінки квантилів у порядку probabilities (NaN, якщо значень не було)."""
+        if self.count == 0:
+            return [math.nan] * len(self.probabilities)
+        if self.count < self._size:
+            ordered = sorted(self._heights)
+            return [ordered[max(0, math.ceil(p * len(ordered)) - 1)] for p in self.probabilities]
+        return [self._heights[2 * (j + 1)] for j in range(len(self.probabilities))]
@@ -0,0 +1,155 @@
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ..config import RESULT_CACHE_DB_PATH, RESULT_CACHE_ENABLED, RESULT_CACHE_MAX_BYTES
+from .file_analyzer import HashTier
+from .sqlite_cache import BatchedSQLiteCache, ProcessLocalCache
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractor_results (
+    file_hash   TEXT    NOT NULL,
+    method_id   TEXT    NOT NULL,
+    version     TEXT    NOT NULL,
+    result      TEXT    NOT NULL,
+    size        INTEGER NOT NULL,
+    last_access REAL    NOT NULL,
+    PRIMARY KEY (file_hash, method_id, version)
+);
+CREATE INDEX IF NOT EXISTS ix_extractor_results_last_access ON extractor_results (last_access);
+"""
+
+Key = Tuple[str, str, str]
+
+
+class ExtractorResultCache(BatchedSQLiteCache):
+    """
+    Дисковий кеш результатів MethodExtractor.run між сесіями.
+
+    Ключ — (SHA-256 вмісту, id методу, версія екстрактора): копії одного файлу
+    в різних місцях і повторні сесії на тому ж сховищі беруть готовий опис.
+    Зміна версії екстрактора робить старі записи недосяжними — вони з часом
+    витісняються. Розмір обмежено max_bytes (сума розмірів JSON-результатів),
+    витіснення — за давністю використання.
+    """
+
+    def __init__(self, db_path: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # _pending: Key -> JSON результату; _touched: Key -> час доступу
+        super().__init__(db_path, _SCHEMA)
+
+    def get(self, file_hash: str, method_id: str, version: str) -> Optional[Dict[str, Any]]:
+        key = (file_hash, method_id, version)
+        with self._lock:
+            raw = self._pending.get(key)
+            if raw is None:
+                row = self._conn.execute(
+                    "SELECT result FROM extractor_results "
+                    "WHERE file_hash = ? AND method_id = ? AND version = ?",
+                    key
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                raw = row[0]
+                self._touched[key] = time.time()
+                self._maybe_flush()
+            self.hits += 1
+        return json.loads(raw)
+
+    def put(self, file_hash: str, method_id: str, version: str, result: Dict[str, Any]) -> None:
+        try:
+            raw = json.dumps(result)
+        except (TypeError, ValueError):
+            # Результат не серіалізується в JSON — такий метод не кешується
+            return
+        with self._lock:
+            self._pending[(file_hash, method_id, version)] = raw
+            self._maybe_flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Лічильники поточного процесу та розмір кешу на диску."""
+        with self._lock:
+            self._flush_locked()
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractor_results"
+            ).fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": entries,
+                "size_bytes": size,
+                "max_bytes": self.max_bytes
+            }
+
+    def _evict_locked(self) -> int:
+        # Лишаємо найсвіжіші записи, поки їх сумарний розмір не перевищує max_bytes
+        return self._conn.execute(
+            "DELETE FROM extractor_results WHERE rowid IN ("
+            "  SELECT rowid FROM ("
+            "    SELECT rowid, SUM(size) OVER (ORDER BY last_access DESC, rowid DESC) AS running"
+            "    FROM extractor_results"
+            "  ) WHERE running > ?"
+            ")",
+            (self.max_bytes,)
+        ).rowcount
+
+    def _write_locked(self, now: float) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO extractor_results "
+            "(file_hash, method_id, version, result, size, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(*key, raw, len(raw), now) for key, raw in self._pending.items()]
+        )
+        self._conn.executemany(
+            "UPDATE extractor_results SET last_access = ? "
+            "WHERE file_hash = ? AND method_id = ? AND version = ?",
+            [(ts, *key) for key, ts in self._touched.items()]
+        )
+
+
+class MethodResultStore:
+    """Доступ до кешу результатів для одного методу в межах одного запуску."""
+
+    def __init__(self, method_id: str, version: str, cacheable: bool = True):
+        self.method_id = method_id
+        self.version = version
+        self.cache = get_result_cache() if cacheable else None
+        self.counts = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def _key(meta: Dict) -> Optional[str]:
+        # Лише повний SHA-256 однозначно ідентифікує вміст файлу
+        return meta.get("file_hash") if meta.get("hash_tier") == HashTier.FULL else None
+
+    def get(self, meta: Dict) -> Optional[Dict]:
+        key = self._key(meta)
+        if self.cache is None or key is None:
+            return None
+        dsc = self.cache.get(key, self.method_id, self.version)
+        self.counts["hits" if dsc is not None else "misses"] += 1
+        return dsc
+
+    def put(self, meta: Dict, dsc: Dict) -> None:
+        key = self._key(meta)
+        if self.cache is not None and key is not None:
+            self.cache.put(key, self.method_id, self.version, dsc)
+
+    def flush(self) -> None:
+        if self.cache is not None:
+            self.cache.flush()
+
+
+_cache = ProcessLocalCache(
+    lambda: ExtractorResultCache(RESULT_CACHE_DB_PATH, RESULT_CACHE_MAX_BYTES),
+    f"Кеш результатів ({RESULT_CACHE_DB_PATH})"
+)
+
+
+def get_result_cache() -> Optional[ExtractorResultCache]:
+    """Кеш результатів поточного процесу (None, якщо кеш вимкнено або недоступний)."""
+    if not RESULT_CACHE_ENABLED:
+        return None
+    return _cache.get()
@@ -0,0 +1,148 @@
+import fnmatch
+import os
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence
+
+
+def compile_globs(patterns: Sequence[str]) -> Optional[re.Pattern]:
+    """Звести glob-шаблони в один регулярний вираз (None, якщо шаблонів немає)."""
+    if not patterns:
+        return None
+    flags = re.IGNORECASE if os.name == "nt" else 0
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns), flags)
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+class ScanFilter:
+    """
+    Скомпільовані фільтри сканування.
+
+    Перевірки розділені за вартістю: match_dir/match_name працюють лише з
+    іменем і відносним шляхом (без системних викликів) і виконуються до stat;
+    match_stat (розмір, mtime) — після stat, але до хешування. Директорії,
+    що не пройшли match_dir, не відкриваються зовсім — піддерево відсікається.
+
+    Glob-шаблон без "/" порівнюється з іменем запису, з "/" — з шляхом
+    відносно кореня сканування (напр. "build/*", "*/node_modules").
+    """
+
+    def __init__(
+        self,
+        include: Sequence[str] = (),
+        exclude: Sequence[str] = (),
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        include_hidden: bool = True,
+        modified_after: Any = None,
+        modified_before: Any = None
+    ):
+        self._include_name = compile_globs([p for p in include if "/" not in p])
+        self._include_path = compile_globs([p for p in include if "/" in p])
+        self._exclude_name = compile_globs([p for p in exclude if "/" not in p])
+        self._exclude_path = compile_globs([p for p in exclude if "/" in p])
+        self._has_include = bool(include)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_depth = max_depth
+        self.include_hidden = include_hidden
+        self._min_mtime = _timestamp(modified_after)
+        self._max_mtime = _timestamp(modified_before)
+
+        self.pruned_dirs = 0
+        self.skipped: Counter = Counter()
+
+    @classmethod
+    def from_options(cls, options: Optional[Dict[str, Any]]) -> Optional["ScanFilter"]:
+        """Фільтр з параметрів сесії (None, якщо жоден фільтр не задано)."""
+        if not options:
+            return None
+        active = {k: v for k, v in options.items() if v not in (None, [], ())}
+        if not active or active == {"include_hidden": True}:
+            return None
+        return cls(**active)
+
+    @property
+    def needs_stat(self) -> bool:
+        return (self.min_size is not None or self.max_size is not None or
+                self._min_mtime is not None or self._max_mtime is not None)
+
+    def _excluded(self, name: str, rel_path: str) -> bool:
+        if not self.include_hidden and name.startswith("."):
+            return True
+        return bool(
+            (self._exclude_name and self._exclude_name.match(name)) or
+            (self._exclude_path and self._exclude_path.match(rel_path))
+        )
+
+    def match_dir(self, name: str, rel_path: str, depth: int, count: bool = True) -> bool:
+        """Чи заходити в піддиректорію (depth — її глибина, корінь = 0)."""
+        if (self.max_depth is not None and depth > self.max_depth) or self._excluded(name, rel_path):
+            if count:
+                self.pruned_dirs += 1
+            return False
+        return True
+
+    def match_name(self, name: str, rel_path: str, count: bool = True) -> bool:
+        """Перевірка файлу за іменем і шляхом (до stat); count=False — без лічильників."""
+        reason = None
+        if self._excluded(name, rel_path):
+            reason = "excluded"
+        elif self._has_include and not (
+            (self._include_name and self._include_name.match(name)) or
+            (self._include_path and self._include_path.match(rel_path))
+        ):
+            reason = "not_included"
+        if reason is None:
+            return True
+        if count:
+            self.skipped[reason] += 1
+        return False
+
+    def match_stat(self, size: int, mtime: float) -> bool:
+        """Перевірка файлу за розміром і часом зміни (після stat, до хешування)."""
+        if (self.min_size is not None and size < self.min_size) or \
+           (self.max_size is not None and size > self.max_size):
+            self.skipped["size"] += 1
+            return False
+        if (self._min_mtime is not None and mtime < self._min_mtime) or \
+           (self._max_mtime is not None and mtime > self._max_mtime):
+            self.skipped["mtime"] += 1
+            return False
+        return True
+
+    def accepts(self, path: str, root: str, stat_result: Optional[os.stat_result] = None) -> bool:
+        """
+        Повна перевірка одного файлу поза обходом (напр. для живого каталогу):
+        директорії-предки, ім'я, а за потреби — stat.
+        """
+        rel_path = os.path.relpath(path, root).replace(os.sep, "/")
+        parts = rel_path.split("/")
+        for depth in range(1, len(parts)):
+            if not self.match_dir(parts[depth - 1], "/".join(parts[:depth]), depth, count=False):
+                return False
+        if not self.match_name(parts[-1], rel_path):
+            return False
+        if self.needs_stat:
+            stat_result = stat_result or os.stat(path)
+            return self.match_stat(stat_result.st_size, stat_result.st_mtime)
+        return True
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "pruned_dirs": self.pruned_dirs,
+            "skipped_files": sum(self.skipped.values()),
+            "skipped_by": dict(self.skipped),
+            "pruned": self.pruned_dirs + sum(self.skipped.values())
+        }
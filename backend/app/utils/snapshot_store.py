@@ -0,0 +1,127 @@
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from ..config import SNAPSHOT_DB_PATH
+
+# Кількість відкладених записів директорій, після якої вони скидаються на диск
+FLUSH_THRESHOLD = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dir_snapshots (
+    root        TEXT    NOT NULL,
+    path        TEXT    NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    child_count INTEGER NOT NULL,
+    subdirs     TEXT    NOT NULL,
+    files       TEXT    NOT NULL,
+    PRIMARY KEY (root, path)
+);
+"""
+
+
+class DirectorySnapshotStore:
+    """
+    Знімок дерева директорій після сканування (SQLite поруч з file_structure.db).
+
+    Для кожної директорії кореня сканування зберігаються mtime_ns, кількість
+    дочірніх записів, імена піддиректорій і файли як {ім'я: [size, mtime_ns, dev, ino, created_at]}.
+    Записи перезаписуються при кожному скануванні. Видаляються лише
+    записи директорій, які зникли з переглянутої батьківської директорії
+    (discard); записи директорій, які сканування не відвідало (нерекурсивне
+    сканування, обмеження глибини, фільтри), зберігаються для наступних
+    сканувань. Знімок читається по одній директорії, тому пам'ять не залежить
+    від розміру дерева.
+    """
+
+    def __init__(self, db_path: str = SNAPSHOT_DB_PATH):
+        self._lock = threading.Lock()
+        self._pending: Dict[tuple, tuple] = {}
+        self._discarded: Set[tuple] = set()
+        self._conn = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(dir_snapshots)")}
+        if "generation" in columns:
+            # Знімок старого формату з поколіннями: він відтворюється наступним скануванням
+            self._conn.execute("DROP TABLE dir_snapshots")
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, root: str, path: str) -> Optional[Dict[str, Any]]:
+        """Попередній запис директорії або None, якщо вона ще не сканувалась."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns, child_count, subdirs, files FROM dir_snapshots "
+                "WHERE root = ? AND path = ?",
+                (root, path)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "mtime_ns": row[0],
+            "child_count": row[1],
+            "subdirs": json.loads(row[2]),
+            "files": json.loads(row[3])
+        }
+
+    def put(self, root: str, path: str, record: Dict[str, Any]) -> None:
+        """Зберегти запис директорії (пакетно)."""
+        with self._lock:
+            self._pending[(root, path)] = (
+                record["mtime_ns"],
+                record["child_count"],
+                json.dumps(record["subdirs"]),
+                json.dumps(record["files"])
+            )
+            if len(self._pending) >= FLUSH_THRESHOLD:
+                self._flush_locked()
+
+    def discard(self, root: str, path: str) -> None:
+        """Видалити запис директорії, якої більше немає (пакетно, разом із put)."""
+        with self._lock:
+            self._pending.pop((root, path), None)
+            self._discarded.add((root, path))
+            if len(self._discarded) >= FLUSH_THRESHOLD:
+                self._flush_locked()
+
+    def finish(self, root: str) -> int:
+        """Скинути відкладені записи та видалення; повертає кількість видалених директорій."""
+        with self._lock:
+            return self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> int:
+        removed = 0
+        if self._discarded:
+            removed = self._conn.executemany(
+                "DELETE FROM dir_snapshots WHERE root = ? AND path = ?",
+                list(self._discarded)
+            ).rowcount
+            self._discarded.clear()
+        if self._pending:
+            rows: List[tuple] = [(*key, *value) for key, value in self._pending.items()]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO dir_snapshots "
+                "(root, path, mtime_ns, child_count, subdirs, files) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._pending.clear()
+        self._conn.commit()
+        return removed
+
+
+_store: Optional[DirectorySnapshotStore] = None
+_store_lock = threading.Lock()
+
+
+def get_snapshot_store() -> DirectorySnapshotStore:
+    """Спільне сховище знімків директорій поточного процесу."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = DirectorySnapshotStore()
+    return _store
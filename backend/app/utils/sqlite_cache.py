@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from multiprocessing.util import Finalize
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+
+
+class BatchedSQLiteCache(ABC):
+    """
+    Основа дискових кешів на SQLite з пакетним записом.
+
+    Нові записи (_pending) та відмітки доступу (_touched) накопичуються
+    в пам'яті й скидаються однією транзакцією, коли їх набирається
+    flush_threshold; кожне evict_every_flushes-те скидання запускає витіснення.
+    Підкласи задають схему, запис пакета (_write_locked) і витіснення
+    (_evict_locked); обидва викликаються під self._lock.
+    """
+
+    # Кількість відкладених записів, після якої кеш скидається на диск
+    flush_threshold: int = 256
+    # Як часто (у скиданнях) запускати витіснення
+    evict_every_flushes: int = 32
+
+    def __init__(self, db_path: str, schema: str):
+        self.db_path = str(db_path)
+
+        self._lock = threading.Lock()
+        self._pending: Dict[Any, Any] = {}
+        self._touched: Dict[Any, float] = {}
+        self._flushes = 0
+
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.executescript(schema)
+        self.evict()
+
+    def flush(self) -> None:
+        """Скинути відкладені записи й відмітки доступу в БД."""
+        with self._lock:
+            self._flush_locked()
+
+    def evict(self) -> int:
+        """Запустити витіснення; повертає кількість видалених записів."""
+        with self._lock:
+            removed = self._evict_locked()
+            self._conn.commit()
+            return removed
+
+    @abstractmethod
+    def _write_locked(self, now: float) -> None:
+        """Записати _pending і _touched у БД (без commit)."""
+
+    @abstractmethod
+    def _evict_locked(self) -> int:
+        """Видалити зайві записи (без commit); повертає їх кількість."""
+
+    def _maybe_flush(self) -> None:
+        if len(self._pending) + len(self._touched) >= self.flush_threshold:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending and not self._touched:
+            return
+
+        self._write_locked(time.time())
+        self._pending.clear()
+        self._touched.clear()
+
+        self._flushes += 1
+        if self._flushes % self.evict_every_flushes == 0:
+            self._evict_locked()
+        self._conn.commit()
+
+
+CacheT = TypeVar("CacheT", bound=BatchedSQLiteCache)
+
+
+class ProcessLocalCache(Generic[CacheT]):
+    """
+    Окремий екземпляр кешу для кожного процесу.
+
+    У дочірніх процесах пулу (fork) з'єднання SQLite батьківського процесу
+    не використовується — створюється нове. Відкладені записи скидаються
+    при завершенні процесу: Finalize виконується і в головному процесі,
+    і у воркерах multiprocessing.
+    """
+
+    def __init__(self, factory: Callable[[], CacheT], label: str):
+        self._factory = factory
+        self._label = label
+        self._cache: Optional[CacheT] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[CacheT]:
+        """Кеш поточного процесу (None, якщо БД недоступна)."""
+        pid = os.getpid()
+        if self._cache is not None and self._pid == pid:
+            return self._cache
+
+        with self._lock:
+            if self._cache is None or self._pid != pid:
+                try:
+                    cache = self._factory()
+                except sqlite3.Error as e:
+                    print(f"{self._label} недоступний: {e}")
+                    return None
+                Finalize(cache, cache.flush, exitpriority=10)
+                self._cache, self._pid = cache, pid
+        return self._cache
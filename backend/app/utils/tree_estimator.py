@@ -0,0 +1,177 @@
+import math
+import os
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..config import ESTIMATE_MAX_PROBES, ESTIMATE_TIME_BUDGET
+from .scan_filter import ScanFilter
+
+# z-значення для 95% довірчого інтервалу (нормальне наближення)
+Z_95 = 1.96
+
+# Файл, вибраний пробою: (шлях, розмір, вага — скільки файлів дерева він представляє)
+Pick = Tuple[str, int, float]
+
+
+def mean_interval(values: Sequence[float]) -> Dict[str, float]:
+    """Середнє та 95% довірчий інтервал за вибіркою незалежних оцінок."""
+    n = len(values)
+    if n == 0:
+        return {"estimate": 0.0, "low": 0.0, "high": 0.0}
+    mean = sum(values) / n
+    if n == 1:
+        return {"estimate": mean, "low": mean, "high": mean}
+    variance = sum((v - mean) ** 2 for v in values) / (n - 1)
+    margin = Z_95 * math.sqrt(variance / n)
+    return {"estimate": mean, "low": max(0.0, mean - margin), "high": mean + margin}
+
+
+def ratio_interval(numerators: Sequence[float], denominators: Sequence[float]) -> Dict[str, float]:
+    """
+    Частка sum(numerators) / sum(denominators) з 95% інтервалом (лінеаризація).
+    Стійкіша за окреме середнє чисельника, коли знаменник сильно коливається
+    між пробами (напр. частка категорії серед файлів проби).
+    """
+    n = len(numerators)
+    total = sum(denominators)
+    if n == 0 or total == 0:
+        return {"estimate": 0.0, "low": 0.0, "high": 0.0}
+    ratio = sum(numerators) / total
+    if n == 1:
+        return {"estimate": ratio, "low": ratio, "high": ratio}
+    residuals = [num - ratio * den for num, den in zip(numerators, denominators)]
+    variance = sum(r * r for r in residuals) / (n - 1)
+    margin = Z_95 * math.sqrt(variance / n) / (total / n)
+    return {"estimate": ratio, "low": max(0.0, ratio - margin), "high": min(1.0, ratio + margin)}
+
+
+class TreeEstimator:
+    """
+    Оцінка розміру дерева директорій випадковими пробами (оцінювач Кнута).
+
+    Кожна проба спускається від кореня, на кожному рівні обираючи випадкову
+    піддиректорію; вага рівня — добуток кількостей піддиректорій на шляху.
+    Сума "вага × кількість файлів" по рівнях — незміщена оцінка кількості
+    файлів дерева (так само для байтів і директорій), а розкид між пробами
+    дає довірчий інтервал.
+
+    На кожному рівні проба також обирає один випадковий файл з вагою
+    "вага рівня × файлів у директорії" — це вибірка, стратифікована за
+    глибиною, на якій запускаються метод і алгоритм. Прочитані директорії
+    кешуються, тож повторні проби по тих самих гілках дешеві. Обхід
+    зупиняється за time_budget або max_probes.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        recursive: bool = True,
+        scan_filter: Optional[ScanFilter] = None,
+        time_budget: float = ESTIMATE_TIME_BUDGET,
+        max_probes: int = ESTIMATE_MAX_PROBES,
+        seed: Optional[int] = None
+    ):
+        self.root = os.path.abspath(directory)
+        self.recursive = recursive
+        self.scan_filter = scan_filter
+        self.time_budget = time_budget
+        self.max_probes = max_probes
+        self.rng = random.Random(seed)
+
+        self._listings: Dict[str, Tuple[List[Tuple[str, int]], List[Tuple[str, str]]]] = {}
+        self.list_seconds = 0.0
+
+    def _list(self, path: str, rel_dir: str, depth: int):
+        """Файли (шлях, розмір) і піддиректорії (шлях, відносний шлях) директорії, з кешем."""
+        cached = self._listings.get(path)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
+        files: List[Tuple[str, int]] = []
+        subdirs: List[Tuple[str, str]] = []
+        flt = self.scan_filter
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.recursive and (flt is None or flt.match_dir(entry.name, rel_path, depth + 1)):
+                                subdirs.append((entry.path, rel_path))
+                        elif entry.is_file():
+                            if flt is not None and not flt.match_name(entry.name, rel_path):
+                                continue
+                            stat_result = entry.stat()
+                            if flt is not None and not flt.match_stat(stat_result.st_size, stat_result.st_mtime):
+                                continue
+                            files.append((entry.path, stat_result.st_size))
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"Помилка читання директорії {path}: {e}")
+        self.list_seconds += time.perf_counter() - started
+
+        listing = (files, subdirs)
+        self._listings[path] = listing
+        return listing
+
+    def _probe(self) -> Tuple[Dict[str, float], Dict[int, float], List[Pick]]:
+        totals = {"files": 0.0, "bytes": 0.0, "dirs": 0.0}
+        by_depth: Dict[int, float] = {}
+        picks: List[Pick] = []
+
+        path, rel_dir, depth, weight = self.root, "", 0, 1.0
+        while True:
+            files, subdirs = self._list(path, rel_dir, depth)
+            totals["dirs"] += weight
+            totals["files"] += weight * len(files)
+            totals["bytes"] += weight * sum(size for _, size in files)
+            by_depth[depth] = weight * len(files)
+            if files:
+                file_path, size = self.rng.choice(files)
+                picks.append((file_path, size, weight * len(files)))
+            if not subdirs:
+                break
+            weight *= len(subdirs)
+            path, rel_dir = self.rng.choice(subdirs)
+            depth += 1
+        return totals, by_depth, picks
+
+    def run(self) -> Dict:
+        """
+        Returns:
+            Dict: оцінки files/bytes/dirs з інтервалами, файли за глибиною,
+            probes — вибрані пробами файли (по списку на пробу)
+        """
+        started = time.perf_counter()
+        samples: Dict[str, List[float]] = defaultdict(list)
+        depth_samples: List[Dict[int, float]] = []
+        probes: List[List[Pick]] = []
+
+        while len(probes) < self.max_probes and time.perf_counter() - started < self.time_budget:
+            totals, by_depth, picks = self._probe()
+            for key, value in totals.items():
+                samples[key].append(value)
+            depth_samples.append(by_depth)
+            probes.append(picks)
+            # Дерево з однієї директорії оцінюється точно першою ж пробою
+            if len(self._listings) == 1 and not self._listings[self.root][1]:
+                break
+
+        max_depth = max((d for by_depth in depth_samples for d in by_depth), default=0)
+        return {
+            "probes": probes,
+            "dirs_listed": len(self._listings),
+            "list_seconds": self.list_seconds,
+            "elapsed_seconds": time.perf_counter() - started,
+            "files": mean_interval(samples["files"]),
+            "bytes": mean_interval(samples["bytes"]),
+            "dirs": mean_interval(samples["dirs"]),
+            "by_depth": [
+                {"depth": d, **mean_interval([by_depth.get(d, 0.0) for by_depth in depth_samples])}
+                for d in range(max_depth + 1)
+            ]
+        }
@@ -15,6 +15,13 @@ export interface FileEntry {
   extension?: string | null
   mime_type?: string
   file_type?: string
+  modified?: string
+}
+
+export interface FileDetails {
+  hash?: string | null
+  file_type?: string
+  error?: string
 }
 
 export interface DirectoryResponse {
@@ -31,6 +38,8 @@ export interface DirectoryEntriesResponse {
     parent_directory: string | null
     entries: FileEntry[]
     has_access: boolean
+    next_cursor: string | null
+    total?: number
   }
 }
 
@@ -67,7 +76,8 @@ export interface StructAlgorithm {
 }
 
 export interface FileSystemApi {
-  getEntries: (directory?: string) => Promise<DirectoryEntriesResponse>
+  getEntries: (directory?: string, cursor?: string | null) => Promise<DirectoryEntriesResponse>
+  getDetails: (paths: string[]) => Promise<Record<string, FileDetails>>
 }
 
 export interface PreviewResponse {
@@ -101,11 +111,16 @@ export interface AlgorithmsApi {
 }
 
 export const fileSystemApi: FileSystemApi = {
-  getEntries: async (directory = 'C:\\') => {
+  getEntries: async (directory = 'C:\\', cursor = null) => {
     const response = await api.get('/fs/entries', {
-      params: { dir: directory }
+      params: { dir: directory, ...(cursor ? { cursor } : {}) }
     })
     return response.data
+  },
+
+  getDetails: async (paths) => {
+    const response = await api.post('/fs/details', { paths })
+    return response.data
   }
 }
 
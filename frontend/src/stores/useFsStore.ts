@@ -5,6 +5,7 @@ import { fileSystemApi, type FileEntry, sessionsApi } from '../services/api'
 export const useFsStore = defineStore('fs', () => {
   const entries = ref<FileEntry[]>([])
   const currentDirectory = ref<string>('C:\\')
+  const nextCursor = ref<string | null>(null)
   const loading = ref(false)
   const error = ref<string | null>(null)
   const previewBefore = ref<FileEntry[]>([])
@@ -36,6 +37,7 @@ export const useFsStore = defineStore('fs', () => {
     try {
       const response = await fileSystemApi.getEntries(directory)
       entries.value = response.entries.entries
+      nextCursor.value = response.entries.next_cursor
       currentDirectory.value = directory
       return response
     } catch (err: any) {
@@ -46,6 +48,20 @@ export const useFsStore = defineStore('fs', () => {
     }
   }
   
+  // Довантаження наступної сторінки поточної директорії
+  const fetchMoreEntries = async () => {
+    if (!nextCursor.value) return null
+    try {
+      const response = await fileSystemApi.getEntries(currentDirectory.value, nextCursor.value)
+      entries.value = [...entries.value, ...response.entries.entries]
+      nextCursor.value = response.entries.next_cursor
+      return response
+    } catch (err: any) {
+      error.value = err.message || 'Failed to fetch directory entries'
+      throw err
+    }
+  }
+  
   const fetchPreview = async (sessionId: string) => {
     loading.value = true
     error.value = null
@@ -189,12 +205,14 @@ export const useFsStore = defineStore('fs', () => {
   return {
     entries,
     currentDirectory,
+    nextCursor,
     loading,
     error,
     breadcrumbs,
     previewBefore,
     previewAfter,
     fetchEntries,
+    fetchMoreEntries,
     fetchPreview
   }
 })
\ No newline at end of file